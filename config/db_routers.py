@@ -0,0 +1,7 @@
+class ReaderRouter:
+    # "reader" is a read-only view of the default database: queries reach it only through
+    # an explicit .using("reader"), and it is never migrated.
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == "reader":
+            return False
+        return None
@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'spotify_app.middleware.SpotifyRateLimitMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -81,11 +82,61 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite on the Fly volume. WAL lets readers run alongside the single writer, and
+# synchronous=NORMAL only fsyncs at checkpoints (still durable against app crashes).
+# Writers take the lock up front (IMMEDIATE) so busy_timeout applies instead of failing
+# with "database is locked" on the read-to-write upgrade.
+SQLITE_PATH = Path(os.getenv("SQLITE_PATH", str(BASE_DIR / "data/db.sqlite3")))
+SQLITE_TIMEOUT_S = float(os.getenv("SQLITE_TIMEOUT_S", "10"))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "32768"))
+SQLITE_MMAP_BYTES = int(os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+_SQLITE_TUNING = (
+    f"PRAGMA cache_size=-{SQLITE_CACHE_KB};"
+    f"PRAGMA mmap_size={SQLITE_MMAP_BYTES};"
+    "PRAGMA temp_store=MEMORY;"
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'data/db.sqlite3',
-    }
+        'NAME': SQLITE_PATH,
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_TIMEOUT_S,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': "PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;" + _SQLITE_TUNING,
+        },
+    },
+    # Read-only connection for heavy per-user reads (mood board, analytics); never migrated
+    # (config.db_routers) and mirrors default under tests.
+    'reader': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{SQLITE_PATH}?mode=ro",
+        'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "600")),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_TIMEOUT_S,
+            'init_command': "PRAGMA query_only=ON;" + _SQLITE_TUNING,
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ["config.db_routers.ReaderRouter"]
+
+# Caches: "default" is per-process; "shared" is visible to every worker on the machine
+# (tokens, catalog data and other cross-worker state).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "vibesync",
+    },
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("SHARED_CACHE_DIR", str(BASE_DIR / "data/cache")),
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
 }
 
 # Password validation
@@ -133,6 +184,12 @@ CSRF_TRUSTED_ORIGINS = [
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 
+# Sessions only hold auth (tokens, user id, market), so reads come from the shared cache and
+# the DB is only written on login/refresh. Don't switch to signed_cookies: the refresh token
+# would travel in the (unencrypted) cookie.
+SESSION_ENGINE = os.getenv("SESSION_ENGINE", "django.contrib.sessions.backends.cached_db")
+SESSION_CACHE_ALIAS = os.getenv("SESSION_CACHE_ALIAS", "shared")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -141,3 +198,47 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
+
+# Shared keep-alive pool for Spotify API calls (one per worker process)
+SPOTIFY_HTTP_POOL_SIZE = int(os.getenv("SPOTIFY_HTTP_POOL_SIZE", "20"))
+SPOTIFY_HTTP_RETRIES = int(os.getenv("SPOTIFY_HTTP_RETRIES", "2"))
+SPOTIFY_HTTP_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "15"))
+
+# Concurrent fan-out of independent Spotify calls
+SPOTIFY_FANOUT_WORKERS = int(os.getenv("SPOTIFY_FANOUT_WORKERS", "8"))
+SPOTIFY_GATHER_TIMEOUT = float(os.getenv("SPOTIFY_GATHER_TIMEOUT", "8"))
+# Upper bound for a batched playlist write; anything slower is reported as pending.
+SPOTIFY_WRITE_TIMEOUT = float(os.getenv("SPOTIFY_WRITE_TIMEOUT", "20"))
+
+# Client-side rate limiting of Spotify calls (requests/second and burst, per process)
+SPOTIFY_RATE_LIMIT_GLOBAL = float(os.getenv("SPOTIFY_RATE_LIMIT_GLOBAL", "30"))
+SPOTIFY_RATE_LIMIT_GLOBAL_BURST = float(os.getenv("SPOTIFY_RATE_LIMIT_GLOBAL_BURST", "150"))
+SPOTIFY_RATE_LIMIT_USER = float(os.getenv("SPOTIFY_RATE_LIMIT_USER", "10"))
+SPOTIFY_RATE_LIMIT_USER_BURST = float(os.getenv("SPOTIFY_RATE_LIMIT_USER_BURST", "60"))
+
+# Shared audio-features store (spotify_app.TrackFeatures)
+TRACK_FEATURES_TTL_DAYS = int(os.getenv("TRACK_FEATURES_TTL_DAYS", "90"))
+TRACK_FEATURES_MISSING_TTL_HOURS = int(os.getenv("TRACK_FEATURES_MISSING_TTL_HOURS", "24"))
+TRACK_FEATURES_MAX_ROWS = int(os.getenv("TRACK_FEATURES_MAX_ROWS", "200000"))
+
+# Shared artist-genre store (spotify_app.ArtistGenres)
+ARTIST_GENRES_TTL_DAYS = int(os.getenv("ARTIST_GENRES_TTL_DAYS", "30"))
+
+# Write-behind TrackHistory logging (spotify_app.services.history): flushed every interval
+# or as soon as this many rows are queued.
+HISTORY_FLUSH_INTERVAL_S = float(os.getenv("HISTORY_FLUSH_INTERVAL_S", "2"))
+HISTORY_FLUSH_SIZE = int(os.getenv("HISTORY_FLUSH_SIZE", "50"))
+
+# Recommendation repeat guard (spotify_app.RecommendationSeenRollup); older rows are dropped
+# by the compact_recommendations_seen command.
+RECOMMENDATION_SEEN_RETENTION_DAYS = int(os.getenv("RECOMMENDATION_SEEN_RETENTION_DAYS", "90"))
+
+# Local nearest-neighbour index over stored features (spotify_app.services.track_index).
+# "exact" scans every vector; "ivf" probes the nearest k-means buckets once the store is large.
+TRACK_INDEX_MODE = os.getenv("TRACK_INDEX_MODE", "exact")
+TRACK_INDEX_TTL_S = int(os.getenv("TRACK_INDEX_TTL_S", "300"))
+TRACK_INDEX_IVF_MIN_ROWS = int(os.getenv("TRACK_INDEX_IVF_MIN_ROWS", "50000"))
+TRACK_INDEX_NPROBE = int(os.getenv("TRACK_INDEX_NPROBE", "32"))
+
+# Background renewal of Spotify access tokens (spotify_app.services.tokens)
+SPOTIFY_TOKEN_RENEWER = os.getenv("SPOTIFY_TOKEN_RENEWER", "True") == "True"
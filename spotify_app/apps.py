@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 class SpotifyAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "spotify_app"
+
+    def ready(self):
+        # Keep the analytics rollups in step with MoodEntry writes that bypass services.analytics.
+        from .models import MoodEntry
+        from .services import analytics
+
+        pre_save.connect(analytics.entry_before_save, sender=MoodEntry, dispatch_uid="mood_entry_rollup_pre_save")
+        post_save.connect(analytics.entry_saved, sender=MoodEntry, dispatch_uid="mood_entry_rollup_save")
+        post_delete.connect(analytics.entry_deleted, sender=MoodEntry, dispatch_uid="mood_entry_rollup_delete")
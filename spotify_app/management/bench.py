@@ -0,0 +1,31 @@
+import statistics
+import time
+
+# Timing and reporting shared by the bench_* commands, so their numbers read the same way.
+
+
+def time_calls(fn, cases, clock=time.perf_counter) -> list[float]:
+    # One sample (ms) per case; each case is the argument tuple for fn.
+    samples = []
+    for case in cases:
+        start = clock()
+        fn(*case)
+        samples.append((clock() - start) * 1000)
+    return samples
+
+
+def pct(samples: list[float], q: float) -> float:
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summary(label: str, samples: list[float], width: int = 10, digits: int = 2, unit: str = "ms") -> str:
+    if not samples:
+        return f"{label:>{width}}: no samples"
+    return (
+        f"{label:>{width}}: mean {statistics.mean(samples):.{digits}f} {unit}  "
+        f"p50 {statistics.median(samples):.{digits}f} {unit}  p95 {pct(samples, 0.95):.{digits}f} {unit}  "
+        f"max {max(samples):.{digits}f} {unit}"
+    )
@@ -0,0 +1,39 @@
+import statistics
+
+import requests
+from django.core.management.base import BaseCommand
+
+from spotify_app.management import bench
+from spotify_app.services import transport
+from spotify_app.services.spotify_client import API_BASE
+
+
+class Command(BaseCommand):
+    help = "Compare per-request latency of fresh connections vs the pooled Spotify session."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default=f"{API_BASE}/markets")
+        parser.add_argument("-n", "--requests", type=int, default=20)
+        parser.add_argument("--token", default="", help="Optional access token; a 401 is fine for timing.")
+
+    def handle(self, *args, **opts):
+        url = opts["url"]
+        n = max(1, opts["requests"])
+        token = opts["token"] or "bench"
+
+        def fresh():
+            requests.get(url, headers={"Authorization": f"Bearer {token}"}, timeout=15)
+
+        def pooled():
+            transport.request("GET", url, token)
+
+        # Warm the pool so the pooled numbers reflect steady state.
+        pooled()
+        cold = bench.time_calls(fresh, [()] * n)
+        warm = bench.time_calls(pooled, [()] * n)
+
+        self.stdout.write(f"{url} x{n}")
+        self.stdout.write(bench.summary("fresh connection", cold, width=18, digits=1))
+        self.stdout.write(bench.summary("pooled keep-alive", warm, width=18, digits=1))
+        saved = statistics.mean(cold) - statistics.mean(warm)
+        self.stdout.write(self.style.SUCCESS(f"saved per request: {saved:.1f} ms"))
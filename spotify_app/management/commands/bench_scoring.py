@@ -0,0 +1,146 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spotify_app.management import bench
+from spotify_app.services import moods
+from spotify_app.services.feature_store import FEATURE_KEYS
+from spotify_app.services.scoring import SCORE_WEIGHTS, CandidatePool
+
+
+def _scalar_score(features: dict | None, params: dict) -> float:
+    # Reference: the per-track loop the matrix scoring replaced.
+    if not features:
+        return 999.0
+    score = 0.0
+    for key, target in params.items():
+        if not key.startswith("target_"):
+            continue
+        feat_key = key.replace("target_", "")
+        val = features.get(feat_key)
+        if val is None:
+            continue
+        score += abs(float(val) - float(target)) * SCORE_WEIGHTS.get(feat_key, 1.0)
+    return score
+
+
+def _scalar_gate(tracks: list[dict], features_map: dict, mood: str, intensity: int) -> list[dict]:
+    # Reference: the per-track if/elif gate the boolean masks replaced.
+    m = (mood or "neutral").lower()
+    t = max(0, min(100, intensity)) / 100.0
+    out = []
+    for tr in tracks:
+        f = features_map.get(tr.get("id")) if features_map else None
+        if not f:
+            continue
+        energy = float(f.get("energy") or 0.0)
+        dance = float(f.get("danceability") or 0.0)
+        tempo = float(f.get("tempo") or 0.0)
+        valence = float(f.get("valence") or 0.0)
+        acoustic = float(f.get("acousticness") or 0.0)
+        if m == "sad":
+            ok = valence <= 0.25 + 0.05 * (1 - t) and tempo <= 95 - 10 * t and energy <= (0.35 - 0.10 * t)
+        elif m == "chill":
+            ok = (0.20 <= energy <= 0.58 - 0.12 * t and 0.35 <= dance <= 0.82
+                  and 65 <= tempo <= 112 - 12 * t and 0.20 <= valence <= 0.78)
+        elif m == "romantic":
+            ok = valence >= 0.55 and tempo <= 105 - 10 * t and energy <= (0.60 - 0.10 * t)
+        elif m == "menacing":
+            ok = valence <= 0.25 and 100 + 15 * t <= tempo <= 170 and energy >= 0.70 + 0.15 * t and acoustic <= 0.30
+        elif m == "neutral":
+            ok = (0.25 <= energy <= 0.65 and 0.35 <= dance <= 0.70 and 70 <= tempo <= 115
+                  and not (dance >= 0.78 and tempo >= 95 and energy >= 0.65))
+        elif m == "perreo":
+            ok = (energy >= 0.50 + 0.15 * t and dance >= 0.68 + 0.08 * t and 80 + 10 * t <= tempo <= 118 + 6 * t
+                  and acoustic <= 0.35 and valence >= 0.35)
+        else:
+            ok = (energy >= 0.60 + 0.20 * t and dance >= 0.60 + 0.10 * t and 100 + 10 * t <= tempo <= 175
+                  and acoustic <= 0.35 and valence >= 0.30)
+        if ok:
+            out.append(tr)
+    return out
+
+
+def _scalar_chill(tracks: list[dict], features_map: dict) -> list[dict]:
+    out = []
+    for tr in tracks:
+        f = features_map.get(tr.get("id"))
+        if not f:
+            continue
+        energy = float(f.get("energy") or 0.0)
+        dance = float(f.get("danceability") or 0.0)
+        tempo = float(f.get("tempo") or 0.0)
+        speech = float(f.get("speechiness") or 0.0)
+        if energy > 0.56 or tempo > 112 or speech > 0.18 or (dance > 0.78 and energy > 0.48):
+            continue
+        out.append(tr)
+    return out
+
+
+def _synthetic_pool(n: int, seed: int) -> tuple[list[dict], dict]:
+    rnd = random.Random(seed)
+    tracks = [{"id": f"t{i}"} for i in range(n)]
+    features_map = {}
+    for t in tracks:
+        if rnd.random() < 0.05:
+            continue  # no features for this one
+        f = {"id": t["id"]}
+        for k in FEATURE_KEYS:
+            if k == "tempo":
+                f[k] = 55 + 130 * rnd.random()
+            elif k == "loudness":
+                f[k] = -25 + 23 * rnd.random()
+            else:
+                f[k] = rnd.random()
+            if rnd.random() < 0.02:
+                f[k] = None
+        features_map[t["id"]] = f
+    return tracks, features_map
+
+
+class Command(BaseCommand):
+    help = "Per-request CPU of candidate scoring + mood gating: scalar loop vs feature matrix."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--candidates", type=int, default=1000)
+        parser.add_argument("-r", "--rounds", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        n = max(1, opts["candidates"])
+        rounds = max(1, opts["rounds"])
+        tracks, features_map = _synthetic_pool(n, opts["seed"])
+        cases = [(mood, intensity) for mood in moods.MOODS for intensity in (0, 35, 70, 100)]
+
+        def scalar(mood, intensity):
+            params = moods.profile(mood, intensity).params
+            ranked = sorted(tracks, key=lambda t: _scalar_score(features_map.get(t["id"]), params))
+            gated = _scalar_gate(ranked, features_map, mood, intensity) or ranked
+            if mood == "chill":
+                gated = _scalar_chill(gated, features_map) or gated
+            return [t["id"] for t in gated]
+
+        def vector(mood, intensity):
+            profile = moods.profile(mood, intensity)
+            pool = CandidatePool(tracks, features_map)
+            pool = pool.take(pool.ranked_index(pool.scores(profile.params)))
+            gated = profile.gate_mask(pool)
+            if gated.any():
+                pool = pool.take(gated)
+            post = profile.post_mask(pool)
+            if post is not None and post.any():
+                pool = pool.take(post)
+            return [t["id"] for t in pool.tracks]
+
+        for mood, intensity in cases:
+            if scalar(mood, intensity) != vector(mood, intensity):
+                raise CommandError(f"results differ for {mood} @ {intensity}")
+
+        self.stdout.write(f"{n} candidates, {len(cases)} mood/intensity cases, {rounds} rounds; results identical")
+        base = bench.time_calls(scalar, cases * rounds, clock=time.process_time)
+        fast = bench.time_calls(vector, cases * rounds, clock=time.process_time)
+        self.stdout.write(bench.summary("scalar loop", base, width=15, unit="ms CPU"))
+        self.stdout.write(bench.summary("feature matrix", fast, width=15, unit="ms CPU"))
+        self.stdout.write(self.style.SUCCESS(f"speedup: {statistics.mean(base) / statistics.mean(fast):.1f}x"))
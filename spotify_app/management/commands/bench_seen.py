@@ -0,0 +1,108 @@
+import random
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from spotify_app.management import bench
+from spotify_app.models import RecommendationSeen
+from spotify_app.services import moods, seen
+
+MODES = ["blend", "personal", "discovery"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seen-set query latency at scale: the raw per-(mood, intensity, mode) table vs the "
+        "compacted rollup. Runs against a freshly migrated scratch SQLite file, never the live database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--rows", type=int, default=1_000_000)
+        parser.add_argument("-u", "--users", type=int, default=50)
+        parser.add_argument("--tracks", type=int, default=1500, help="distinct tracks recommended per user")
+        parser.add_argument("-r", "--rounds", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--db", default="", help="scratch SQLite path (default: a temporary file)")
+
+    def handle(self, *args, **opts):
+        live = connection.settings_dict["NAME"]
+        if opts["db"] and Path(opts["db"]).resolve() == Path(live).resolve():
+            raise CommandError("--db must not be the live database")
+        with tempfile.TemporaryDirectory() as tmp:
+            # Repoint the default connection (as the test runner does) so the bulk insert and
+            # compaction never hold the live write lock or grow its WAL.
+            connection.close()
+            connection.settings_dict["NAME"] = opts["db"] or str(Path(tmp) / "bench_seen.sqlite3")
+            try:
+                call_command("migrate", verbosity=0)
+                self._run(opts)
+            finally:
+                connection.close()
+                connection.settings_dict["NAME"] = live
+
+    def _run(self, opts):
+        rng = random.Random(opts["seed"])
+        n, users = max(1, opts["rows"]), max(1, opts["users"])
+        user_ids = [f"bench-user-{u}" for u in range(users)]
+        mood_names = list(moods.MOODS)
+        now = timezone.now()
+
+        start = time.perf_counter()
+        table = RecommendationSeen._meta.db_table
+        sql = (
+            f"INSERT OR IGNORE INTO {table} (spotify_user_id, track_id, mood, intensity, mode, seen_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)"
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            for i in range(0, n, 10_000):
+                cursor.executemany(sql, [
+                    (
+                        rng.choice(user_ids), f"t{rng.randrange(opts['tracks'])}", rng.choice(mood_names),
+                        rng.randrange(0, 101, 5), rng.choice(MODES), now - timedelta(minutes=rng.randrange(60 * 24 * 60)),
+                    )
+                    for _ in range(min(10_000, n - i))
+                ])
+        raw_rows = RecommendationSeen.objects.count()
+        self.stdout.write(f"{raw_rows} raw rows for {users} users in {time.perf_counter() - start:.1f} s")
+
+        cases = [
+            (rng.choice(user_ids), rng.choice(mood_names), rng.randrange(0, 101, 5), rng.choice(MODES))
+            for _ in range(max(1, opts["rounds"]))
+        ]
+
+        def raw_queries(user_id, mood, intensity, mode):
+            list(
+                RecommendationSeen.objects.filter(spotify_user_id=user_id, mood=mood, intensity=intensity, mode=mode)
+                .order_by("-seen_at").values_list("track_id", flat=True)[:80]
+            )
+            list(
+                RecommendationSeen.objects.filter(spotify_user_id=user_id)
+                .order_by("-seen_at").values_list("track_id", flat=True)[:120]
+            )
+
+        def rollup_queries(user_id, mood, _intensity, mode):
+            seen.recent(user_id, 80, mood=mood, mode=mode)
+            seen.recent(user_id, 120)
+
+        self.stdout.write(bench.summary("raw", bench.time_calls(raw_queries, cases), width=6))
+
+        start = time.perf_counter()
+        result = seen.compact()
+        self.stdout.write(
+            f"compaction: {result['merged']} rows merged, {result['expired_raw'] + result['expired']} expired "
+            f"in {time.perf_counter() - start:.1f} s"
+        )
+        rollup_rows = seen.RecommendationSeenRollup.objects.count()
+        self.stdout.write(f"{rollup_rows} rollup rows ({raw_rows / max(1, rollup_rows):.1f}x fewer)")
+        self.stdout.write(bench.summary("rollup", bench.time_calls(rollup_queries, cases), width=6))
+
+        start = time.perf_counter()
+        for user_id, mood, intensity, mode in cases[:50]:
+            seen.record(user_id, [f"t{rng.randrange(opts['tracks'] * 2)}" for _ in range(150)], mood, intensity, mode)
+        self.stdout.write(f"record(150 ids): mean {(time.perf_counter() - start) * 1000 / min(50, len(cases)):.2f} ms")
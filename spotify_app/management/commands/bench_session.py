@@ -0,0 +1,82 @@
+import random
+import statistics
+import string
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from spotify_app.management import bench
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+}
+
+
+def _token(n: int = 22) -> str:
+    # Random base62, like Spotify ids and tokens (so the signed payload doesn't compress away).
+    return "".join(random.choices(string.ascii_letters + string.digits, k=n))
+
+
+def _auth_payload() -> dict:
+    return {
+        "spotify_access_token": _token(280),
+        "spotify_refresh_token": _token(131),
+        "spotify_expires_at": int(time.time()) + 3600,
+        "spotify_user_id": "bench-user",
+        "spotify_country": "US",
+    }
+
+
+def _legacy_payload() -> dict:
+    # What the session carried while recommendation state lived in it.
+    return {
+        **_auth_payload(),
+        "rec_seen_ids": [_token() for _ in range(200)],
+        "rec_last_mood": "chill",
+        "rec_last_intensity": 50,
+        "rec_last_mode": "blend",
+        "last_track_id": _token(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Session payload size and per-request read/write cost: legacy vs current payload, db vs cached_db."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-r", "--rounds", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        rounds = max(1, opts["rounds"])
+        self.stdout.write(f"configured SESSION_ENGINE: {settings.SESSION_ENGINE}")
+        for label, payload, writes in (
+            # Legacy: every recommend and most polls modified the session, so it was saved too.
+            ("legacy", _legacy_payload(), True),
+            ("current", _auth_payload(), False),
+        ):
+            for engine_name, engine in ENGINES.items():
+                store_cls = import_module(engine).SessionStore
+                store = store_cls()
+                store.update(payload)
+                store.save()
+                key = store.session_key
+                size = len(store.encode(dict(payload)))
+                samples = []
+                try:
+                    for i in range(rounds):
+                        start = time.perf_counter()
+                        s = store_cls(key)
+                        s.get("spotify_access_token")
+                        if writes:
+                            s["rec_last_intensity"] = i
+                            s.save()
+                        samples.append((time.perf_counter() - start) * 1000)
+                finally:
+                    store_cls(key).delete()
+                self.stdout.write(
+                    f"{label:>7} {engine_name:>9}: {size:5d} B encoded  "
+                    f"{'read+write' if writes else 'read only':>10}/request mean {statistics.mean(samples):.3f} ms  "
+                    f"p95 {bench.pct(samples, 0.95):.3f} ms"
+                )
@@ -0,0 +1,137 @@
+import multiprocessing
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from spotify_app.management import bench
+
+SCHEMA = """
+CREATE TABLE history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spotify_user_id TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    played_at REAL NOT NULL
+);
+CREATE INDEX history_user_played ON history (spotify_user_id, played_at);
+"""
+READ_SQL = (
+    "SELECT artists, COUNT(*) AS n FROM history WHERE spotify_user_id = ? "
+    "GROUP BY artists ORDER BY n DESC LIMIT 50"
+)
+
+
+def _profiles() -> dict[str, dict]:
+    options = settings.DATABASES["default"].get("OPTIONS", {})
+    return {
+        # Stock Django/SQLite: rollback journal, FULL sync, deferred transactions, 5 s timeout.
+        "default": {"init": "PRAGMA journal_mode=DELETE;", "begin": "BEGIN", "timeout": 5.0},
+        "production": {
+            "init": options.get("init_command", ""),
+            "begin": f"BEGIN {options.get('transaction_mode', 'DEFERRED')}",
+            "timeout": float(options.get("timeout", 5.0)),
+        },
+    }
+
+
+def _connect(path: str, profile: dict) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=profile["timeout"], isolation_level=None)
+    conn.executescript(profile["init"])
+    return conn
+
+
+def _writer(args) -> dict:
+    path, profile, worker, txns, rows = args
+    conn = _connect(path, profile)
+    latencies, errors = [], 0
+    for i in range(txns):
+        start = time.perf_counter()
+        try:
+            conn.execute(profile["begin"])
+            # Read-then-write, like the dedupe check before a history insert.
+            conn.execute("SELECT MAX(played_at) FROM history WHERE spotify_user_id = ?", (f"u{worker}",)).fetchone()
+            conn.executemany(
+                "INSERT INTO history (spotify_user_id, track_id, artists, played_at) VALUES (?, ?, ?, ?)",
+                [(f"u{worker}", f"t{worker}-{i}-{j}", f"Artist {(i + j) % 40}", time.time()) for j in range(rows)],
+            )
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return {"kind": "write", "latencies": latencies, "errors": errors}
+
+
+def _reader(args) -> dict:
+    path, profile, worker, stop = args
+    conn = _connect(path, profile)
+    latencies, errors = [], 0
+    # Read continuously until the writers are done.
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            conn.execute(READ_SQL, (f"u{worker % 4}",)).fetchall()
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return {"kind": "read", "latencies": latencies, "errors": errors}
+
+
+class Command(BaseCommand):
+    help = "Concurrent writer/reader processes against a scratch SQLite file: stock settings vs the production profile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-w", "--writers", type=int, default=4)
+        parser.add_argument("--readers", type=int, default=2)
+        parser.add_argument("-t", "--txns", type=int, default=2000, help="transactions per writer")
+        parser.add_argument("--rows", type=int, default=1, help="rows inserted per transaction")
+        parser.add_argument("--seed-rows", type=int, default=50_000)
+
+    def handle(self, *args, **opts):
+        writers, readers = max(1, opts["writers"]), max(0, opts["readers"])
+        for name, profile in _profiles().items():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = str(Path(tmp) / "bench.sqlite3")
+                conn = _connect(path, profile)
+                conn.executescript(SCHEMA)
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO history (spotify_user_id, track_id, artists, played_at) VALUES (?, ?, ?, ?)",
+                    [(f"u{i % 4}", f"seed{i}", f"Artist {i % 40}", float(i)) for i in range(opts["seed_rows"])],
+                )
+                conn.execute("COMMIT")
+                conn.close()
+
+                with multiprocessing.Manager() as manager, multiprocessing.Pool(writers + readers) as pool:
+                    stop = manager.Event()
+                    pending_reads = [pool.apply_async(_reader, ((path, profile, r, stop),)) for r in range(readers)]
+                    start = time.perf_counter()
+                    writes = pool.map(_writer, [(path, profile, w, opts["txns"], opts["rows"]) for w in range(writers)])
+                    elapsed = time.perf_counter() - start
+                    stop.set()
+                    reads = [p.get() for p in pending_reads]
+                self._report(name, writes, reads, elapsed)
+
+    def _report(self, name: str, writes: list[dict], reads: list[dict], elapsed: float) -> None:
+        w = [x for r in writes for x in r["latencies"]]
+        rd = [x for r in reads for x in r["latencies"]]
+        w_err = sum(r["errors"] for r in writes)
+        rd_err = sum(r["errors"] for r in reads)
+        self.stdout.write(
+            f"{name:>10}: {len(w) / elapsed:7.0f} commits/s  write p50 {bench.pct(w, 0.5):.2f} ms "
+            f"p95 {bench.pct(w, 0.95):.2f} ms  lock errors {w_err}"
+        )
+        if rd:
+            self.stdout.write(
+                f"{'':>10}  {len(rd)} reads  read p50 {bench.pct(rd, 0.5):.2f} ms "
+                f"p95 {bench.pct(rd, 0.95):.2f} ms  read errors {rd_err}"
+            )
@@ -0,0 +1,61 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from spotify_app.management import bench
+from spotify_app.services import moods
+from spotify_app.services.feature_store import FEATURE_KEYS
+from spotify_app.services.track_index import TrackIndex
+
+
+def _synthetic_index(n: int, seed: int) -> TrackIndex:
+    rng = np.random.default_rng(seed)
+    raw = rng.random((n, len(FEATURE_KEYS)))
+    raw[:, FEATURE_KEYS.index("tempo")] = 55 + 130 * raw[:, FEATURE_KEYS.index("tempo")]
+    raw[:, FEATURE_KEYS.index("loudness")] = -25 + 23 * raw[:, FEATURE_KEYS.index("loudness")]
+    raw[rng.random(raw.shape) < 0.02] = np.nan
+    meta = [{"name": f"t{i}", "artists": "", "artist_id": "", "image": "", "spotify_url": ""} for i in range(n)]
+    return TrackIndex([f"t{i}" for i in range(n)], raw, meta)
+
+
+class Command(BaseCommand):
+    help = "Query latency of the local track index: exact scan vs IVF buckets, with IVF recall."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--tracks", type=int, default=200_000)
+        parser.add_argument("-k", type=int, default=120)
+        parser.add_argument("--nprobe", type=int, default=32)
+        parser.add_argument("-r", "--rounds", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        n, k, nprobe = max(1, opts["tracks"]), max(1, opts["k"]), max(1, opts["nprobe"])
+        index = _synthetic_index(n, opts["seed"])
+        start = time.perf_counter()
+        index.build_ivf()
+        self.stdout.write(
+            f"{n} tracks, k={k}; IVF build {(time.perf_counter() - start) * 1000:.0f} ms "
+            f"({len(index.lists)} lists, nprobe={nprobe})"
+        )
+
+        queries = [index.query_for(moods.profile(m, i).params) for m in moods.MOODS for i in (0, 50, 100)]
+        exact, approx, recall = [], [], []
+        for _ in range(max(1, opts["rounds"])):
+            for query, weights in queries:
+                if not weights.any():
+                    continue
+                start = time.perf_counter()
+                truth = index.search(query, weights, k)
+                exact.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                found = index.search(query, weights, k, nprobe=nprobe)
+                approx.append((time.perf_counter() - start) * 1000)
+                recall.append(len(set(truth) & set(found)) / len(truth))
+
+        self.stdout.write(bench.summary("exact", exact, width=6))
+        self.stdout.write(bench.summary("ivf", approx, width=6))
+        self.stdout.write(self.style.SUCCESS(
+            f"ivf recall@{k}: {statistics.mean(recall):.3f}  speedup: {statistics.mean(exact) / statistics.mean(approx):.1f}x"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from spotify_app.services import seen
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge raw RecommendationSeen rows into one rollup row per (user, track) and drop rows "
+        "older than RECOMMENDATION_SEEN_RETENTION_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=seen.COMPACT_BATCH)
+
+    def handle(self, *args, **opts):
+        result = seen.compact(batch=max(1, opts["batch"]))
+        self.stdout.write(self.style.SUCCESS(
+            f"merged {result['merged']} raw rows; expired {result['expired_raw']} raw, {result['expired']} rollup"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from spotify_app.services import analytics
+
+
+class Command(BaseCommand):
+    help = "Recompute the mood/artist/day analytics rollups from MoodEntry (all users, or one with --user)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="spotify_user_id to rebuild; default is everyone")
+
+    def handle(self, *args, **opts):
+        result = analytics.rebuild(opts.get("user"))
+        self.stdout.write(self.style.SUCCESS(
+            f"rebuilt {result['moods']} mood, {result['artists']} artist and {result['days']} day rollup rows"
+        ))
@@ -0,0 +1,23 @@
+import math
+
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .services.ratelimit import RateLimited
+
+
+class SpotifyRateLimitMiddleware(MiddlewareMixin):
+    # Turn a shed/throttled Spotify call into a 429 the frontend can back off on,
+    # instead of a 500. MiddlewareMixin makes it sync and async capable, so ASGI requests
+    # (the SSE stream) pass straight through without a thread hop.
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, RateLimited):
+            return None
+        retry_after = max(1, math.ceil(exception.retry_after or 1))
+        response = JsonResponse(
+            {"ok": False, "error": "Spotify is rate limiting requests; try again shortly.", "retry_after": retry_after},
+            status=429,
+        )
+        response["Retry-After"] = str(retry_after)
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.10 on 2026-10-17 00:29
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0006_recommendationfeedback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('track_id', models.CharField(max_length=64, unique=True)),
+                ('danceability', models.FloatField(blank=True, null=True)),
+                ('energy', models.FloatField(blank=True, null=True)),
+                ('valence', models.FloatField(blank=True, null=True)),
+                ('tempo', models.FloatField(blank=True, null=True)),
+                ('acousticness', models.FloatField(blank=True, null=True)),
+                ('instrumentalness', models.FloatField(blank=True, null=True)),
+                ('liveness', models.FloatField(blank=True, null=True)),
+                ('speechiness', models.FloatField(blank=True, null=True)),
+                ('loudness', models.FloatField(blank=True, null=True)),
+                ('available', models.BooleanField(default=True)),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.10 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0007_trackfeatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='artist_id',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='artists',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='image',
+            field=models.URLField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='name',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='spotify_url',
+            field=models.URLField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-17 00:48
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0008_trackfeatures_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtistGenres',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('artist_id', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(blank=True, default='', max_length=200)),
+                ('genres', models.JSONField(blank=True, default=list)),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.10 on 2026-10-17 00:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0009_artistgenres'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaylistMirror',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('playlist_id', models.CharField(max_length=120, unique=True)),
+                ('snapshot_id', models.CharField(blank=True, default='', max_length=120)),
+                ('track_ids', models.JSONField(blank=True, default=list)),
+                ('synced_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.10 on 2026-10-17 00:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0010_playlistmirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationSeenRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_user_id', models.CharField(max_length=64)),
+                ('track_id', models.CharField(max_length=64)),
+                ('last_mood', models.CharField(blank=True, max_length=32)),
+                ('last_intensity', models.IntegerField(default=50)),
+                ('last_mode', models.CharField(default='blend', max_length=16)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('count', models.PositiveIntegerField(default=1)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['spotify_user_id', 'last_seen'], name='spotify_app_spotify_e4ba61_idx'), models.Index(fields=['spotify_user_id', 'last_mood', 'last_mode', 'last_seen'], name='spotify_app_spotify_d35a95_idx'), models.Index(fields=['last_seen'], name='spotify_app_last_se_3e6a96_idx')],
+                'unique_together': {('spotify_user_id', 'track_id')},
+            },
+        ),
+    ]
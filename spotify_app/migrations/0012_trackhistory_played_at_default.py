@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0011_recommendationseenrollup'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trackhistory',
+            name='played_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:17
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same counts services.analytics.rebuild() produces; existing entries only have the
+    # joined artists string, so it is split on ", ".
+    MoodEntry = apps.get_model("spotify_app", "MoodEntry")
+    moods, artists, days = Counter(), Counter(), Counter()
+    for user_id, mood_id, joined, added_at in MoodEntry.objects.values_list(
+        "spotify_user_id", "mood_id", "artists", "added_at"
+    ).iterator(chunk_size=2000):
+        user_id = user_id or ""
+        moods[(user_id, mood_id)] += 1
+        days[(user_id, mood_id, added_at.date())] += 1
+        for name in dict.fromkeys(n.strip()[:200] for n in (joined or "").split(", ") if n.strip()):
+            artists[(user_id, mood_id, name)] += 1
+    MoodCountRollup = apps.get_model("spotify_app", "MoodCountRollup")
+    MoodCountRollup.objects.bulk_create(
+        [MoodCountRollup(spotify_user_id=u, mood_id=m, count=n) for (u, m), n in moods.items()], batch_size=500
+    )
+    MoodArtistRollup = apps.get_model("spotify_app", "MoodArtistRollup")
+    MoodArtistRollup.objects.bulk_create(
+        [MoodArtistRollup(spotify_user_id=u, mood_id=m, artist=a, count=n) for (u, m, a), n in artists.items()],
+        batch_size=500,
+    )
+    MoodDayRollup = apps.get_model("spotify_app", "MoodDayRollup")
+    MoodDayRollup.objects.bulk_create(
+        [MoodDayRollup(spotify_user_id=u, mood_id=m, day=d, count=n) for (u, m, d), n in days.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0012_trackhistory_played_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moodentry',
+            name='artist_names',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.CreateModel(
+            name='MoodArtistRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_user_id', models.CharField(blank=True, default='', max_length=64)),
+                ('artist', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mood', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='spotify_app.mood')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['spotify_user_id', 'count'], name='spotify_app_spotify_f3df50_idx')],
+                'unique_together': {('spotify_user_id', 'mood', 'artist')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MoodCountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_user_id', models.CharField(blank=True, default='', max_length=64)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mood', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='spotify_app.mood')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['spotify_user_id', 'count'], name='spotify_app_spotify_b03a2b_idx')],
+                'unique_together': {('spotify_user_id', 'mood')},
+            },
+        ),
+        migrations.CreateModel(
+            name='MoodDayRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spotify_user_id', models.CharField(blank=True, default='', max_length=64)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mood', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='spotify_app.mood')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['spotify_user_id', 'day'], name='spotify_app_spotify_777e55_idx')],
+                'unique_together': {('spotify_user_id', 'mood', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
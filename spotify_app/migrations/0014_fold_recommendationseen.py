@@ -0,0 +1,58 @@
+from django.db import migrations
+
+
+def fold_raw_seen(apps, schema_editor):
+    # Same merge as services.seen.compact() (without the retention pass): raw rows written
+    # before the rollup existed are folded in, counts summed and the newest placement winning.
+    RecommendationSeen = apps.get_model("spotify_app", "RecommendationSeen")
+    RecommendationSeenRollup = apps.get_model("spotify_app", "RecommendationSeenRollup")
+    while True:
+        raw = list(
+            RecommendationSeen.objects.order_by("spotify_user_id", "track_id")
+            .values_list("id", "spotify_user_id", "track_id", "mood", "intensity", "mode", "seen_at")[:5000]
+        )
+        if not raw:
+            break
+        rows = {}
+        for _id, user_id, tid, mood, intensity, mode, seen_at in raw:
+            row = rows.get((user_id, tid))
+            if row is None:
+                rows[(user_id, tid)] = RecommendationSeenRollup(
+                    spotify_user_id=user_id, track_id=tid, last_mood=mood,
+                    last_intensity=intensity, last_mode=mode, last_seen=seen_at, count=1,
+                )
+                continue
+            row.count += 1
+            if seen_at >= row.last_seen:
+                row.last_mood, row.last_intensity, row.last_mode, row.last_seen = mood, intensity, mode, seen_at
+        by_user = {}
+        for user_id, tid in rows:
+            by_user.setdefault(user_id, []).append(tid)
+        for user_id, track_ids in by_user.items():
+            # Rows already in the rollup: from api_recommend since 0011, or an earlier batch here.
+            for tid, mood, intensity, mode, last_seen, count in RecommendationSeenRollup.objects.filter(
+                spotify_user_id=user_id, track_id__in=track_ids
+            ).values_list("track_id", "last_mood", "last_intensity", "last_mode", "last_seen", "count"):
+                row = rows[(user_id, tid)]
+                row.count += count
+                if last_seen > row.last_seen:
+                    row.last_mood, row.last_intensity, row.last_mode, row.last_seen = mood, intensity, mode, last_seen
+        RecommendationSeenRollup.objects.bulk_create(
+            list(rows.values()),
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["spotify_user_id", "track_id"],
+            update_fields=["last_mood", "last_intensity", "last_mode", "last_seen", "count"],
+        )
+        RecommendationSeen.objects.filter(id__in=[r[0] for r in raw]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0013_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_raw_seen, migrations.RunPython.noop),
+    ]
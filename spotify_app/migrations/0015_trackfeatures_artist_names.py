@@ -0,0 +1,18 @@
+# Generated by Django 5.2.10 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('spotify_app', '0014_fold_recommendationseen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackfeatures',
+            name='artist_names',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
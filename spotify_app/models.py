@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Mood(models.Model):
     name = models.CharField(max_length=50)
@@ -12,6 +13,9 @@ class Mood(models.Model):
         return self.name
 
 
+# Every insert/delete must reach the analytics rollups. bulk_create sends no signals: follow it
+# with services.analytics.added(). Other saves and deletes (admin, Mood cascades) are caught by
+# the signal handlers wired in apps.py; remove_entries() is the batch delete. update() is not seen.
 class MoodEntry(models.Model):
     mood = models.ForeignKey(Mood, on_delete=models.CASCADE, related_name="entries")
     spotify_user_id = models.CharField(max_length=64, blank=True, null=True, db_index=True)
@@ -22,6 +26,8 @@ class MoodEntry(models.Model):
     image = models.URLField(blank=True)
     spotify_url = models.URLField(blank=True)
     added_at = models.DateTimeField(auto_now_add=True)
+    # Individual artist names; "artists" is the display string and can't be split reliably.
+    artist_names = models.JSONField(default=list, blank=True)
 
     def __str__(self):
         return f"{self.mood.name} — {self.track_name}"
@@ -34,7 +40,8 @@ class TrackHistory(models.Model):
     album = models.CharField(max_length=200, blank=True)
     image = models.URLField(blank=True)
     spotify_url = models.URLField(blank=True)
-    played_at = models.DateTimeField(auto_now_add=True)
+    # Set when the play is observed, not when the write-behind buffer flushes it.
+    played_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.track_name} — {self.artists}"
@@ -56,6 +63,26 @@ class RecommendationSeen(models.Model):
         ]
 
 
+class RecommendationSeenRollup(models.Model):
+    # One row per (user, track): where it was last recommended and how often.
+    # Written by api_recommend; compact_recommendations_seen folds raw RecommendationSeen rows in.
+    spotify_user_id = models.CharField(max_length=64)
+    track_id = models.CharField(max_length=64)
+    last_mood = models.CharField(max_length=32, blank=True)
+    last_intensity = models.IntegerField(default=50)
+    last_mode = models.CharField(max_length=16, default="blend")
+    last_seen = models.DateTimeField(default=timezone.now)
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("spotify_user_id", "track_id")
+        indexes = [
+            models.Index(fields=["spotify_user_id", "last_seen"]),
+            models.Index(fields=["spotify_user_id", "last_mood", "last_mode", "last_seen"]),
+            models.Index(fields=["last_seen"]),
+        ]
+
+
 class RecommendationFeedback(models.Model):
     LIKE = 1
     DISLIKE = -1
@@ -77,3 +104,87 @@ class RecommendationFeedback(models.Model):
             models.Index(fields=["spotify_user_id", "mood", "value", "created_at"]),
             models.Index(fields=["spotify_user_id", "value", "created_at"]),
         ]
+
+
+class TrackFeatures(models.Model):
+    # Audio features are global per track, so one row serves every user.
+    track_id = models.CharField(max_length=64, unique=True)
+    danceability = models.FloatField(null=True, blank=True)
+    energy = models.FloatField(null=True, blank=True)
+    valence = models.FloatField(null=True, blank=True)
+    tempo = models.FloatField(null=True, blank=True)
+    acousticness = models.FloatField(null=True, blank=True)
+    instrumentalness = models.FloatField(null=True, blank=True)
+    liveness = models.FloatField(null=True, blank=True)
+    speechiness = models.FloatField(null=True, blank=True)
+    loudness = models.FloatField(null=True, blank=True)
+    # False records that Spotify had no features for the track (negative cache entry)
+    available = models.BooleanField(default=True)
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Display metadata so the local similarity index can return tracks without Spotify.
+    name = models.CharField(max_length=200, blank=True, default="")
+    artists = models.CharField(max_length=200, blank=True, default="")
+    # Individual names, like MoodEntry.artist_names; "artists" is only the display string.
+    artist_names = models.JSONField(default=list, blank=True)
+    artist_id = models.CharField(max_length=64, blank=True, default="")
+    image = models.URLField(blank=True, default="")
+    spotify_url = models.URLField(blank=True, default="")
+
+    def __str__(self):
+        return self.track_id
+
+
+class ArtistGenres(models.Model):
+    # Artist genres are global and change rarely; shared by every user like TrackFeatures.
+    artist_id = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=200, blank=True, default="")
+    genres = models.JSONField(default=list, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.artist_id
+
+
+class PlaylistMirror(models.Model):
+    # Local copy of a mood playlist's track ids, valid while snapshot_id matches Spotify's.
+    playlist_id = models.CharField(max_length=120, unique=True)
+    snapshot_id = models.CharField(max_length=120, blank=True, default="")
+    track_ids = models.JSONField(default=list, blank=True)
+    synced_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.playlist_id
+
+
+# Analytics rollups over MoodEntry, kept in step by services.analytics (see MoodEntry for the
+# write paths it covers; rebuild with the rebuild_analytics command).
+class MoodCountRollup(models.Model):
+    spotify_user_id = models.CharField(max_length=64, blank=True, default="")
+    mood = models.ForeignKey(Mood, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("spotify_user_id", "mood")
+        indexes = [models.Index(fields=["spotify_user_id", "count"])]
+
+
+class MoodArtistRollup(models.Model):
+    spotify_user_id = models.CharField(max_length=64, blank=True, default="")
+    mood = models.ForeignKey(Mood, on_delete=models.CASCADE, related_name="+")
+    artist = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("spotify_user_id", "mood", "artist")
+        indexes = [models.Index(fields=["spotify_user_id", "count"])]
+
+
+class MoodDayRollup(models.Model):
+    spotify_user_id = models.CharField(max_length=64, blank=True, default="")
+    mood = models.ForeignKey(Mood, on_delete=models.CASCADE, related_name="+")
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("spotify_user_id", "mood", "day")
+        indexes = [models.Index(fields=["spotify_user_id", "day"])]
@@ -0,0 +1,143 @@
+import threading
+from collections import Counter
+
+from django.db import transaction
+
+from ..models import MoodArtistRollup, MoodCountRollup, MoodDayRollup, MoodEntry
+
+# Rollups behind api_analytics: entries per mood, per (mood, artist) and per (mood, day).
+# Batch writes go through added()/remove_entries(); single-row saves and deletes (admin,
+# Mood cascades) are caught by the MoodEntry signal handlers below, so reads are lookups.
+ENTRY_FIELDS = ("spotify_user_id", "mood_id", "artists", "artist_names", "added_at")
+
+_local = threading.local()
+
+
+def split_artists(artists: str, artist_names: list | None) -> list[str]:
+    # Entries saved before artist_names existed only have the joined display string.
+    names = artist_names or (artists or "").split(", ")
+    return list(dict.fromkeys(n.strip()[:200] for n in names if n and n.strip()))
+
+
+def _tally(rows) -> tuple[Counter, Counter, Counter]:
+    moods, artists, days = Counter(), Counter(), Counter()
+    for user_id, mood_id, joined, names, added_at in rows:
+        user_id = user_id or ""
+        moods[(user_id, mood_id)] += 1
+        days[(user_id, mood_id, added_at.date())] += 1
+        for name in split_artists(joined, names):
+            artists[(user_id, mood_id, name)] += 1
+    return moods, artists, days
+
+
+def _apply(model, key_fields: tuple[str, ...], deltas: Counter) -> None:
+    # Read current counts, write the new ones; rows that reach zero are removed. Callers hold
+    # a write transaction (IMMEDIATE on SQLite), so the read-modify-write can't interleave.
+    by_user: dict[str, list] = {}
+    for key in deltas:
+        by_user.setdefault(key[0], []).append(key)
+    for user_id, keys in by_user.items():
+        lookup = {"spotify_user_id": user_id, "mood_id__in": {k[1] for k in keys}}
+        if len(key_fields) > 2:
+            lookup[f"{key_fields[2]}__in"] = {k[2] for k in keys}
+        current = {
+            row[:-1]: row[-1]
+            for row in model.objects.filter(**lookup).values_list(*key_fields, "count")
+        }
+        upsert, empty = [], []
+        for key in keys:
+            count = current.get(key, 0) + deltas[key]
+            if count > 0:
+                upsert.append(model(**dict(zip(key_fields, key)), count=count))
+            elif key in current:
+                empty.append(key)
+        if upsert:
+            model.objects.bulk_create(
+                upsert, batch_size=500, update_conflicts=True,
+                unique_fields=list(key_fields), update_fields=["count"],
+            )
+        for key in empty:
+            model.objects.filter(**dict(zip(key_fields, key))).delete()
+
+
+def _apply_all(tallies: tuple[Counter, Counter, Counter], sign: int) -> None:
+    moods, artists, days = (Counter({k: sign * v for k, v in c.items()}) for c in tallies)
+    _apply(MoodCountRollup, ("spotify_user_id", "mood_id"), moods)
+    _apply(MoodArtistRollup, ("spotify_user_id", "mood_id", "artist"), artists)
+    _apply(MoodDayRollup, ("spotify_user_id", "mood_id", "day"), days)
+
+
+def added(entries: list[MoodEntry]) -> None:
+    if entries:
+        with transaction.atomic():
+            _apply_all(_tally([tuple(getattr(e, f) for f in ENTRY_FIELDS) for e in entries]), 1)
+
+
+def remove_entries(queryset) -> int:
+    # Delete the entries and take them out of the rollups in one transaction, as one tally
+    # rather than per row from the post_delete handler.
+    with transaction.atomic():
+        rows = list(queryset.values_list(*ENTRY_FIELDS))
+        if not rows:
+            return 0
+        _local.batch = True
+        try:
+            deleted, _ = queryset.delete()
+        finally:
+            _local.batch = False
+        _apply_all(_tally(rows), -1)
+    return deleted
+
+
+def _row(entry: MoodEntry) -> tuple:
+    return tuple(getattr(entry, f) for f in ENTRY_FIELDS)
+
+
+def entry_before_save(sender, instance, raw=False, **kwargs):
+    # Remember the stored row so an edit moves its counts instead of adding to them.
+    instance._rollup_row = None
+    if not raw and instance.pk is not None and not getattr(_local, "batch", False):
+        instance._rollup_row = MoodEntry.objects.filter(pk=instance.pk).values_list(*ENTRY_FIELDS).first()
+
+
+def entry_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or getattr(_local, "batch", False):
+        return
+    tallies = _tally([_row(instance)])
+    old = getattr(instance, "_rollup_row", None)
+    if old is not None:
+        for counter, before in zip(tallies, _tally([old])):
+            counter.subtract(before)
+        tallies = tuple(Counter({k: v for k, v in c.items() if v}) for c in tallies)
+    with transaction.atomic():
+        _apply_all(tallies, 1)
+
+
+def entry_deleted(sender, instance, **kwargs):
+    if not getattr(_local, "batch", False):
+        _apply_all(_tally([_row(instance)]), -1)
+
+
+def rebuild(user_id: str | None = None) -> dict:
+    # Recompute every rollup (or one user's) from MoodEntry.
+    entries = MoodEntry.objects.all()
+    rollups = (MoodCountRollup, MoodArtistRollup, MoodDayRollup)
+    with transaction.atomic():
+        if user_id is not None:
+            entries = entries.filter(spotify_user_id=user_id)
+        moods, artists, days = _tally(entries.values_list(*ENTRY_FIELDS).iterator(chunk_size=2000))
+        for model in rollups:
+            (model.objects.filter(spotify_user_id=user_id) if user_id is not None else model.objects.all()).delete()
+        MoodCountRollup.objects.bulk_create(
+            [MoodCountRollup(spotify_user_id=u, mood_id=m, count=n) for (u, m), n in moods.items()], batch_size=500
+        )
+        MoodArtistRollup.objects.bulk_create(
+            [MoodArtistRollup(spotify_user_id=u, mood_id=m, artist=a, count=n) for (u, m, a), n in artists.items()],
+            batch_size=500,
+        )
+        MoodDayRollup.objects.bulk_create(
+            [MoodDayRollup(spotify_user_id=u, mood_id=m, day=d, count=n) for (u, m, d), n in days.items()],
+            batch_size=500,
+        )
+    return {"moods": len(moods), "artists": len(artists), "days": len(days)}
+
@@ -0,0 +1,76 @@
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import ArtistGenres
+from .spotify_client import RateLimited, spotify_get_artists_bulk
+
+logger = logging.getLogger(__name__)
+
+
+def _ttl() -> timedelta:
+    return timedelta(days=int(getattr(settings, "ARTIST_GENRES_TTL_DAYS", 30)))
+
+
+def get_cached(artist_ids: list[str]) -> dict[str, list[str]]:
+    # Genres by artist id for fresh rows; expired rows count as misses.
+    ids = [a for a in dict.fromkeys(artist_ids) if a]
+    fresh_after = timezone.now() - _ttl()
+    found: dict[str, list[str]] = {}
+    for i in range(0, len(ids), 500):
+        for artist_id, genres in (
+            ArtistGenres.objects.filter(artist_id__in=ids[i:i + 500], fetched_at__gte=fresh_after)
+            .values_list("artist_id", "genres")
+        ):
+            found[artist_id] = genres or []
+    return found
+
+
+def put(artists: list[dict]) -> None:
+    # Any full Spotify artist object (top artists, /artists) carries genres; keep them all.
+    now = timezone.now()
+    rows = [
+        ArtistGenres(artist_id=a["id"], name=(a.get("name") or "")[:200], genres=a.get("genres") or [], fetched_at=now)
+        for a in artists
+        if a and a.get("id") and "genres" in a
+    ]
+    if not rows:
+        return
+    ArtistGenres.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["artist_id"],
+        update_fields=["name", "genres", "fetched_at"],
+    )
+    if random.random() < float(getattr(settings, "ARTIST_GENRES_EVICT_PROBABILITY", 0.02)):
+        evict()
+
+
+def evict() -> int:
+    deleted, _ = ArtistGenres.objects.filter(fetched_at__lt=timezone.now() - _ttl()).delete()
+    return deleted
+
+
+def get_genres_bulk(token: str, artist_ids: list[str]) -> dict[str, list[str]]:
+    # Store first; misses fetched in concurrent 50-id chunks and written through.
+    ids = [a for a in dict.fromkeys(artist_ids) if a]
+    found = get_cached(ids)
+    misses = [a for a in ids if a not in found]
+    if misses:
+        try:
+            bulk = spotify_get_artists_bulk(token, misses)
+        except RateLimited as e:
+            logger.info("artists fetch for %s ids shed: %s", len(misses), e)
+            return found
+        except Exception as e:
+            logger.warning("artists fetch for %s ids failed: %s", len(misses), e)
+            return found
+        put(bulk["artists"])
+        for a in bulk["artists"]:
+            if a.get("id"):
+                found[a["id"]] = a.get("genres") or []
+    return found
@@ -0,0 +1,361 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+import requests
+from django.core.cache import caches
+
+from . import devices, moods, rec_state, tokens, track_index
+from .ratelimit import RateLimited
+from .spotify_client import get_now_playing, spotify_queue_track
+
+logger = logging.getLogger(__name__)
+
+# Server-managed play queue. The client submits an ordered list once; the pilot keeps AHEAD
+# tracks queued on Spotify and tops up from the rest as playback advances, then from the
+# recommendation pool (rec_state) once the list runs low.
+# The pilot thread lives in the worker that took the last submit; the shared cache carries
+# who owns it, track changes seen by any worker, and a status snapshot for every worker.
+AHEAD = 3
+MAX_AHEAD = 10
+MAX_PENDING = 500
+# Pacing between queue calls, and how long a pilot lingers without playback moving.
+SPACING_S = 0.25
+IDLE_EXIT_S = 600
+# Refill from the recommendation pool once fewer than LOW_WATER tracks are left to feed.
+LOW_WATER = 4
+REFILL_BATCH = 10
+REFILL_RETRY_S = 60
+# While enough is queued, check for track changes from other workers every NOTE_POLL_S; with
+# no change reported for OBSERVE_S (no tab polling), ask Spotify what is playing.
+NOTE_POLL_S = 5
+OBSERVE_S = 30
+# A status snapshot not refreshed for this long belongs to a pilot that is gone.
+SNAPSHOT_STALE_S = 60
+# Queue failures back off exponentially from FAIL_BACKOFF_S; after MAX_FAILURES in a row the pilot gives up.
+FAIL_BACKOFF_S = 10
+MAX_FAILURES = 5
+
+
+class _NoToken(Exception):
+    pass
+
+
+class _Pilot:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.gen = ""
+        self.pending: deque[str] = deque()
+        self.queued: list[str] = []  # sent to Spotify, not yet played (in order)
+        self.history: deque[str] = deque(maxlen=200)  # every uri queued this session
+        self.device_id: str | None = None
+        self.ahead = AHEAD
+        self.current: str | None = None
+        self.last_error: str | None = None
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.refill_after = 0.0
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.last_active = time.monotonic()
+        self.last_note = time.monotonic()
+
+
+_pilots: dict[str, _Pilot] = {}
+_pilots_guard = threading.Lock()
+
+
+def _shared():
+    return caches["shared"]
+
+
+def _key(user_id: str, part: str) -> str:
+    return f"autopilot:{user_id}:{part}"
+
+
+def _track_id(uri: str) -> str:
+    return uri.rsplit(":", 1)[-1]
+
+
+def _pilot(user_id: str) -> _Pilot:
+    with _pilots_guard:
+        pilot = _pilots.get(user_id)
+        if pilot is None:
+            pilot = _pilots[user_id] = _Pilot(user_id)
+            # Taking over from another worker: carry on from its last snapshot.
+            snap = _shared().get(_key(user_id, "state")) or {}
+            if snap.get("active"):
+                pilot.queued = list(snap.get("queued") or [])
+                pilot.history.extend(snap.get("history") or [])
+                pilot.current = snap.get("current")
+                pilot.device_id = snap.get("device_id")
+                pilot.ahead = snap.get("ahead") or AHEAD
+        return pilot
+
+
+def _ensure_thread(pilot: _Pilot) -> None:
+    with _pilots_guard:
+        if pilot.thread is None or not pilot.thread.is_alive():
+            pilot.thread = threading.Thread(target=_run, args=(pilot,), name=f"autopilot-{pilot.user_id}", daemon=True)
+            pilot.thread.start()
+    pilot.wake.set()
+
+
+def _snapshot(pilot: _Pilot) -> dict:
+    with pilot.lock:
+        return {
+            "active": bool(pilot.pending or pilot.queued),
+            "current": pilot.current,
+            "queued": list(pilot.queued),
+            "pending": len(pilot.pending),
+            "ahead": pilot.ahead,
+            "low": len(pilot.pending) < LOW_WATER,
+            "last_error": pilot.last_error,
+        }
+
+
+def _owned(pilot: _Pilot) -> bool:
+    with pilot.lock:
+        return _shared().get(_key(pilot.user_id, "gen")) == pilot.gen
+
+
+def _publish(pilot: _Pilot) -> None:
+    if not _owned(pilot):
+        return
+    with pilot.lock:
+        extra = {"history": list(pilot.history), "device_id": pilot.device_id, "seen_at": time.time()}
+    _shared().set(_key(pilot.user_id, "state"), {**_snapshot(pilot), **extra}, IDLE_EXIT_S)
+
+
+def submit(user_id: str, uris: list[str], device_id: str | None = None, ahead: int | None = None, append: bool = False) -> dict:
+    pilot = _pilot(user_id)
+    with pilot.lock:
+        pilot.failures = 0
+        pilot.last_error = None
+        pilot.refill_after = 0.0
+        # This worker owns the user's pilot now; one running elsewhere retires itself.
+        pilot.gen = uuid.uuid4().hex
+        _shared().set(_key(user_id, "gen"), pilot.gen, None)
+        # Never queue the same track twice: skip what is already queued or playing.
+        skip = set(pilot.queued) | set(pilot.history)
+        if pilot.current:
+            skip.add(f"spotify:track:{pilot.current}")
+        if not append:
+            pilot.pending.clear()
+        skip |= set(pilot.pending)
+        for uri in dict.fromkeys(u for u in uris if u):
+            if uri not in skip and len(pilot.pending) < MAX_PENDING:
+                pilot.pending.append(uri)
+        if device_id:
+            pilot.device_id = device_id
+        if ahead is not None:
+            pilot.ahead = max(1, min(MAX_AHEAD, int(ahead)))
+        pilot.last_active = pilot.last_note = time.monotonic()
+    _publish(pilot)
+    _ensure_thread(pilot)
+    return status(user_id)
+
+
+def stop(user_id: str) -> dict:
+    # Stop topping up, wherever the pilot runs: its owner retires on its next check.
+    _shared().set(_key(user_id, "gen"), uuid.uuid4().hex, None)
+    _shared().delete(_key(user_id, "state"))
+    pilot = _pilots.get(user_id)
+    if pilot:
+        with pilot.lock:
+            pilot.pending.clear()
+        pilot.wake.set()
+    return status(user_id)
+
+
+def _advance(pilot: _Pilot, track_id: str) -> bool:
+    # Playback moved to track_id: drop everything up to it from "queued".
+    with pilot.lock:
+        pilot.last_note = time.monotonic()
+        if track_id == pilot.current:
+            return False
+        pilot.current = track_id
+        ids = [_track_id(u) for u in pilot.queued]
+        if track_id in ids:
+            del pilot.queued[:ids.index(track_id) + 1]
+        else:
+            pending_ids = [_track_id(u) for u in pilot.pending]
+            if track_id in pending_ids:
+                # Played ahead of us (e.g. picked from Up Next): don't queue it again.
+                del pilot.pending[pending_ids.index(track_id)]
+        pilot.last_active = time.monotonic()
+    return True
+
+
+def note_track(user_id: str | None, track_id: str | None) -> dict | None:
+    # Any worker can see the track change; the owning worker's pilot picks it up from the cache.
+    if not user_id or not track_id:
+        return None
+    _shared().set(_key(user_id, "current"), track_id, IDLE_EXIT_S)
+    pilot = _pilots.get(user_id)
+    if pilot is None:
+        return None
+    if _advance(pilot, track_id):
+        _publish(pilot)
+    _ensure_thread(pilot)
+    return status(user_id)
+
+
+def status(user_id: str | None) -> dict:
+    if not user_id:
+        return {"active": False}
+    pilot = _pilots.get(user_id)
+    if pilot is not None and pilot.thread is not None and pilot.thread.is_alive():
+        return _snapshot(pilot)
+    snap = _shared().get(_key(user_id, "state"))
+    if not snap:
+        return {"active": False}
+    if snap.get("active") and time.time() - snap.get("seen_at", 0) > SNAPSHOT_STALE_S:
+        return {"active": False}
+    return {k: v for k, v in snap.items() if k not in ("history", "device_id", "seen_at")}
+
+
+def _next_uri(pilot: _Pilot) -> str | None:
+    with pilot.lock:
+        if len(pilot.queued) >= pilot.ahead or not pilot.pending:
+            return None
+        if time.monotonic() < pilot.blocked_until:
+            return None
+        return pilot.pending[0]
+
+
+def _queue_one(pilot: _Pilot, uri: str) -> None:
+    token = tokens.get_token(pilot.user_id)
+    if not token:
+        raise _NoToken("No Spotify token for user")
+    device_id = devices.run(
+        pilot.user_id, token, lambda d: spotify_queue_track(token, uri, device_id=d), pilot.device_id
+    )
+    if not device_id:
+        raise RuntimeError("No active Spotify device found.")
+    with pilot.lock:
+        if pilot.pending and pilot.pending[0] == uri:
+            pilot.pending.popleft()
+        pilot.queued.append(uri)
+        pilot.history.append(uri)
+        pilot.device_id = device_id
+        pilot.last_error = None
+        pilot.failures = 0
+
+
+def _refill(pilot: _Pilot) -> None:
+    # Running low: take the next ranked tracks from the user's recommendation pool, else
+    # local-index neighbours of what has been playing (no upstream calls either way).
+    with pilot.lock:
+        if len(pilot.pending) >= LOW_WATER or time.monotonic() < pilot.refill_after:
+            return
+        skip = set(pilot.pending) | set(pilot.queued) | set(pilot.history)
+        if pilot.current:
+            skip.add(f"spotify:track:{pilot.current}")
+        seeds = [_track_id(u) for u in list(pilot.history)[-10:]] + ([pilot.current] if pilot.current else [])
+    uris = rec_state.take(pilot.user_id, REFILL_BATCH, skip)
+    ctx = rec_state.context(pilot.user_id)
+    if not uris and ctx is not None:
+        mood, intensity, mode = ctx
+        exclude = {_track_id(u) for u in skip} | set(rec_state.seen_ids(pilot.user_id, mood, intensity, mode))
+        tracks, _features = track_index.candidates(moods.profile(mood, intensity).params, seeds, REFILL_BATCH, exclude)
+        uris = [f"spotify:track:{t['id']}" for t in tracks][:REFILL_BATCH]
+        rec_state.extend(pilot.user_id, mood, intensity, mode, [t["id"] for t in tracks[:REFILL_BATCH]])
+    with pilot.lock:
+        for uri in uris:
+            if uri not in skip and len(pilot.pending) < MAX_PENDING:
+                pilot.pending.append(uri)
+        if not uris:
+            pilot.refill_after = time.monotonic() + REFILL_RETRY_S
+
+
+def _observe(pilot: _Pilot) -> None:
+    # Pick up track changes reported by any worker; with none for a while, ask Spotify.
+    current = _shared().get(_key(pilot.user_id, "current"))
+    if current and current != pilot.current:
+        _advance(pilot, current)
+        return
+    if not pilot.queued or time.monotonic() - pilot.last_note < OBSERVE_S:
+        return
+    pilot.last_note = time.monotonic()
+    token = tokens.get_token(pilot.user_id)
+    if not token:
+        raise _NoToken("No Spotify token for user")
+    item = (get_now_playing(token) or {}).get("item") or {}
+    if item.get("id"):
+        _shared().set(_key(pilot.user_id, "current"), item["id"], IDLE_EXIT_S)
+        _advance(pilot, item["id"])
+
+
+def _retire(pilot: _Pilot, error: str | None = None) -> None:
+    # Drop the pilot: nothing more will be queued until the client submits again.
+    with pilot.lock:
+        pilot.pending.clear()
+        pilot.queued.clear()
+        if error:
+            pilot.last_error = error
+    _publish(pilot)
+    with _pilots_guard:
+        if _pilots.get(pilot.user_id) is pilot:
+            _pilots.pop(pilot.user_id, None)
+
+
+def _wait_s(pilot: _Pilot) -> float:
+    with pilot.lock:
+        blocked = pilot.blocked_until - time.monotonic()
+        if blocked > 0:
+            return min(NOTE_POLL_S, blocked)
+        if pilot.pending and len(pilot.queued) < pilot.ahead:
+            return SPACING_S
+    # Enough queued ahead (or nothing to feed): wait for a note, a submit, or the next check.
+    return NOTE_POLL_S
+
+
+def _run(pilot: _Pilot) -> None:
+    while True:
+        pilot.wake.clear()  # before checking, so a submit that lands meanwhile still wakes us
+        if not _owned(pilot):
+            # Superseded by a submit or stop on another worker.
+            with _pilots_guard:
+                if _pilots.get(pilot.user_id) is pilot:
+                    _pilots.pop(pilot.user_id, None)
+            return
+        if time.monotonic() - pilot.last_active > IDLE_EXIT_S:
+            # No submit and no track change for a while: stop, even with tracks pending.
+            _retire(pilot)
+            return
+        try:
+            _observe(pilot)
+            _refill(pilot)
+        except _NoToken as e:
+            _retire(pilot, str(e))
+            return
+        except (requests.RequestException, RateLimited) as e:
+            logger.info("autopilot for %s could not check playback: %s", pilot.user_id, e)
+        _publish(pilot)
+        uri = _next_uri(pilot)
+        if uri is None:
+            pilot.wake.wait(timeout=_wait_s(pilot))
+            continue
+        try:
+            _queue_one(pilot, uri)
+        except _NoToken as e:
+            # Auth is gone; retrying would only keep refreshing a dead token.
+            _retire(pilot, str(e))
+            return
+        except RateLimited as e:
+            pilot.blocked_until = time.monotonic() + max(1.0, e.retry_after or 0)
+            pilot.last_error = str(e)
+        except (requests.RequestException, RuntimeError) as e:
+            # Device gone / request failing: back off, and give up after MAX_FAILURES in a row.
+            pilot.failures += 1
+            pilot.last_error = str(e)
+            logger.info("autopilot for %s paused (%s in a row): %s", pilot.user_id, pilot.failures, e)
+            if pilot.failures >= MAX_FAILURES:
+                _retire(pilot)
+                return
+            pilot.blocked_until = time.monotonic() + FAIL_BACKOFF_S * 2 ** (pilot.failures - 1)
+        time.sleep(SPACING_S)
@@ -0,0 +1,32 @@
+from . import swr
+from .spotify_client import spotify_get_available_genre_seeds, spotify_get_markets
+
+# Catalog-static responses: fresh for a week, then served stale for up to 30 days more
+# while one worker refreshes them in the background (services.swr).
+GENRE_SEEDS_TTL_S = 7 * 24 * 3600
+MARKETS_TTL_S = 7 * 24 * 3600
+STALE_S = 30 * 24 * 3600
+
+_hits = {"fresh": 0, "stale": 0, "miss": 0}
+
+
+def _key(name: str) -> str:
+    return f"spotify_catalog:{name}"
+
+
+def stats() -> dict:
+    return swr.counts(_hits)
+
+
+def genre_seeds(token: str) -> list[str]:
+    return swr.cached(
+        _key("genre_seeds"), GENRE_SEEDS_TTL_S, STALE_S,
+        lambda: spotify_get_available_genre_seeds(token).get("genres", []), _hits,
+    )
+
+
+def markets(token: str) -> list[str]:
+    return swr.cached(
+        _key("markets"), MARKETS_TTL_S, STALE_S,
+        lambda: spotify_get_markets(token).get("markets", []), _hits,
+    )
@@ -0,0 +1,82 @@
+from typing import Callable
+
+import requests
+from django.core.cache import caches
+
+from .spotify_client import spotify_get_devices
+
+# How long a remembered active device is trusted without hearing about it again. Now-playing
+# polls refresh it while music plays; this bounds staleness when nobody is polling.
+DEVICE_TTL_S = 120
+
+
+def _store():
+    return caches["shared"]
+
+
+def _key(user_id: str) -> str:
+    return f"spotify_device:{user_id}"
+
+
+def cached(user_id: str | None) -> str | None:
+    return _store().get(_key(user_id)) if user_id else None
+
+
+def remember(user_id: str | None, device_id: str | None) -> None:
+    if user_id and device_id:
+        _store().set(_key(user_id), device_id, DEVICE_TTL_S)
+
+
+def forget(user_id: str | None) -> None:
+    if user_id:
+        _store().delete(_key(user_id))
+
+
+def pick(devices: list[dict]) -> str | None:
+    active = next((d for d in devices if d.get("is_active")), None)
+    if active:
+        return active.get("id")
+    return devices[0].get("id") if devices else None
+
+
+def note_devices(user_id: str | None, payload: dict | None) -> None:
+    # /me/player/devices response
+    remember(user_id, pick((payload or {}).get("devices", []) or []))
+
+
+def note_player_state(user_id: str | None, player: dict | None) -> None:
+    # /me/player response: the device is only worth remembering while it is active
+    device = (player or {}).get("device") or {}
+    if device.get("is_active"):
+        remember(user_id, device.get("id"))
+
+
+def resolve(user_id: str | None, token: str) -> str | None:
+    device_id = cached(user_id)
+    if device_id:
+        return device_id
+    payload = spotify_get_devices(token)
+    device_id = pick(payload.get("devices", []) or [])
+    remember(user_id, device_id)
+    return device_id
+
+
+def run(user_id: str | None, token: str, call: Callable[[str], object], device_id: str | None = None) -> str | None:
+    # Issue a playback control against the explicit or remembered device (one upstream call).
+    # A 404 means the device went away or playback moved (even from an explicit device_id):
+    # ask Spotify for the active device once and retry there.
+    device_id = device_id or resolve(user_id, token)
+    if not device_id:
+        return None
+    try:
+        call(device_id)
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 404:
+            raise
+        forget(user_id)
+        device_id = resolve(user_id, token)
+        if not device_id:
+            return None
+        call(device_id)
+    remember(user_id, device_id)
+    return device_id
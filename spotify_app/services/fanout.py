@@ -0,0 +1,105 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connections
+
+
+def _max_workers(n: int) -> int:
+    return max(1, min(n, int(getattr(settings, "SPOTIFY_FANOUT_WORKERS", 8))))
+
+
+def _closing(fn: Callable[[], Any]) -> Any:
+    # Worker threads are short-lived; release any DB connection the task opened.
+    try:
+        return fn()
+    finally:
+        connections.close_all()
+
+
+def _timed(fn: Callable[[], Any]) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = _closing(fn)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def start_gather(calls: dict[str, Callable[[], Any]]) -> Callable[[float | None], tuple[dict, dict, dict]]:
+    # Start independent upstream calls now and return join(timeout), which collects them like
+    # gather(). The deadline counts from the start, so work the caller does meanwhile overlaps.
+    if not calls:
+        return lambda timeout=None: ({}, {}, {})
+    pool = ThreadPoolExecutor(max_workers=_max_workers(len(calls)), thread_name_prefix="spotify-fanout")
+    started = time.perf_counter()
+    futures = {pool.submit(_timed, fn): name for name, fn in calls.items()}
+
+    def join(timeout: float | None = None) -> tuple[dict, dict, dict]:
+        if timeout is None:
+            timeout = float(getattr(settings, "SPOTIFY_GATHER_TIMEOUT", 8))
+        results: dict[str, Any] = {}
+        errors: dict[str, BaseException] = {}
+        timings: dict[str, float] = {}
+        try:
+            done, pending = wait(futures, timeout=max(0.0, started + timeout - time.perf_counter()))
+            for fut in done:
+                name = futures[fut]
+                try:
+                    results[name], timings[name] = fut.result()
+                except Exception as e:
+                    errors[name] = e
+                    timings[name] = (time.perf_counter() - started) * 1000
+            for fut in pending:
+                name = futures[fut]
+                errors[name] = TimeoutError(f"{name} exceeded {timeout:.1f}s deadline")
+                timings[name] = timeout * 1000
+        finally:
+            # Never block the request on stragglers; they finish (or are dropped) in the background.
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results, errors, timings
+
+    return join
+
+
+def gather(calls: dict[str, Callable[[], Any]], timeout: float | None = None) -> tuple[dict, dict, dict]:
+    # Run independent upstream calls concurrently and join them against one deadline.
+    # Returns (results, errors, timings_ms); calls still running at the deadline land in errors.
+    return start_gather(calls)(timeout)
+
+
+def produce_until(
+    jobs: list[Callable[[], Any]],
+    accept: Callable[[Any], bool],
+    timeout: float | None = None,
+) -> dict:
+    # Dispatch producer jobs concurrently and hand each result to accept() (on the calling
+    # thread) as it completes. Stops early once accept() returns True; unstarted jobs are cancelled.
+    stats = {"dispatched": len(jobs), "completed": 0, "failed": 0, "cancelled": 0, "last_error": None}
+    if not jobs:
+        return stats
+    if timeout is None:
+        timeout = float(getattr(settings, "SPOTIFY_GATHER_TIMEOUT", 8))
+
+    pool = ThreadPoolExecutor(max_workers=_max_workers(len(jobs)), thread_name_prefix="spotify-producer")
+    try:
+        pending = {pool.submit(_closing, fn) for fn in jobs}
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    stats["last_error"] = str(e)
+                    continue
+                stats["completed"] += 1
+                if accept(result):
+                    stats["cancelled"] = sum(1 for f in pending if f.cancel())
+                    return stats
+        stats["cancelled"] = sum(1 for f in pending if f.cancel())
+        return stats
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
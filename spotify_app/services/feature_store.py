@@ -0,0 +1,203 @@
+import logging
+import random
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import TrackFeatures
+from .spotify_client import RateLimited, get_audio_features, spotify_get_audio_features_bulk
+
+logger = logging.getLogger(__name__)
+
+FEATURE_KEYS = (
+    "danceability",
+    "energy",
+    "valence",
+    "tempo",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+    "loudness",
+)
+
+
+def _ttl() -> timedelta:
+    return timedelta(days=int(getattr(settings, "TRACK_FEATURES_TTL_DAYS", 90)))
+
+
+def _missing_ttl() -> timedelta:
+    return timedelta(hours=int(getattr(settings, "TRACK_FEATURES_MISSING_TTL_HOURS", 24)))
+
+
+def _to_dict(row: TrackFeatures) -> dict:
+    out = {"id": row.track_id}
+    for k in FEATURE_KEYS:
+        out[k] = getattr(row, k)
+    return out
+
+
+def get_cached(track_ids: list[str]) -> tuple[dict[str, dict], set[str]]:
+    # Returns (features by id, ids known to have no features). Expired rows count as misses.
+    ids = [t for t in dict.fromkeys(track_ids) if t]
+    if not ids:
+        return {}, set()
+    now = timezone.now()
+    fresh_after = now - _ttl()
+    missing_after = now - _missing_ttl()
+    found: dict[str, dict] = {}
+    known_missing: set[str] = set()
+    # Stay well under SQLite's bound-parameter limit.
+    for i in range(0, len(ids), 500):
+        for row in TrackFeatures.objects.filter(track_id__in=ids[i:i + 500]):
+            if row.available and row.fetched_at >= fresh_after:
+                found[row.track_id] = _to_dict(row)
+            elif not row.available and row.fetched_at >= missing_after:
+                known_missing.add(row.track_id)
+    return found, known_missing
+
+
+def put(features: list[dict], missing: list[str] | None = None) -> None:
+    now = timezone.now()
+    rows = []
+    for f in features:
+        if not f or not f.get("id"):
+            continue
+        rows.append(TrackFeatures(
+            track_id=f["id"],
+            available=True,
+            fetched_at=now,
+            **{k: (float(f[k]) if f.get(k) is not None else None) for k in FEATURE_KEYS},
+        ))
+    missing_ids = [t for t in dict.fromkeys(missing or []) if t]
+    if not rows and not missing_ids:
+        return
+    if rows:
+        TrackFeatures.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["track_id"],
+            update_fields=[*FEATURE_KEYS, "available", "fetched_at"],
+        )
+    if missing_ids:
+        _put_missing(missing_ids, now)
+    # Amortized eviction instead of a scheduled job.
+    if random.random() < float(getattr(settings, "TRACK_FEATURES_EVICT_PROBABILITY", 0.02)):
+        evict()
+
+
+def _put_missing(track_ids: list[str], now) -> None:
+    # Negative entries only touch the flag and timestamp, and never replace fresh features.
+    fresh_after = now - _ttl()
+    with transaction.atomic():
+        have: set[str] = set()
+        for i in range(0, len(track_ids), 500):
+            have.update(TrackFeatures.objects.filter(
+                track_id__in=track_ids[i:i + 500], available=True, fetched_at__gte=fresh_after
+            ).values_list("track_id", flat=True))
+        TrackFeatures.objects.bulk_create(
+            [TrackFeatures(track_id=t, available=False, fetched_at=now) for t in track_ids if t not in have],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["track_id"],
+            update_fields=["available", "fetched_at"],
+        )
+
+
+def _meta(track: dict) -> dict:
+    artists = [a for a in track.get("artists") or [] if isinstance(a, dict)]
+    names = [a["name"] for a in artists if a.get("name")]
+    return {
+        "name": (track.get("name") or "")[:200],
+        "artists": ", ".join(names)[:200],
+        "artist_names": names,
+        "artist_id": (artists[0].get("id") or "") if artists else "",
+        "image": ((track.get("album") or {}).get("images") or [{}])[0].get("url") or "",
+        "spotify_url": (track.get("external_urls") or {}).get("spotify") or "",
+    }
+
+
+def describe(tracks: list[dict]) -> int:
+    # Attach display metadata (from Spotify track objects) to stored rows that lack it.
+    by_id = {t["id"]: t for t in tracks if t and t.get("id") and t.get("name")}
+    if not by_id:
+        return 0
+    rows = []
+    ids = list(by_id)
+    for i in range(0, len(ids), 500):
+        for row in TrackFeatures.objects.filter(
+            Q(name="") | Q(artist_names=[]), track_id__in=ids[i:i + 500], available=True
+        ):
+            for k, v in _meta(by_id[row.track_id]).items():
+                setattr(row, k, v)
+            rows.append(row)
+    if rows:
+        TrackFeatures.objects.bulk_update(
+            rows, ["name", "artists", "artist_names", "artist_id", "image", "spotify_url"], batch_size=500
+        )
+    return len(rows)
+
+
+def evict() -> int:
+    now = timezone.now()
+    deleted, _ = TrackFeatures.objects.filter(available=True, fetched_at__lt=now - _ttl()).delete()
+    d2, _ = TrackFeatures.objects.filter(available=False, fetched_at__lt=now - _missing_ttl()).delete()
+    deleted += d2
+    max_rows = int(getattr(settings, "TRACK_FEATURES_MAX_ROWS", 200_000))
+    overflow = TrackFeatures.objects.count() - max_rows
+    if overflow > 0:
+        oldest = TrackFeatures.objects.order_by("fetched_at").values_list("id", flat=True)[:overflow]
+        d3, _ = TrackFeatures.objects.filter(id__in=list(oldest)).delete()
+        deleted += d3
+    return deleted
+
+
+def get_features(token: str, track_id: str) -> dict | None:
+    found, known_missing = get_cached([track_id])
+    if track_id in found:
+        return found[track_id]
+    if track_id in known_missing:
+        return None
+    f = get_audio_features(track_id, token)
+    if f is None:
+        # 403: denied for this token, not a track without features; don't cache it.
+        return None
+    if f.get("id"):
+        put([f])
+        return {"id": f["id"], **{k: f.get(k) for k in FEATURE_KEYS}}
+    put([], missing=[track_id])
+    return None
+
+
+def get_features_bulk(token: str, track_ids: list[str]) -> dict[str, dict]:
+    # Store first, upstream only for misses, write-through so other users get the hit.
+    ids = [t for t in dict.fromkeys(track_ids) if t]
+    found, known_missing = get_cached(ids)
+    misses = [t for t in ids if t not in found and t not in known_missing]
+    if misses:
+        try:
+            bulk = spotify_get_audio_features_bulk(token, misses)
+        except RateLimited as e:
+            # Shed under rate limiting: rank with what the store already has.
+            logger.info("audio-features fetch for %s ids shed: %s", len(misses), e)
+            return found
+        except requests.RequestException as e:
+            # Every chunk failed (e.g. 403): nothing is known about these ids, so nothing is cached.
+            logger.warning("audio-features fetch for %s ids failed: %s", len(misses), e)
+            return found
+        for chunk in bulk.get("chunks", []):
+            if "error" in chunk:
+                logger.warning("audio-features chunk at offset %s (%s ids) failed after %sms: %s",
+                               chunk["offset"], chunk["size"], chunk["ms"], chunk["error"])
+        fetched = [f for f in bulk.get("audio_features", []) if f.get("id")]
+        # Ids from failed chunks are unknown, not missing; only negatively cache real gaps.
+        skip = {f["id"] for f in fetched} | set(bulk.get("failed_ids", []))
+        put(fetched, missing=[t for t in misses if t not in skip])
+        for f in fetched:
+            found[f["id"]] = {"id": f["id"], **{k: f.get(k) for k in FEATURE_KEYS}}
+    return found
@@ -0,0 +1,139 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.utils import timezone
+
+from ..models import TrackHistory
+
+logger = logging.getLogger(__name__)
+
+# Write-behind log of played tracks: polls enqueue, one thread per worker bulk-inserts.
+# The last track logged per user lives in the shared cache so every tab and worker agrees on it.
+LAST_TTL_S = 6 * 3600
+# Rows held while the DB is unavailable; the oldest are dropped beyond this.
+MAX_BUFFER = 5000
+# Sightings of the same track for a user this close together are one play.
+PLAY_WINDOW_S = 60
+
+_buffer: list[TrackHistory] = []
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher: threading.Thread | None = None
+
+
+def _interval() -> float:
+    return float(getattr(settings, "HISTORY_FLUSH_INTERVAL_S", 2.0))
+
+
+def _batch_size() -> int:
+    return int(getattr(settings, "HISTORY_FLUSH_SIZE", 50))
+
+
+def _last_key(user_id: str) -> str:
+    return f"history_last:{user_id}"
+
+
+def _row(user_id: str, track: dict) -> TrackHistory:
+    return TrackHistory(
+        spotify_user_id=user_id,
+        track_id=track["id"],
+        track_name=(track.get("name") or "")[:200],
+        artists=", ".join(track.get("artists") or [])[:200],
+        album=(track.get("album") or "")[:200],
+        image=track.get("image") or "",
+        spotify_url=track.get("spotify_url") or "",
+        played_at=timezone.now(),
+    )
+
+
+def record_if_new(user_id: str, track: dict) -> bool:
+    # True when the track differs from the one last seen for this user; the play is queued once
+    # per PLAY_WINDOW_S. Two polls can both get past the get(): add() settles it where the backend
+    # makes it atomic, and the flusher drops whatever still gets through. Never touches the DB.
+    track_id = track.get("id")
+    cache = caches["shared"]
+    if not track_id or cache.get(_last_key(user_id)) == track_id:
+        return False
+    cache.set(_last_key(user_id), track_id, LAST_TTL_S)
+    if cache.add(f"{_last_key(user_id)}:{track_id}", 1, PLAY_WINDOW_S):
+        _enqueue(_row(user_id, track))
+    return True
+
+
+def _enqueue(row: TrackHistory) -> None:
+    global _flusher
+    with _lock:
+        _buffer.append(row)
+        if len(_buffer) > MAX_BUFFER:
+            del _buffer[:len(_buffer) - MAX_BUFFER]
+        full = len(_buffer) >= _batch_size()
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="history-flush", daemon=True)
+            _flusher.start()
+    if full:
+        _wake.set()
+
+
+def _unlogged(rows: list[TrackHistory]) -> list[TrackHistory]:
+    # Drop rows repeating a (user, track) play already logged within PLAY_WINDOW_S, by another
+    # worker or earlier in this batch. Called inside the flush transaction (IMMEDIATE on SQLite),
+    # so two flushers can't both pass the check.
+    window = timedelta(seconds=PLAY_WINDOW_S)
+    logged: dict[tuple, list] = {}
+    for user_id, track_id, played_at in TrackHistory.objects.filter(
+        spotify_user_id__in={r.spotify_user_id for r in rows},
+        track_id__in={r.track_id for r in rows},
+        played_at__gte=min(r.played_at for r in rows) - window,
+    ).values_list("spotify_user_id", "track_id", "played_at"):
+        logged.setdefault((user_id, track_id), []).append(played_at)
+    fresh = []
+    for row in sorted(rows, key=lambda r: r.played_at):
+        seen = logged.setdefault((row.spotify_user_id, row.track_id), [])
+        if not any(abs(row.played_at - t) < window for t in seen):
+            seen.append(row.played_at)
+            fresh.append(row)
+    return fresh
+
+
+def flush() -> int:
+    # Write everything queued so far; rows are put back if the insert fails.
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+    if not rows:
+        return 0
+    try:
+        with transaction.atomic():
+            fresh = _unlogged(rows)
+            TrackHistory.objects.bulk_create(fresh, batch_size=500)
+    except Exception as e:
+        logger.warning("history flush of %s rows failed: %s", len(rows), e)
+        with _lock:
+            _buffer[:] = (rows + _buffer)[-MAX_BUFFER:]
+        return 0
+    return len(fresh)
+
+
+def pending() -> int:
+    with _lock:
+        return len(_buffer)
+
+
+def _flush_loop() -> None:
+    while True:
+        _wake.wait(timeout=_interval())
+        _wake.clear()
+        try:
+            flush()
+        finally:
+            connections.close_all()
+        time.sleep(0.05)  # coalesce bursts that hit the size threshold back to back
+
+
+atexit.register(flush)
@@ -0,0 +1,68 @@
+import itertools
+import logging
+import threading
+
+from . import swr
+from .spotify_client import spotify_get_recently_played, spotify_get_top_artists, spotify_get_top_tracks
+
+# Per-user listening-profile snapshot. Each section is fetched at Spotify's max page size once
+# and sliced per caller, so e.g. limit=30 and limit=40 share one entry.
+FETCH_LIMIT = 50
+TOP_TTL_S = {"short_term": 3600, "medium_term": 12 * 3600, "long_term": 24 * 3600}
+TOP_STALE_S = 7 * 24 * 3600
+RECENT_TTL_S = 90
+RECENT_STALE_S = 15 * 60
+# Process-wide hit counts go to the log (never into a user's response) every this many lookups.
+STATS_LOG_EVERY = 500
+
+logger = logging.getLogger(__name__)
+
+_hits: dict[str, dict[str, int]] = {}
+_hits_guard = threading.Lock()
+_lookups = itertools.count(1)
+
+
+def _key(user_id: str, section: str) -> str:
+    return f"spotify_profile:{user_id}:{section}"
+
+
+def _section(user_id: str | None, section: str, ttl: int, stale: int, fetch, limit: int) -> dict:
+    if not user_id:
+        return {"items": (fetch().get("items", []) or [])[:limit]}
+    with _hits_guard:
+        hits = _hits.setdefault(section, {"fresh": 0, "stale": 0, "miss": 0})
+    items = swr.cached(_key(user_id, section), ttl, stale, lambda: fetch().get("items", []) or [], hits)
+    lookups = next(_lookups)
+    if lookups % STATS_LOG_EVERY == 0:
+        logger.info("profile cache after %s lookups: %s", lookups, stats())
+    return {"items": items[:limit]}
+
+
+def top_tracks(user_id: str | None, token: str, time_range: str = "medium_term", limit: int = 20) -> dict:
+    return _section(
+        user_id, f"top_tracks:{time_range}", TOP_TTL_S.get(time_range, 3600), TOP_STALE_S,
+        lambda: spotify_get_top_tracks(token, time_range=time_range, limit=FETCH_LIMIT), limit,
+    )
+
+
+def top_artists(user_id: str | None, token: str, time_range: str = "medium_term", limit: int = 20) -> dict:
+    return _section(
+        user_id, f"top_artists:{time_range}", TOP_TTL_S.get(time_range, 3600), TOP_STALE_S,
+        lambda: spotify_get_top_artists(token, time_range=time_range, limit=FETCH_LIMIT), limit,
+    )
+
+
+def recently_played(user_id: str | None, token: str, limit: int = 20) -> dict:
+    return _section(
+        user_id, "recent", RECENT_TTL_S, RECENT_STALE_S,
+        lambda: spotify_get_recently_played(token, limit=FETCH_LIMIT), limit,
+    )
+
+
+def stats() -> dict:
+    # Per-section fresh/stale/miss counts for this process, plus the overall hit rate.
+    with _hits_guard:
+        sections = {name: swr.counts(counts) for name, counts in _hits.items()}
+    total = sum(sum(c.values()) for c in sections.values())
+    served = sum(c["fresh"] + c["stale"] for c in sections.values())
+    return {"sections": sections, "hit_rate": round(served / total, 3) if total else None}
@@ -0,0 +1,351 @@
+import operator
+from functools import lru_cache
+
+import numpy as np
+
+# Mood knowledge as data. Intensity-dependent numbers are written as (value at intensity 0,
+# value at intensity 100) and interpolated; plain numbers are constant. Entry order is the
+# order moods are tried when classifying a track from its features.
+#
+#   classify     feature conditions (all must hold) that label a track with this mood
+#   params       Spotify /recommendations tunables; *_popularity values are ints
+#   genres       seed genres at low and high intensity, most important first
+#   gate         hard feature limits: feature -> (min, max), either side may be None
+#   gate_exclude conjunctions that reject a track even inside the gate
+#   post_exclude conjunctions rejected in the final pass after late expansions
+#   search_terms catalog search queries when recommendations come up short
+MOODS: dict[str, dict] = {
+    "hype": {
+        "classify": [("energy", ">=", 0.75), ("danceability", ">=", 0.65), ("valence", ">=", 0.55)],
+        "params": {
+            # Low intensity = bouncy/upbeat, high intensity = aggressive/fast
+            "target_energy": (0.70, 0.95),
+            "min_energy": (0.55, 0.85),
+            "target_danceability": (0.70, 0.85),
+            "min_danceability": (0.55, 0.70),
+            "target_valence": (0.70, 0.55),
+            "min_valence": (0.50, 0.35),
+            "target_tempo": (115, 165),
+            "min_tempo": (100, 130),
+            "target_loudness": (-9, -5),
+            "max_acousticness": (0.45, 0.15),
+            "min_popularity": (35, 70),
+        },
+        "genres": {
+            "low": ["reggaeton", "latin", "urbano latino", "dancehall", "hip-hop"],
+            "high": ["reggaeton", "latin", "dancehall", "trap", "edm"],
+        },
+        "gate": {
+            "energy": ((0.60, 0.80), None),
+            "danceability": ((0.60, 0.70), None),
+            "tempo": ((100, 110), 175),
+            "acousticness": (None, 0.35),
+            "valence": (0.30, None),
+        },
+        "search_terms": ["hype", "turn up", "party", "club", "banger", "dance"],
+        "search_rescue": True,
+    },
+    "menacing": {
+        "classify": [("energy", ">=", 0.70), ("valence", "<=", 0.35)],
+        "params": {
+            # Hard-hitting trap: aggressive, low valence, loud
+            "target_energy": (0.70, 0.97),
+            "min_energy": (0.55, 0.85),
+            "target_valence": (0.22, 0.08),
+            "max_valence": (0.32, 0.18),
+            "target_loudness": (-9, -4),
+            "target_tempo": (100, 160),
+            "min_tempo": (90, 125),
+            "max_acousticness": (0.35, 0.10),
+            "target_speechiness": (0.08, 0.25),
+            "min_popularity": (20, 50),
+        },
+        "genres": {
+            "low": ["trap", "hip-hop", "drill", "industrial", "dark trap"],
+            "high": ["trap", "drill", "hip-hop", "industrial", "dark trap"],
+        },
+        "gate": {
+            "energy": ((0.70, 0.85), None),
+            "tempo": ((100, 115), 170),
+            "acousticness": (None, 0.30),
+            "valence": (None, 0.25),
+        },
+        "search_terms": ["dark", "aggressive", "industrial", "hard", "ominous"],
+        "lean_personal": True,
+    },
+    "sad": {
+        "classify": [("valence", "<=", 0.30), ("energy", "<=", 0.50)],
+        "params": {
+            # Deep heartbreak: low valence, slow, softer
+            "target_energy": (0.28, 0.15),
+            "max_energy": (0.40, 0.25),
+            "target_valence": (0.18, 0.06),
+            "max_valence": (0.25, 0.15),
+            "target_acousticness": (0.60, 0.90),
+            "min_acousticness": (0.45, 0.70),
+            "target_tempo": (85, 60),
+            "max_tempo": (100, 80),
+            "target_instrumentalness": (0.10, 0.35),
+            "max_popularity": (85, 60),
+        },
+        "genres": {
+            "low": ["sad", "heartbreak", "singer-songwriter", "piano", "acoustic"],
+            "high": ["sad", "heartbreak", "piano", "acoustic", "singer-songwriter"],
+        },
+        "gate": {
+            "energy": (None, (0.35, 0.25)),
+            "tempo": (None, (95, 85)),
+            "valence": (None, (0.30, 0.25)),
+        },
+        "search_terms": ["sad", "heartbreak", "melancholy", "slow", "tearful"],
+        "lean_personal": True,
+    },
+    "chill": {
+        "classify": [("energy", "<=", 0.45), ("tempo", ">", 0), ("tempo", "<=", 110)],
+        "params": {
+            # Smooth, smoky, slow vibe
+            "target_energy": (0.45, 0.25),
+            "max_energy": (0.55, 0.35),
+            "target_valence": (0.55, 0.45),
+            "target_tempo": (100, 70),
+            "max_tempo": (115, 90),
+            "target_acousticness": (0.30, 0.60),
+            "min_acousticness": (0.15, 0.35),
+            "target_instrumentalness": (0.03, 0.25),
+            "max_popularity": (90, 70),
+        },
+        "genres": {
+            "low": ["chill", "r-n-b", "lofi", "ambient", "downtempo"],
+            "high": ["r-n-b", "chill", "lofi", "ambient", "downtempo"],
+        },
+        "gate": {
+            "energy": (0.20, (0.58, 0.46)),
+            "danceability": (0.35, 0.82),
+            "tempo": (65, (112, 100)),
+            "valence": (0.20, 0.78),
+        },
+        # Block upbeat/perreo leakage after expansions.
+        "post_exclude": [
+            [("energy", ">", 0.56)],
+            [("tempo", ">", 112)],
+            [("speechiness", ">", 0.18)],
+            [("danceability", ">", 0.78), ("energy", ">", 0.48)],
+        ],
+        "search_terms": ["chill", "lofi", "ambient", "relax", "downtempo"],
+        "lean_personal": True,
+    },
+    "romantic": {
+        "classify": [("valence", ">=", 0.55), ("energy", "<=", 0.65)],
+        "params": {
+            # Feel-good Latin/R&B with slow-grind moments
+            "target_energy": (0.60, 0.35),
+            "max_energy": (0.70, 0.50),
+            "target_valence": (0.78, 0.90),
+            "min_valence": (0.60, 0.75),
+            "target_acousticness": (0.20, 0.55),
+            "min_acousticness": (0.10, 0.35),
+            "target_tempo": (108, 80),
+            "max_tempo": (120, 95),
+            "min_popularity": (25, 55),
+        },
+        "genres": {
+            "low": ["latin", "r-n-b", "soul", "romantic", "alt r&b"],
+            "high": ["latin", "r-n-b", "soul", "romantic", "alt r&b"],
+        },
+        "gate": {
+            "energy": (None, (0.60, 0.50)),
+            "tempo": (None, (105, 95)),
+            "valence": (0.55, None),
+        },
+        "search_terms": ["romantic", "love", "slow dance", "intimate", "r&b"],
+        "lean_personal": True,
+    },
+    "perreo": {
+        "params": {
+            # Perreo = high groove, bass, mid tempo
+            "target_energy": (0.65, 0.90),
+            "min_energy": (0.50, 0.75),
+            "target_danceability": (0.75, 0.90),
+            "min_danceability": (0.60, 0.75),
+            "target_valence": (0.65, 0.55),
+            "min_valence": (0.45, 0.35),
+            "target_tempo": (90, 110),
+            "min_tempo": (80, 95),
+            "target_loudness": (-10, -6),
+            "max_acousticness": (0.35, 0.15),
+            "min_popularity": (30, 65),
+        },
+        "genres": {
+            "low": ["reggaeton", "urbano latino", "latin hip hop", "trap latino", "dembow"],
+            "high": ["reggaeton", "urbano latino", "trap latino", "latin hip hop", "dembow"],
+        },
+        "gate": {
+            "energy": ((0.50, 0.65), None),
+            "danceability": ((0.68, 0.76), None),
+            "tempo": ((80, 90), (118, 124)),
+            "acousticness": (None, 0.35),
+            "valence": (0.35, None),
+        },
+        "search_terms": ["reggaeton", "perreo", "dembow", "neo perreo", "latin club"],
+        "search_rescue": True,
+        # Perreo needs more reach: more producer attempts, mood-term search, looser history.
+        "reach": {
+            "attempts": 7,
+            "rec_limit": 120,
+            "history_limit": 40,
+            "seen_rec_limit": 120,
+            "global_seen_limit": 180,
+            "expand_with_terms": True,
+            "seed_genre_search": True,
+        },
+        # Artist genres (substring match) a perreo track must have at least one of.
+        "artist_genres": ["reggaeton", "urbano", "latin hip hop", "trap latino", "latin", "dembow", "dancehall"],
+    },
+    "neutral": {
+        "params": {
+            "target_energy": 0.55,
+            "target_valence": 0.5,
+            "target_danceability": 0.5,
+            "min_popularity": 20,
+            "max_popularity": 95,
+        },
+        "genres": {
+            "low": ["indie", "alternative", "r-n-b", "pop", "electronic"],
+            "high": ["indie", "alternative", "r-n-b", "pop", "electronic"],
+        },
+        "gate": {
+            "energy": (0.25, 0.65),
+            "danceability": (0.35, 0.70),
+            "tempo": (70, 115),
+        },
+        # Neutral should avoid perreo/hype extremes
+        "gate_exclude": [[("danceability", ">=", 0.78), ("tempo", ">=", 95), ("energy", ">=", 0.65)]],
+        "search_terms": ["indie", "alt", "groove", "vibes", "mix"],
+        "lean_personal": True,
+    },
+}
+DEFAULT_MOOD = "neutral"
+DEFAULT_REACH = {
+    "attempts": 5,
+    "rec_limit": 100,
+    "history_limit": 80,
+    "seen_rec_limit": 200,
+    "global_seen_limit": 300,
+    "expand_with_terms": False,
+    "seed_genre_search": False,
+}
+
+_OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def _clamp(intensity: int) -> int:
+    return max(0, min(100, int(intensity)))
+
+
+def _at(value, t: float):
+    if isinstance(value, tuple):
+        lo, hi = value
+        return lo + (hi - lo) * t
+    return value
+
+
+class MoodProfile:
+    # Everything the recommender needs for one (mood, intensity), resolved up front.
+
+    def __init__(self, key: str, intensity: int):
+        spec = MOODS.get(key)
+        self.key = key
+        self.known = spec is not None
+        if spec is None:
+            # Unknown moods borrow neutral's params/genres/terms but are never gated.
+            neutral = MOODS[DEFAULT_MOOD]
+            spec = {k: neutral[k] for k in ("params", "genres", "search_terms")}
+        t = intensity / 100.0
+
+        self._params = {"limit": 25}
+        for name, value in spec["params"].items():
+            v = _at(value, t)
+            self._params[name] = int(v) if name.endswith("_popularity") else v
+
+        boost = spec["genres"]["high"]
+        count_boost = max(1, min(4, round(t * 4)))
+        self.genres = list(dict.fromkeys(boost[:count_boost] + spec["genres"]["low"][: (5 - count_boost)]))[:5]
+
+        self.gate = None
+        if "gate" in spec:
+            self.gate = [
+                (feat, _OPS[op], float(_at(bound, t)))
+                for feat, (lo, hi) in spec["gate"].items()
+                for op, bound in ((">=", lo), ("<=", hi))
+                if bound is not None
+            ]
+        self.gate_exclude = [[(f, _OPS[op], float(v)) for f, op, v in clause] for clause in spec.get("gate_exclude", [])]
+        self.post_exclude = [[(f, _OPS[op], float(v)) for f, op, v in clause] for clause in spec.get("post_exclude", [])]
+        self.search_terms = list(spec["search_terms"])
+        self.lean_personal = bool(spec.get("lean_personal"))
+        self.search_rescue = bool(spec.get("search_rescue"))
+        self.reach = {**DEFAULT_REACH, **spec.get("reach", {})}
+        self.artist_genres = tuple(spec.get("artist_genres", ()))
+
+    @property
+    def params(self) -> dict:
+        # Callers add market/seed keys; hand out a copy of the cached params.
+        return dict(self._params)
+
+    def gate_mask(self, pool) -> np.ndarray:
+        # Hard limits as one boolean mask over a scoring.CandidatePool.
+        if self.gate is None:
+            return np.ones(len(pool), dtype=bool)
+        mask = pool.present.copy()
+        for feat, op, bound in self.gate:
+            mask &= op(pool.col(feat), bound)
+        for clause in self.gate_exclude:
+            mask &= ~_all(pool, clause)
+        return mask
+
+    def post_mask(self, pool) -> np.ndarray | None:
+        # Final-pass exclusions; None when this mood has none.
+        if not self.post_exclude:
+            return None
+        mask = pool.present.copy()
+        for clause in self.post_exclude:
+            mask &= ~_all(pool, clause)
+        return mask
+
+    def matches_artist_genres(self, genres: list[str]) -> bool:
+        g = " ".join(genres).lower()
+        return any(k in g for k in self.artist_genres)
+
+
+def _all(pool, clause) -> np.ndarray:
+    mask = np.ones(len(pool), dtype=bool)
+    for feat, op, bound in clause:
+        mask &= op(pool.col(feat), bound)
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def _compiled(key: str, intensity: int) -> MoodProfile:
+    return MoodProfile(key, intensity)
+
+
+def profile(mood: str | None, intensity: int = 50) -> MoodProfile:
+    return _compiled((mood or DEFAULT_MOOD).lower(), _clamp(intensity))
+
+
+# Classification rules compiled once, in registry order.
+_CLASSIFIERS = [
+    (key, [(f, _OPS[op], v) for f, op, v in spec["classify"]])
+    for key, spec in MOODS.items()
+    if spec.get("classify")
+]
+
+
+def classify(features: dict | None) -> str:
+    # Label a single track from its audio features.
+    if not features:
+        return "unknown"
+    for key, rules in _CLASSIFIERS:
+        if all(op(float(features.get(f) or 0.0), v) for f, op, v in rules):
+            return key
+    return DEFAULT_MOOD
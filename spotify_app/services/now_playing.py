@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable
+
+from django.core.cache import cache
+
+# Poll cadence (ms) for the server-side now-playing feed.
+MIN_POLL_MS = 1000
+PLAYING_POLL_MS = 5000
+PAUSED_POLL_MS = 10000
+IDLE_POLL_MS = 15000
+ERROR_POLL_MS = 10000
+# A progress jump bigger than this (vs. extrapolation) is reported as a seek.
+SEEK_TOLERANCE_MS = 3000
+CHANGE_WINDOW_S = 120
+HEARTBEAT_S = 15
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def extrapolate(payload: dict, at_ms: int, now: int | None = None) -> dict:
+    # Advance progress_ms by the time elapsed since the payload was fetched (while playing).
+    track = payload.get("track")
+    if not payload.get("playing") or not track or not track.get("is_playing"):
+        return payload
+    now = now_ms() if now is None else now
+    progress = (track.get("progress_ms") or 0) + max(0, now - at_ms)
+    if track.get("duration_ms"):
+        progress = min(progress, track["duration_ms"])
+    return {**payload, "track": {**track, "progress_ms": progress}}
+
+
+def next_poll_delay_ms(payload: dict | None, recent_changes: int = 0) -> int:
+    # How long the same answer is likely to stay true: until the track ends while playing,
+    # longer when paused/idle, and shorter while the user is actively skipping around.
+    if not payload or not payload.get("playing"):
+        return IDLE_POLL_MS
+    track = payload.get("track") or {}
+    if not track.get("is_playing"):
+        return PAUSED_POLL_MS
+    delay = PLAYING_POLL_MS
+    if recent_changes:
+        delay = delay // (1 + recent_changes)
+    remaining = (track.get("duration_ms") or 0) - (track.get("progress_ms") or 0)
+    if remaining > 0:
+        # Land just after the track should have ended.
+        delay = min(delay, remaining + 300)
+    return max(MIN_POLL_MS, int(delay))
+
+
+def change_kind(prev: dict | None, prev_at_ms: int, cur: dict, cur_at_ms: int) -> str | None:
+    if prev is None:
+        return "initial"
+    if bool(prev.get("playing")) != bool(cur.get("playing")):
+        return "playback"
+    if not cur.get("playing"):
+        return None
+    pt = prev.get("track") or {}
+    ct = cur.get("track") or {}
+    if pt.get("id") != ct.get("id"):
+        return "track"
+    if bool(pt.get("is_playing")) != bool(ct.get("is_playing")):
+        return "playback"
+    if prev.get("mood") != cur.get("mood"):
+        return "mood"
+    expected = (pt.get("progress_ms") or 0) + ((cur_at_ms - prev_at_ms) if pt.get("is_playing") else 0)
+    if abs((ct.get("progress_ms") or 0) - expected) > SEEK_TOLERANCE_MS:
+        return "seek"
+    return None
+
+
+class _UserFeed:
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.subscribers: set[asyncio.Queue] = set()
+        self.poll: Callable[[], dict] | None = None
+        self.on_track_change: Callable[[dict], Any] | None = None
+        self.last: dict | None = None
+        self.last_at_ms = 0
+        self.changes: deque[float] = deque(maxlen=20)
+        self.task: asyncio.Task | None = None
+
+    def recent_changes(self) -> int:
+        cutoff = time.monotonic() - CHANGE_WINDOW_S
+        return sum(1 for t in self.changes if t >= cutoff)
+
+    def broadcast(self, event: str, data: dict) -> None:
+        for q in list(self.subscribers):
+            if q.full():
+                # Slow consumer: drop its oldest event rather than block the feed.
+                try:
+                    q.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            q.put_nowait((event, data))
+
+
+_feeds: dict[str, _UserFeed] = {}
+
+
+def subscribe(
+    user_id: str,
+    poll: Callable[[], dict],
+    on_track_change: Callable[[dict], Any] | None = None,
+) -> asyncio.Queue:
+    # Every tab of a user shares one upstream poller per worker; the newest tab's session drives it.
+    feed = _feeds.get(user_id)
+    if feed is None:
+        feed = _feeds[user_id] = _UserFeed(user_id)
+    feed.poll = poll
+    feed.on_track_change = on_track_change
+    q: asyncio.Queue = asyncio.Queue(maxsize=16)
+    feed.subscribers.add(q)
+    if feed.last is not None:
+        at = now_ms()
+        q.put_nowait(("vibe", {**extrapolate(feed.last, feed.last_at_ms, at), "change": "initial", "server_time_ms": at}))
+    if feed.task is None or feed.task.done():
+        feed.task = asyncio.get_running_loop().create_task(_run(feed))
+    return q
+
+
+def unsubscribe(user_id: str, q: asyncio.Queue) -> None:
+    feed = _feeds.get(user_id)
+    if feed is None:
+        return
+    feed.subscribers.discard(q)
+    if not feed.subscribers:
+        if feed.task and not feed.task.done():
+            feed.task.cancel()
+        _feeds.pop(user_id, None)
+
+
+def subscriber_count(user_id: str) -> int:
+    feed = _feeds.get(user_id)
+    return len(feed.subscribers) if feed else 0
+
+
+async def _run(feed: _UserFeed) -> None:
+    while feed.subscribers:
+        try:
+            payload = await asyncio.to_thread(feed.poll)
+        except Exception as e:
+            feed.broadcast("error", {"error": str(e), "server_time_ms": now_ms()})
+            # Back off at least as long as Spotify asked us to (429 Retry-After).
+            await asyncio.sleep(max(ERROR_POLL_MS / 1000, getattr(e, "retry_after", 0) or 0))
+            continue
+
+        at = now_ms()
+        if payload.get("authenticated") is False:
+            feed.broadcast("auth", payload)
+            return
+
+        kind = change_kind(feed.last, feed.last_at_ms, payload, at)
+        prev_track = ((feed.last or {}).get("track") or {}).get("id")
+        feed.last, feed.last_at_ms = payload, at
+        delay = next_poll_delay_ms(payload, feed.recent_changes())
+        if kind:
+            if kind != "initial":
+                feed.changes.append(time.monotonic())
+            track_id = (payload.get("track") or {}).get("id")
+            if track_id and track_id != prev_track and feed.on_track_change:
+                try:
+                    await asyncio.to_thread(feed.on_track_change, payload)
+                except Exception:
+                    pass
+            feed.broadcast("vibe", {**payload, "change": kind, "server_time_ms": at, "next_poll_after_ms": delay})
+        await asyncio.sleep(delay / 1000)
+
+
+def format_sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+# --- Per-user micro-cache for the polling endpoints ---
+
+def _cache_key(kind: str, user_id: str) -> str:
+    return f"now_playing:{kind}:{user_id}"
+
+
+def _changes_key(user_id: str) -> str:
+    return f"now_playing:changes:{user_id}"
+
+
+def cached_payload(kind: str, user_id: str | None) -> dict | None:
+    # Answer a repeat poll from the last payload while it is still inside its hint window.
+    if not user_id:
+        return None
+    entry = cache.get(_cache_key(kind, user_id))
+    if not entry:
+        return None
+    payload, at, delay = entry
+    now = now_ms()
+    if now >= at + delay:
+        return None
+    return {**extrapolate(payload, at, now), "cached": True, "server_time_ms": now, "next_poll_after_ms": at + delay - now}
+
+
+def store_payload(kind: str, user_id: str | None, payload: dict) -> dict:
+    now = now_ms()
+    recent = 0
+    if user_id:
+        changes = [t for t in cache.get(_changes_key(user_id), []) if t >= now - CHANGE_WINDOW_S * 1000]
+        prev = cache.get(_cache_key(kind, user_id))
+        if prev and change_kind(prev[0], prev[1], payload, now) is not None:
+            changes.append(now)
+            cache.set(_changes_key(user_id), changes[-20:], CHANGE_WINDOW_S)
+        recent = len(changes)
+    delay = next_poll_delay_ms(payload, recent)
+    if user_id:
+        cache.set(_cache_key(kind, user_id), (payload, now, delay), max(1, delay // 1000 + 1))
+    return {**payload, "server_time_ms": now, "next_poll_after_ms": delay}
+
+
+def invalidate(user_id: str | None) -> None:
+    # Playback controls change the answer immediately; drop the cached payloads.
+    if user_id:
+        cache.delete_many([_cache_key("vibe", user_id), _cache_key("track", user_id)])
@@ -0,0 +1,77 @@
+import time
+
+from django.utils import timezone
+
+from ..models import PlaylistMirror
+from .spotify_client import spotify_get_playlist_snapshot, spotify_get_playlist_track_ids
+
+# A mirror we wrote or validated this recently is trusted without asking Spotify for the snapshot.
+TRUST_S = 30
+
+
+def _track_id(track_uri: str) -> str:
+    return track_uri.rsplit(":", 1)[-1]
+
+
+def sync(token: str, playlist_id: str) -> PlaylistMirror:
+    # Full resync: every page, no item cap.
+    data = spotify_get_playlist_track_ids(token, playlist_id)
+    mirror, _ = PlaylistMirror.objects.update_or_create(
+        playlist_id=playlist_id,
+        defaults={
+            "snapshot_id": data.get("snapshot_id") or "",
+            "track_ids": list(dict.fromkeys(data["track_ids"])),
+            "synced_at": timezone.now(),
+        },
+    )
+    return mirror
+
+
+def current(token: str, playlist_id: str) -> PlaylistMirror:
+    # The mirror, revalidated with one cheap snapshot_id read; resynced only when it moved.
+    mirror = PlaylistMirror.objects.filter(playlist_id=playlist_id).first()
+    if mirror is None:
+        return sync(token, playlist_id)
+    if time.time() - mirror.synced_at.timestamp() < TRUST_S:
+        return mirror
+    snapshot_id = spotify_get_playlist_snapshot(token, playlist_id)
+    if snapshot_id and snapshot_id == mirror.snapshot_id:
+        mirror.synced_at = timezone.now()
+        mirror.save(update_fields=["synced_at"])
+        return mirror
+    return sync(token, playlist_id)
+
+
+def missing(token: str, playlist_id: str, track_uris: list[str]) -> list[str]:
+    # The uris (deduped, in order) that are not in the playlist yet.
+    present = set(current(token, playlist_id).track_ids)
+    return [u for u in dict.fromkeys(track_uris) if u and _track_id(u) not in present]
+
+
+def created(playlist: dict) -> None:
+    # A playlist we just created is empty: start its mirror without a round trip.
+    PlaylistMirror.objects.update_or_create(
+        playlist_id=playlist["id"],
+        defaults={"snapshot_id": playlist.get("snapshot_id") or "", "track_ids": [], "synced_at": timezone.now()},
+    )
+
+
+def note_added(playlist_id: str, track_uris: list[str], result: dict | None) -> None:
+    mirror = PlaylistMirror.objects.filter(playlist_id=playlist_id).first()
+    if mirror is None:
+        return
+    mirror.track_ids = list(dict.fromkeys([*mirror.track_ids, *map(_track_id, track_uris)]))
+    mirror.snapshot_id = (result or {}).get("snapshot_id") or ""
+    mirror.synced_at = timezone.now()
+    mirror.save(update_fields=["track_ids", "snapshot_id", "synced_at"])
+
+
+def note_removed(playlist_id: str, track_uris: list[str], result: dict | None) -> None:
+    mirror = PlaylistMirror.objects.filter(playlist_id=playlist_id).first()
+    if mirror is None:
+        return
+    gone = set(map(_track_id, track_uris))
+    mirror.track_ids = [t for t in mirror.track_ids if t not in gone]
+    mirror.snapshot_id = (result or {}).get("snapshot_id") or ""
+    mirror.synced_at = timezone.now()
+    mirror.save(update_fields=["track_ids", "snapshot_id", "synced_at"])
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+
+import requests
+from django.conf import settings
+
+# Call priorities: playback controls first, recommendation fan-out last.
+CONTROL = 0
+INTERACTIVE = 1
+FANOUT = 2
+
+# Bulk/catalog endpoints the recommender fans out to; single-item lookups stay interactive.
+FANOUT_PATHS = frozenset({"/v1/recommendations", "/v1/search", "/v1/audio-features", "/v1/artists"})
+# Share of each bucket that lower priorities may not dip into, kept for higher ones.
+RESERVE = {CONTROL: 0.0, INTERACTIVE: 0.1, FANOUT: 0.35}
+# How long a call may wait for a token (or for a Retry-After window) before giving up.
+MAX_WAIT_S = {CONTROL: 3.0, INTERACTIVE: 2.0, FANOUT: 1.0}
+DEFAULT_RETRY_AFTER_S = 2.0
+USER_BUCKET_IDLE_S = 600
+# Access tokens remembered per Spotify user, so a refreshed token keeps drawing on the same bucket.
+MAX_BOUND_TOKENS = 5000
+
+
+class RateLimited(requests.RequestException):
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float, reserve: float) -> float:
+        # Seconds until one token can be taken without dropping below the reserved share.
+        self._refill(now)
+        floor = self.burst * reserve
+        short = floor + 1 - self.tokens
+        return 0.0 if short <= 0 else short / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+_lock = threading.Lock()
+_global: TokenBucket | None = None
+_users: dict[str, TokenBucket] = {}
+_owners: dict[str, str] = {}  # token hash -> Spotify user id
+_blocked_until = 0.0
+_stats = {"acquired": 0, "waited_ms": 0.0, "rejected": 0, "throttled_429": 0}
+
+
+def _setting(name: str, default: float) -> float:
+    return float(getattr(settings, name, default))
+
+
+def _global_bucket() -> TokenBucket:
+    global _global
+    if _global is None:
+        _global = TokenBucket(_setting("SPOTIFY_RATE_LIMIT_GLOBAL", 30), _setting("SPOTIFY_RATE_LIMIT_GLOBAL_BURST", 150))
+    return _global
+
+
+def _token_key(access_token: str) -> str:
+    return hashlib.sha1(access_token.encode()).hexdigest()[:16]
+
+
+def bind(access_token: str | None, user_id: str | None) -> None:
+    # Calls made with this token count against user_id's bucket, even when only the token is passed.
+    if not access_token or not user_id:
+        return
+    key = _token_key(access_token)
+    with _lock:
+        if _owners.get(key) == user_id:
+            return
+        _owners[key] = user_id
+        while len(_owners) > MAX_BOUND_TOKENS:
+            _owners.pop(next(iter(_owners)))
+
+
+def _user_bucket(access_token: str | None, user_id: str | None, now: float) -> TokenBucket | None:
+    # Keyed by Spotify user; a token nobody has bound to a user gets its own bucket.
+    if not user_id and access_token:
+        token_key = _token_key(access_token)
+        user_id = _owners.get(token_key)
+        key = f"user:{user_id}" if user_id else f"token:{token_key}"
+    elif user_id:
+        key = f"user:{user_id}"
+    else:
+        return None
+    bucket = _users.get(key)
+    if bucket is None:
+        if len(_users) > 1000:
+            for k in [k for k, b in _users.items() if now - b.updated > USER_BUCKET_IDLE_S]:
+                _users.pop(k, None)
+        bucket = _users[key] = TokenBucket(_setting("SPOTIFY_RATE_LIMIT_USER", 10), _setting("SPOTIFY_RATE_LIMIT_USER_BURST", 60))
+    return bucket
+
+
+def priority_for(method: str, url: str) -> int:
+    path = requests.utils.urlparse(url).path
+    if path.startswith("/v1/me/player") and method.upper() != "GET":
+        return CONTROL
+    if path.rstrip("/") in FANOUT_PATHS:
+        return FANOUT
+    return INTERACTIVE
+
+
+def acquire(priority: int, access_token: str | None = None, user_id: str | None = None) -> None:
+    # Block until both the global and the per-user bucket grant a token, or raise RateLimited
+    # once the wait would exceed this priority's budget. Fan-out never waits out a Retry-After.
+    deadline = time.monotonic() + MAX_WAIT_S[priority]
+    start = time.monotonic()
+    while True:
+        with _lock:
+            now = time.monotonic()
+            blocked = max(0.0, _blocked_until - now)
+            if blocked and priority == FANOUT:
+                _stats["rejected"] += 1
+                raise RateLimited("Spotify rate limit: fan-out call shed", retry_after=blocked)
+            buckets = [_global_bucket()]
+            user = _user_bucket(access_token, user_id, now)
+            if user is not None:
+                buckets.append(user)
+            wait = max([blocked] + [b.wait_time(now, RESERVE[priority]) for b in buckets])
+            if wait <= 0:
+                for b in buckets:
+                    b.take()
+                _stats["acquired"] += 1
+                _stats["waited_ms"] += (now - start) * 1000
+                return
+            if now + wait > deadline:
+                _stats["rejected"] += 1
+                raise RateLimited("Spotify rate limit: call budget exhausted", retry_after=wait)
+        time.sleep(min(wait, 0.25))
+
+
+def note_throttled(response: requests.Response) -> float:
+    # Record a 429: every caller backs off until Retry-After has passed.
+    global _blocked_until
+    try:
+        retry_after = float(response.headers.get("Retry-After") or DEFAULT_RETRY_AFTER_S)
+    except (TypeError, ValueError):
+        retry_after = DEFAULT_RETRY_AFTER_S
+    with _lock:
+        _blocked_until = max(_blocked_until, time.monotonic() + retry_after)
+        _stats["throttled_429"] += 1
+    return retry_after
+
+
+def blocked_for() -> float:
+    return max(0.0, _blocked_until - time.monotonic())
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "blocked_for_s": round(blocked_for(), 2), "user_buckets": len(_users)}
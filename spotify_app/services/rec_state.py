@@ -0,0 +1,68 @@
+from django.core.cache import caches
+
+# Short-term repeat guard for api_recommend: the ids served since the user last changed
+# mood/intensity/mode. Kept per user in the shared cache, out of the session, so the
+# session stays small and the 1 Hz polls never rewrite it. "pool" holds ranked candidates the
+# last api_recommend did not serve, for the server-side autopilot to top up from.
+MAX_IDS = 200
+MAX_POOL = 100
+TTL_S = 6 * 3600
+
+
+def _cache():
+    return caches["shared"]
+
+
+def _key(user_id: str) -> str:
+    return f"rec_state:{user_id}"
+
+
+def seen_ids(user_id: str | None, mood: str, intensity: int, mode: str) -> list[str]:
+    # Ids served for this exact context; a different context starts a fresh list.
+    if not user_id:
+        return []
+    state = _cache().get(_key(user_id))
+    if not state or state.get("context") != [mood, intensity, mode]:
+        return []
+    return list(state.get("ids") or [])
+
+
+def context(user_id: str | None) -> tuple[str, int, str] | None:
+    # (mood, intensity, mode) of the last recommendations served to this user.
+    state = _cache().get(_key(user_id)) if user_id else None
+    return tuple(state["context"]) if state and state.get("context") else None
+
+
+def extend(
+    user_id: str | None, mood: str, intensity: int, mode: str, ids: list[str], pool: list[str] | None = None
+) -> None:
+    # Record served ids; a given pool (track uris) replaces the stored one.
+    if not user_id:
+        return
+    state = _cache().get(_key(user_id)) or {}
+    same = state.get("context") == [mood, intensity, mode]
+    merged = list(dict.fromkeys([*(state.get("ids") or [] if same else []), *(i for i in ids if i)]))
+    if pool is None:
+        pool = state.get("pool") or [] if same else []
+    served = set(merged)
+    pool = [u for u in dict.fromkeys(pool) if u and u.rsplit(":", 1)[-1] not in served]
+    _cache().set(
+        _key(user_id),
+        {"context": [mood, intensity, mode], "ids": merged[-MAX_IDS:], "pool": pool[:MAX_POOL]},
+        TTL_S,
+    )
+
+
+def take(user_id: str | None, n: int, skip: set[str] | None = None) -> list[str]:
+    # Pop up to n pooled uris (not in skip) and count them as served.
+    ctx = context(user_id)
+    if ctx is None or n <= 0:
+        return []
+    state = _cache().get(_key(user_id)) or {}
+    skip = skip or set()
+    picked = [u for u in state.get("pool") or [] if u not in skip][:n]
+    if picked:
+        rest = [u for u in state.get("pool") or [] if u not in set(picked)]
+        extend(user_id, *ctx, [u.rsplit(":", 1)[-1] for u in picked], pool=rest)
+    return picked
+
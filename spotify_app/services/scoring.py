@@ -0,0 +1,76 @@
+import numpy as np
+
+from .feature_store import FEATURE_KEYS
+
+# Per-feature weights of the distance to a mood's target_* params.
+SCORE_WEIGHTS = {
+    "energy": 2.0,
+    "valence": 2.0,
+    "tempo": 1.6,
+    "danceability": 1.6,
+    "acousticness": 1.2,
+    "loudness": 1.0,
+    "instrumentalness": 1.0,
+    "speechiness": 1.0,
+}
+MISSING_SCORE = 999.0
+_COLUMNS = {k: i for i, k in enumerate(FEATURE_KEYS)}
+
+
+class CandidatePool:
+    # A candidate list plus its audio features as one float matrix (NaN = unknown),
+    # so scoring and mood gates (services.moods) run as array expressions instead of per-track Python.
+
+    def __init__(self, tracks: list[dict], features_map: dict | None, *, _rows=None):
+        self.tracks = tracks
+        if _rows is not None:
+            self.feats, self.values, self.present = _rows
+            return
+        fm = features_map or {}
+        self.feats = [fm.get(t.get("id")) if fm else None for t in tracks]
+        self.present = np.fromiter((bool(f) for f in self.feats), dtype=bool, count=len(tracks))
+        # None -> NaN via dtype=float; one conversion for the whole pool.
+        empty = dict.fromkeys(FEATURE_KEYS)
+        self.values = np.array(
+            [list(map((f or empty).get, FEATURE_KEYS)) for f in self.feats],
+            dtype=float,
+        ).reshape(len(tracks), len(FEATURE_KEYS))
+
+    def __len__(self) -> int:
+        return len(self.tracks)
+
+    def take(self, index) -> "CandidatePool":
+        # Reorder or filter by an index array / boolean mask without rebuilding the matrix.
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        rows = ([self.feats[i] for i in index], self.values[index], self.present[index])
+        return CandidatePool([self.tracks[i] for i in index], None, _rows=rows)
+
+    def _raw(self, key: str) -> np.ndarray:
+        if key in _COLUMNS:
+            return self.values[:, _COLUMNS[key]]
+        # Keys outside the stored feature set (rare): read them off the dicts.
+        return np.array([np.nan if not f or f.get(key) is None else float(f[key]) for f in self.feats])
+
+    def col(self, key: str) -> np.ndarray:
+        # Gate semantics: a missing value counts as 0.0.
+        return np.nan_to_num(self._raw(key), nan=0.0)
+
+    def scores(self, params: dict) -> np.ndarray:
+        # Weighted L1 distance to every target_* param; tracks without features score MISSING_SCORE.
+        score = np.zeros(len(self.tracks))
+        for key, target in params.items():
+            if not key.startswith("target_"):
+                continue
+            feat_key = key.replace("target_", "")
+            term = np.abs(self._raw(feat_key) - float(target)) * SCORE_WEIGHTS.get(feat_key, 1.0)
+            score += np.nan_to_num(term, nan=0.0)
+        return np.where(self.present, score, MISSING_SCORE)
+
+    def ranked_index(self, score: np.ndarray) -> np.ndarray:
+        # Ascending score; ties keep pool order (same as a stable list.sort).
+        return np.argsort(score, kind="stable")
+
+    def ranked(self, score: np.ndarray) -> list[dict]:
+        return [self.tracks[i] for i in self.ranked_index(score)]
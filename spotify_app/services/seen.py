@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import RecommendationSeen, RecommendationSeenRollup
+
+# Rows merged per compaction step; keeps each transaction (and the IN lists) bounded.
+COMPACT_BATCH = 5000
+
+
+def _retention() -> timedelta:
+    return timedelta(days=int(getattr(settings, "RECOMMENDATION_SEEN_RETENTION_DAYS", 90)))
+
+
+def recent(user_id: str, limit: int, mood: str | None = None, mode: str | None = None) -> list[str]:
+    # Most recently recommended track ids; per mood+mode when given. Intensity is not part of
+    # the key, so nudging the slider does not reset the repeat guard.
+    qs = RecommendationSeenRollup.objects.filter(spotify_user_id=user_id)
+    if mood is not None:
+        qs = qs.filter(last_mood=mood, last_mode=mode)
+    return list(qs.order_by("-last_seen").values_list("track_id", flat=True)[:limit])
+
+
+def _upsert(rows: dict[tuple[str, str], RecommendationSeenRollup]) -> None:
+    # rows carry the new placement and the count to add; stored rows are merged in here
+    # (counts summed, the newer placement wins).
+    pending = list(rows.values())
+    for i in range(0, len(pending), 500):
+        chunk = pending[i:i + 500]
+        by_user: dict[str, list[str]] = {}
+        for r in chunk:
+            by_user.setdefault(r.spotify_user_id, []).append(r.track_id)
+        with transaction.atomic():
+            for user_id, track_ids in by_user.items():
+                for tid, mood, intensity, mode, last_seen, count in RecommendationSeenRollup.objects.filter(
+                    spotify_user_id=user_id, track_id__in=track_ids
+                ).values_list("track_id", "last_mood", "last_intensity", "last_mode", "last_seen", "count"):
+                    row = rows[(user_id, tid)]
+                    row.count += count
+                    if last_seen > row.last_seen:
+                        row.last_mood, row.last_intensity, row.last_mode, row.last_seen = mood, intensity, mode, last_seen
+            RecommendationSeenRollup.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=["spotify_user_id", "track_id"],
+                update_fields=["last_mood", "last_intensity", "last_mode", "last_seen", "count"],
+            )
+
+
+def record(user_id: str, track_ids: list[str], mood: str, intensity: int, mode: str) -> None:
+    now = timezone.now()
+    _upsert({
+        (user_id, tid): RecommendationSeenRollup(
+            spotify_user_id=user_id, track_id=tid, last_mood=mood,
+            last_intensity=intensity, last_mode=mode, last_seen=now, count=1,
+        )
+        for tid in dict.fromkeys(t for t in track_ids if t)
+    })
+
+
+def compact(batch: int = COMPACT_BATCH) -> dict:
+    # Fold raw RecommendationSeen rows into the rollup and delete them,
+    # then drop everything older than the retention window.
+    cutoff = timezone.now() - _retention()
+    expired_raw, _ = RecommendationSeen.objects.filter(seen_at__lt=cutoff).delete()
+    merged = 0
+    while True:
+        # (user, track) order walks the unique index, so a batch spans one or two users.
+        raw = list(
+            RecommendationSeen.objects.order_by("spotify_user_id", "track_id")
+            .values_list("id", "spotify_user_id", "track_id", "mood", "intensity", "mode", "seen_at")[:batch]
+        )
+        if not raw:
+            break
+        rows: dict[tuple[str, str], RecommendationSeenRollup] = {}
+        for _id, user_id, tid, mood, intensity, mode, seen_at in raw:
+            row = rows.get((user_id, tid))
+            if row is None:
+                rows[(user_id, tid)] = RecommendationSeenRollup(
+                    spotify_user_id=user_id, track_id=tid, last_mood=mood,
+                    last_intensity=intensity, last_mode=mode, last_seen=seen_at, count=1,
+                )
+                continue
+            row.count += 1
+            if seen_at >= row.last_seen:
+                row.last_mood, row.last_intensity, row.last_mode, row.last_seen = mood, intensity, mode, seen_at
+        with transaction.atomic():
+            _upsert(rows)
+            RecommendationSeen.objects.filter(id__in=[r[0] for r in raw]).delete()
+        merged += len(raw)
+    expired, _ = RecommendationSeenRollup.objects.filter(last_seen__lt=cutoff).delete()
+    return {"merged": merged, "expired_raw": expired_raw, "expired": expired}
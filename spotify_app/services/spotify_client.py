@@ -2,6 +2,10 @@ import time
 import requests
 from django.conf import settings
 
+from . import ratelimit, transport
+from .fanout import gather
+from .ratelimit import RateLimited
+
 AUTH_URL = "https://accounts.spotify.com/authorize"
 TOKEN_URL = "https://accounts.spotify.com/api/token"
 API_BASE = "https://api.spotify.com/v1"
@@ -13,24 +17,35 @@ SCOPES = (
 )
 
 
+def _send(method: str, url: str, access_token: str | None = None, user_id: str | None = None, **kwargs) -> requests.Response:
+    # Every Spotify call goes through the scheduler: token buckets in front, Retry-After behind.
+    # A 429 is retried once for playback/interactive calls when the wait fits their budget.
+    priority = ratelimit.priority_for(method, url)
+    for attempt in range(2):
+        ratelimit.acquire(priority, access_token, user_id)
+        r = transport.request(method, url, access_token, **kwargs)
+        if r.status_code != 429:
+            return r
+        retry_after = ratelimit.note_throttled(r)
+        if attempt or priority == ratelimit.FANOUT or retry_after > ratelimit.MAX_WAIT_S[priority]:
+            raise RateLimited(f"Spotify returned 429 for {method} {url}", retry_after=retry_after)
+    return r
+
+
 def spotify_get(url: str, access_token: str) -> requests.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.get(url, headers=headers, timeout=15)
+    return _send("GET", url, access_token)
 
 
 def spotify_put(url: str, access_token: str, json: dict | None = None) -> requests.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.put(url, headers=headers, json=json, timeout=15)
+    return _send("PUT", url, access_token, json=json)
 
 
 def spotify_post(url: str, access_token: str, json: dict | None = None) -> requests.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.post(url, headers=headers, json=json, timeout=15)
+    return _send("POST", url, access_token, json=json)
 
 
 def spotify_delete(url: str, access_token: str, json: dict | None = None) -> requests.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.delete(url, headers=headers, json=json, timeout=15)
+    return _send("DELETE", url, access_token, json=json)
 
 
 def get_login_url(state: str) -> str:
@@ -53,7 +68,7 @@ def exchange_code_for_token(code: str) -> dict:
         "client_id": settings.SPOTIFY_CLIENT_ID,
         "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
-    r = requests.post(TOKEN_URL, data=data, timeout=15)
+    r = _send("POST", TOKEN_URL, data=data)
     r.raise_for_status()
     payload = r.json()
     payload["expires_at"] = int(time.time()) + payload.get("expires_in", 3600)
@@ -67,7 +82,7 @@ def refresh_access_token(refresh_token: str) -> dict:
         "client_id": settings.SPOTIFY_CLIENT_ID,
         "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
-    r = requests.post(TOKEN_URL, data=data, timeout=15)
+    r = _send("POST", TOKEN_URL, data=data)
     r.raise_for_status()
     payload = r.json()
     payload["expires_at"] = int(time.time()) + payload.get("expires_in", 3600)
@@ -98,15 +113,76 @@ def get_audio_features(track_id: str, access_token: str) -> dict | None:
     return r.json()
 
 
+AUDIO_FEATURES_CHUNK = 100  # Spotify API limit per /audio-features call
+
+
+def _audio_features_chunk(access_token: str, chunk: list[str]) -> list[dict]:
+    # A 403 (endpoint denied for this app/token) says nothing about the tracks: raise so the
+    # chunk's ids are reported in failed_ids instead of looking like tracks without features.
+    r = spotify_get(f"{API_BASE}/audio-features?ids={','.join(chunk)}", access_token)
+    r.raise_for_status()
+    return [f for f in r.json().get("audio_features", []) or [] if f]
+
+
 def spotify_get_audio_features_bulk(access_token: str, track_ids: list[str]) -> dict:
-    if not track_ids:
-        return {"audio_features": []}
-    ids = ",".join(track_ids[:100])
-    r = spotify_get(f"{API_BASE}/audio-features?ids={ids}", access_token)
-    if r.status_code == 403:
-        return {"audio_features": []}
+    # Any number of ids: split into 100-id chunks, fetch them concurrently and merge.
+    # "chunks" reports timing/outcome per chunk; ids from failed chunks are listed in "failed_ids".
+    ids = [t for t in dict.fromkeys(track_ids) if t]
+    if not ids:
+        return {"audio_features": [], "chunks": [], "failed_ids": []}
+    chunks = {
+        str(offset): ids[offset:offset + AUDIO_FEATURES_CHUNK]
+        for offset in range(0, len(ids), AUDIO_FEATURES_CHUNK)
+    }
+    results, errors, timings = gather(
+        {key: (lambda chunk=chunk: _audio_features_chunk(access_token, chunk)) for key, chunk in chunks.items()}
+    )
+    if errors and not results:
+        raise next(iter(errors.values()))
+
+    features: list[dict] = []
+    report = []
+    failed_ids: list[str] = []
+    for key, chunk in chunks.items():
+        entry = {"offset": int(key), "size": len(chunk), "ms": round(timings.get(key, 0.0), 1)}
+        if key in errors:
+            entry["error"] = str(errors[key])
+            failed_ids.extend(chunk)
+        else:
+            entry["returned"] = len(results[key])
+            features.extend(results[key])
+        report.append(entry)
+    return {"audio_features": features, "chunks": report, "failed_ids": failed_ids}
+
+
+ARTISTS_CHUNK = 50  # Spotify API limit per /artists call
+
+
+def _artists_chunk(access_token: str, chunk: list[str]) -> list[dict]:
+    r = spotify_get(f"{API_BASE}/artists?ids={','.join(chunk)}", access_token)
     r.raise_for_status()
-    return r.json()
+    return [a for a in r.json().get("artists", []) or [] if a]
+
+
+def spotify_get_artists_bulk(access_token: str, artist_ids: list[str]) -> dict:
+    # Same shape as spotify_get_audio_features_bulk: 50-id chunks fetched concurrently.
+    ids = [a for a in dict.fromkeys(artist_ids) if a]
+    if not ids:
+        return {"artists": [], "failed_ids": []}
+    chunks = {str(offset): ids[offset:offset + ARTISTS_CHUNK] for offset in range(0, len(ids), ARTISTS_CHUNK)}
+    results, errors, _timings = gather(
+        {key: (lambda chunk=chunk: _artists_chunk(access_token, chunk)) for key, chunk in chunks.items()}
+    )
+    if errors and not results:
+        raise next(iter(errors.values()))
+    artists: list[dict] = []
+    failed_ids: list[str] = []
+    for key, chunk in chunks.items():
+        if key in errors:
+            failed_ids.extend(chunk)
+        else:
+            artists.extend(results[key])
+    return {"artists": artists, "failed_ids": failed_ids}
 
 
 def spotify_get_devices(access_token: str) -> dict:
@@ -205,38 +281,80 @@ def spotify_get_me(access_token: str) -> dict:
 def spotify_create_playlist(access_token: str, user_id: str, name: str) -> dict:
     url = f"{API_BASE}/users/{user_id}/playlists"
     body = {"name": name, "public": False, "description": "Created by VibeSync"}
-    r = requests.post(url, headers={"Authorization": f"Bearer {access_token}"}, json=body, timeout=15)
+    r = spotify_post(url, access_token, json=body)
     r.raise_for_status()
     return r.json()
 
 
-def spotify_add_tracks(access_token: str, playlist_id: str, track_uri: str) -> None:
+PLAYLIST_WRITE_CHUNK = 100  # Spotify API limit of URIs per playlist add/remove call
+
+
+def spotify_add_tracks_bulk(access_token: str, playlist_id: str, track_uris: list[str]) -> dict:
+    # 100-URI chunks, sent in order so the tracks land in the playlist in order.
+    # Returns the last response ({"snapshot_id": ...}) for the playlist mirror.
     url = f"{API_BASE}/playlists/{playlist_id}/tracks"
-    body = {"uris": [track_uri]}
-    r = requests.post(url, headers={"Authorization": f"Bearer {access_token}"}, json=body, timeout=15)
+    result: dict = {}
+    for i in range(0, len(track_uris), PLAYLIST_WRITE_CHUNK):
+        r = spotify_post(url, access_token, json={"uris": track_uris[i:i + PLAYLIST_WRITE_CHUNK]})
+        r.raise_for_status()
+        result = r.json()
+    return result
+
+
+def spotify_add_tracks(access_token: str, playlist_id: str, track_uri: str) -> dict:
+    return spotify_add_tracks_bulk(access_token, playlist_id, [track_uri])
+
+
+def spotify_get_playlist_snapshot(access_token: str, playlist_id: str) -> str | None:
+    r = spotify_get(f"{API_BASE}/playlists/{playlist_id}?fields=snapshot_id", access_token)
     r.raise_for_status()
+    return r.json().get("snapshot_id")
 
 
-def spotify_playlist_has_track(access_token: str, playlist_id: str, track_id: str) -> bool:
-    offset = 0
-    while offset < 200:
-        url = f"{API_BASE}/playlists/{playlist_id}/tracks?fields=items(track(id))&limit=100&offset={offset}"
-        r = spotify_get(url, access_token)
-        r.raise_for_status()
-        items = r.json().get("items", [])
-        if any(i.get("track", {}).get("id") == track_id for i in items):
-            return True
-        if len(items) < 100:
-            break
-        offset += 100
-    return False
+PLAYLIST_PAGE = 100  # Spotify API limit per /playlists/{id}/tracks page
 
 
-def spotify_remove_track(access_token: str, playlist_id: str, track_uri: str) -> None:
-    url = f"{API_BASE}/playlists/{playlist_id}/tracks"
-    body = {"tracks": [{"uri": track_uri}]}
-    r = spotify_delete(url, access_token, json=body)
+def _playlist_page(access_token: str, playlist_id: str, offset: int) -> list[str]:
+    url = f"{API_BASE}/playlists/{playlist_id}/tracks?fields=items(track(id))&limit={PLAYLIST_PAGE}&offset={offset}"
+    r = spotify_get(url, access_token)
     r.raise_for_status()
+    return [(i.get("track") or {}).get("id") for i in r.json().get("items", []) or []]
+
+
+def spotify_get_playlist_track_ids(access_token: str, playlist_id: str) -> dict:
+    # Every track id plus the snapshot they belong to. The first page comes with the playlist
+    # object (snapshot_id, total); the remaining pages are fetched concurrently.
+    url = f"{API_BASE}/playlists/{playlist_id}?fields=snapshot_id,tracks(total,items(track(id)))"
+    r = spotify_get(url, access_token)
+    r.raise_for_status()
+    data = r.json()
+    tracks = data.get("tracks") or {}
+    ids = [(i.get("track") or {}).get("id") for i in tracks.get("items", []) or []]
+    total = int(tracks.get("total") or 0)
+    offsets = list(range(len(ids), total, PLAYLIST_PAGE)) if ids else []
+    results, errors, _timings = gather(
+        {str(o): (lambda o=o: _playlist_page(access_token, playlist_id, o)) for o in offsets}
+    )
+    if errors:
+        raise next(iter(errors.values()))
+    for o in offsets:
+        ids.extend(results[str(o)])
+    return {"snapshot_id": data.get("snapshot_id"), "track_ids": [t for t in ids if t]}
+
+
+def spotify_remove_tracks_bulk(access_token: str, playlist_id: str, track_uris: list[str]) -> dict:
+    url = f"{API_BASE}/playlists/{playlist_id}/tracks"
+    result: dict = {}
+    for i in range(0, len(track_uris), PLAYLIST_WRITE_CHUNK):
+        body = {"tracks": [{"uri": u} for u in track_uris[i:i + PLAYLIST_WRITE_CHUNK]]}
+        r = spotify_delete(url, access_token, json=body)
+        r.raise_for_status()
+        result = r.json()
+    return result
+
+
+def spotify_remove_track(access_token: str, playlist_id: str, track_uri: str) -> dict:
+    return spotify_remove_tracks_bulk(access_token, playlist_id, [track_uri])
 
 
 def spotify_get_recommendations(
@@ -270,6 +388,12 @@ def spotify_get_available_genre_seeds(access_token: str) -> dict:
     return r.json()
 
 
+def spotify_get_markets(access_token: str) -> dict:
+    r = spotify_get(f"{API_BASE}/markets", access_token)
+    r.raise_for_status()
+    return r.json()
+
+
 def spotify_get_recently_played(access_token: str, limit: int = 20) -> dict:
     url = f"{API_BASE}/me/player/recently-played?limit={limit}"
     r = spotify_get(url, access_token)
@@ -0,0 +1,64 @@
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+REFRESH_LOCK_S = 60
+
+_hits_lock = threading.Lock()
+
+
+def _store():
+    return caches["shared"]
+
+
+def _refresh(key: str, fetch: Callable[[], Any], ttl: int, stale: int) -> Any:
+    value = fetch()
+    _store().set(key, {"value": value, "fetched_at": time.time()}, ttl + stale)
+    return value
+
+
+def _refresh_in_background(key: str, fetch: Callable[[], Any], ttl: int, stale: int) -> None:
+    # Single-flight across workers: whoever takes the lock refreshes, everyone keeps serving stale.
+    lock_key = f"{key}:lock"
+    if not _store().add(lock_key, 1, timeout=REFRESH_LOCK_S):
+        return
+
+    def run():
+        try:
+            _refresh(key, fetch, ttl, stale)
+        except Exception as e:
+            logger.info("refresh of %s failed, serving stale: %s", key, e)
+        finally:
+            _store().delete(lock_key)
+
+    threading.Thread(target=run, name="swr-refresh", daemon=True).start()
+
+
+def cached(key: str, ttl: int, stale: int, fetch: Callable[[], Any], hits: dict | None = None) -> Any:
+    # Stale-while-revalidate over the shared cache: fresh for ttl, then served stale for up to
+    # `stale` more seconds while one worker refreshes in the background; fetched inline after that.
+    entry = _store().get(key)
+    if entry is None:
+        outcome = "miss"
+        value = _refresh(key, fetch, ttl, stale)
+    else:
+        value = entry["value"]
+        outcome = "fresh"
+        if time.time() - entry["fetched_at"] > ttl:
+            outcome = "stale"
+            _refresh_in_background(key, fetch, ttl, stale)
+    if hits is not None:
+        with _hits_lock:
+            hits[outcome] = hits.get(outcome, 0) + 1
+    return value
+
+
+def counts(hits: dict) -> dict:
+    # Consistent copy of a hits dict that request threads keep updating.
+    with _hits_lock:
+        return dict(hits)
@@ -0,0 +1,156 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import ratelimit
+from .spotify_client import refresh_access_token
+
+# Refresh this many seconds before expiry (user-facing path / background renewer).
+EXPIRY_MARGIN_S = 60
+RENEW_AHEAD_S = 300
+RENEW_INTERVAL_S = 60
+# Stop renewing for users we have not seen for this long.
+ACTIVE_WINDOW_S = 1800
+LOCK_TIMEOUT_S = 15
+WAIT_FOR_PEER_S = 5
+
+_local_locks: dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+_active: dict[str, float] = {}
+_renewer: threading.Thread | None = None
+_renewer_guard = threading.Lock()
+
+
+def _store():
+    return caches[getattr(settings, "SPOTIFY_TOKEN_CACHE", "shared")]
+
+
+def _key(user_id: str) -> str:
+    return f"spotify_token:{user_id}"
+
+
+def _lock_for(user_id: str) -> threading.Lock:
+    with _local_locks_guard:
+        lock = _local_locks.get(user_id)
+        if lock is None:
+            lock = _local_locks[user_id] = threading.Lock()
+        return lock
+
+
+def _fresh(entry: dict | None, margin: int) -> bool:
+    return bool(entry and entry.get("access_token") and int(entry.get("expires_at") or 0) - margin > time.time())
+
+
+def current(user_id: str) -> dict | None:
+    entry = _store().get(_key(user_id))
+    if entry:
+        ratelimit.bind(entry.get("access_token"), user_id)
+    return entry
+
+
+def remember(user_id: str, access_token: str, refresh_token: str | None, expires_at: int) -> dict:
+    prev = current(user_id) or {}
+    entry = {
+        "access_token": access_token,
+        "refresh_token": refresh_token or prev.get("refresh_token"),
+        "expires_at": int(expires_at),
+    }
+    # Keep the refresh token around well past access-token expiry.
+    _store().set(_key(user_id), entry, timeout=30 * 24 * 3600)
+    ratelimit.bind(access_token, user_id)
+    touch(user_id)
+    return entry
+
+
+def forget(user_id: str) -> None:
+    _store().delete(_key(user_id))
+    _active.pop(user_id, None)
+
+
+def touch(user_id: str) -> None:
+    _active[user_id] = time.time()
+    _ensure_renewer()
+
+
+def refresh(user_id: str, refresh_token: str | None = None, margin: int = EXPIRY_MARGIN_S) -> dict | None:
+    # Single-flight: one refresh per user per process (thread lock) and across workers
+    # (cache lock). Late arrivals reuse whatever the winner stored.
+    with _lock_for(user_id):
+        entry = current(user_id)
+        if _fresh(entry, margin):
+            return entry
+        refresh_token = (entry or {}).get("refresh_token") or refresh_token
+        if not refresh_token:
+            return None
+
+        store = _store()
+        lock_key = f"{_key(user_id)}:lock"
+        acquired = store.add(lock_key, 1, timeout=LOCK_TIMEOUT_S)
+        if not acquired:
+            deadline = time.time() + WAIT_FOR_PEER_S
+            while time.time() < deadline:
+                time.sleep(0.1)
+                entry = current(user_id)
+                if _fresh(entry, margin):
+                    return entry
+            # Peer is slow or gone: refresh ourselves, taking the lock only if it has lapsed.
+            acquired = store.add(lock_key, 1, timeout=LOCK_TIMEOUT_S)
+        try:
+            data = refresh_access_token(refresh_token)
+            return remember(user_id, data["access_token"], data.get("refresh_token") or refresh_token, data["expires_at"])
+        finally:
+            # Never release a lock another worker holds.
+            if acquired:
+                store.delete(lock_key)
+
+
+def get_token(user_id: str, refresh_token: str | None = None) -> str | None:
+    # Valid access token for background work (no request/session needed).
+    touch(user_id)
+    entry = current(user_id)
+    if _fresh(entry, EXPIRY_MARGIN_S):
+        return entry["access_token"]
+    entry = refresh(user_id, refresh_token)
+    return entry["access_token"] if entry else None
+
+
+def renew_due() -> int:
+    # Refresh tokens of recently active users before they expire.
+    now = time.time()
+    renewed = 0
+    for user_id, seen in list(_active.items()):
+        if now - seen > ACTIVE_WINDOW_S:
+            _active.pop(user_id, None)
+            continue
+        entry = current(user_id)
+        if not entry or _fresh(entry, RENEW_AHEAD_S):
+            continue
+        try:
+            if refresh(user_id, margin=RENEW_AHEAD_S):
+                renewed += 1
+        except Exception:
+            continue
+    return renewed
+
+
+def _renew_loop() -> None:
+    while True:
+        time.sleep(RENEW_INTERVAL_S)
+        try:
+            renew_due()
+        except Exception:
+            pass
+
+
+def _ensure_renewer() -> None:
+    global _renewer
+    if not getattr(settings, "SPOTIFY_TOKEN_RENEWER", True):
+        return
+    if _renewer is not None and _renewer.is_alive():
+        return
+    with _renewer_guard:
+        if _renewer is None or not _renewer.is_alive():
+            _renewer = threading.Thread(target=_renew_loop, name="spotify-token-renewer", daemon=True)
+            _renewer.start()
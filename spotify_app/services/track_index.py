@@ -0,0 +1,232 @@
+import logging
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+
+from ..models import MoodEntry, TrackFeatures, TrackHistory
+from .feature_store import FEATURE_KEYS
+from .scoring import SCORE_WEIGHTS
+
+logger = logging.getLogger(__name__)
+
+# Features live on different scales; map tempo/loudness to roughly 0-1 like the rest.
+_SCALE = {"tempo": (50.0, 200.0), "loudness": (-30.0, 0.0)}
+_DIM = {k: i for i, k in enumerate(FEATURE_KEYS)}
+_UNKNOWN = 0.5
+
+
+def _scaled(raw: np.ndarray) -> np.ndarray:
+    out = raw.astype(np.float32, copy=True)
+    for key, (lo, hi) in _SCALE.items():
+        j = _DIM[key]
+        out[:, j] = (out[:, j] - lo) / (hi - lo)
+    np.clip(out, -0.5, 1.5, out=out)
+    out[np.isnan(out)] = _UNKNOWN
+    return out
+
+
+class TrackIndex:
+    # Exact kNN over scaled feature vectors, with an optional IVF (k-means buckets) mode
+    # that only scans the buckets nearest to the query.
+
+    def __init__(self, ids: list[str], raw: np.ndarray, meta: list[dict]):
+        self.ids = ids
+        self.raw = raw
+        self.meta = meta
+        self.vectors = _scaled(raw) if len(ids) else np.zeros((0, len(FEATURE_KEYS)), dtype=np.float32)
+        self.pos = {tid: i for i, tid in enumerate(ids)}
+        self.centroids: np.ndarray | None = None
+        self.lists: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def build_ivf(self, nlist: int | None = None, iterations: int = 8, seed: int = 0) -> None:
+        n = len(self.ids)
+        if n == 0:
+            return
+        nlist = max(1, min(n, nlist or int(math.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest_centroid(sample, centroids)
+            for c in range(nlist):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        assign = self._nearest_centroid(self.vectors, centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+
+    @staticmethod
+    def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 50_000) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int64)
+        c_sq = (centroids * centroids).sum(axis=1)
+        for i in range(0, len(vectors), chunk):
+            v = vectors[i:i + chunk]
+            out[i:i + chunk] = np.argmin(c_sq - 2.0 * v @ centroids.T, axis=1)
+        return out
+
+    def search(
+        self,
+        query: np.ndarray,
+        weights: np.ndarray,
+        k: int,
+        exclude: set[str] | None = None,
+        nprobe: int | None = None,
+    ) -> list[int]:
+        # Row numbers of the k nearest rows by weighted squared distance, nearest first.
+        if not len(self.ids) or k <= 0:
+            return []
+        if self.centroids is not None and nprobe:
+            c_dist = ((self.centroids - query) ** 2) @ weights
+            probe = np.argsort(c_dist)[:nprobe]
+            rows = np.concatenate([self.lists[c] for c in probe])
+        else:
+            rows = np.arange(len(self.ids))
+        dist = ((self.vectors[rows] - query) ** 2) @ weights
+        if exclude:
+            skip = np.fromiter((self.ids[r] in exclude for r in rows), dtype=bool, count=len(rows))
+            dist[skip] = np.inf
+        k = min(k, len(rows))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+        return [int(rows[i]) for i in top if np.isfinite(dist[i])]
+
+    def query_for(self, params: dict) -> tuple[np.ndarray, np.ndarray]:
+        # Mood target vector from target_* params; only targeted dimensions carry weight.
+        raw = np.full((1, len(FEATURE_KEYS)), np.nan)
+        weights = np.zeros(len(FEATURE_KEYS), dtype=np.float32)
+        for key, target in params.items():
+            feat = key.replace("target_", "")
+            if key.startswith("target_") and feat in _DIM:
+                raw[0, _DIM[feat]] = float(target)
+                weights[_DIM[feat]] = SCORE_WEIGHTS.get(feat, 1.0)
+        return _scaled(raw)[0], weights
+
+    def seed_query(self, seed_ids: list[str]) -> np.ndarray | None:
+        rows = [self.pos[t] for t in seed_ids if t in self.pos]
+        if not rows:
+            return None
+        return self.vectors[rows].mean(axis=0)
+
+    def track(self, row: int) -> dict:
+        # Spotify-shaped track object so downstream dedupe/ranking code works unchanged.
+        tid = self.ids[row]
+        m = self.meta[row]
+        # The joined display string can't be split ("Tyler, The Creator"): without the list,
+        # keep it whole as one artist.
+        names = m.get("artist_names") or ([m["artists"]] if m.get("artists") else [])
+        artists = [{"id": m["artist_id"] or None, "name": names[0]}] if names else []
+        artists += [{"name": n} for n in names[1:]]
+        return {
+            "id": tid,
+            "name": m["name"],
+            "uri": f"spotify:track:{tid}",
+            "artists": artists,
+            "album": {"images": [{"url": m["image"]}] if m["image"] else []},
+            "external_urls": {"spotify": m["spotify_url"]} if m["spotify_url"] else {},
+            "source": "local",
+        }
+
+    def features(self, row: int) -> dict:
+        values = self.raw[row]
+        return {"id": self.ids[row], **{k: (None if np.isnan(values[j]) else float(values[j])) for k, j in _DIM.items()}}
+
+
+def _load() -> TrackIndex:
+    # Every stored track with features; display metadata from the row, else from the
+    # mood board / listening history that first surfaced it.
+    meta_fields = ("name", "artists", "artist_names", "artist_id", "image", "spotify_url")
+    rows = list(
+        TrackFeatures.objects.filter(available=True).values_list("track_id", *FEATURE_KEYS, *meta_fields)
+    )
+    meta: dict[str, dict] = {}
+    unnamed = []
+    for r in rows:
+        m = dict(zip(meta_fields, r[-len(meta_fields):]))
+        if m["name"]:
+            meta[r[0]] = m
+        else:
+            unnamed.append(r[0])
+    for model, names_field in ((MoodEntry, "artist_names"), (TrackHistory, None)):
+        fields = ("track_id", "track_name", "artists", "image", "spotify_url") + ((names_field,) if names_field else ())
+        for i in range(0, len(unnamed), 500):
+            chunk = [t for t in unnamed[i:i + 500] if t not in meta]
+            if not chunk:
+                continue
+            for tid, name, artists, image, url, *names in model.objects.filter(track_id__in=chunk).values_list(*fields):
+                meta.setdefault(tid, {
+                    "name": name, "artists": artists, "artist_names": (names[0] if names else None) or [],
+                    "artist_id": "", "image": image, "spotify_url": url,
+                })
+
+    kept = [r for r in rows if r[0] in meta]
+    raw = np.array([r[1:1 + len(FEATURE_KEYS)] for r in kept], dtype=float).reshape(len(kept), len(FEATURE_KEYS))
+    index = TrackIndex([r[0] for r in kept], raw, [meta[r[0]] for r in kept])
+    if _mode() == "ivf" and len(index) >= int(getattr(settings, "TRACK_INDEX_IVF_MIN_ROWS", 50_000)):
+        index.build_ivf()
+    return index
+
+
+def _mode() -> str:
+    return str(getattr(settings, "TRACK_INDEX_MODE", "exact")).lower()
+
+
+_lock = threading.Lock()
+_index: TrackIndex | None = None
+_built_at = 0.0
+_rebuilding = False
+
+
+def _rebuild() -> None:
+    global _index, _built_at, _rebuilding
+    try:
+        start = time.perf_counter()
+        index = _load()
+        # Swap in whole; requests holding the old index finish with it.
+        _index, _built_at = index, time.monotonic()
+        logger.info("track index: %s tracks in %.0f ms", len(index), (time.perf_counter() - start) * 1000)
+    except Exception:
+        logger.exception("track index build failed")
+    finally:
+        _rebuilding = False
+        connections.close_all()
+
+
+def get_index() -> TrackIndex | None:
+    # Built and refreshed in the background, never on the request path: None until the first
+    # build lands (callers fall back to upstream candidates), then the previous index keeps
+    # serving while a stale one is rebuilt.
+    global _rebuilding
+    ttl = float(getattr(settings, "TRACK_INDEX_TTL_S", 300))
+    if (_index is None or time.monotonic() - _built_at > ttl) and not _rebuilding:
+        with _lock:
+            if not _rebuilding:
+                _rebuilding = True
+                threading.Thread(target=_rebuild, name="track-index-rebuild", daemon=True).start()
+    return _index
+
+
+def candidates(params: dict, seed_ids: list[str], k: int, exclude: set[str] | None = None) -> tuple[list[dict], dict]:
+    # Local candidates near the mood target and near the user's seeds; no upstream calls.
+    index = get_index()
+    if index is None or not len(index):
+        return [], {}
+    nprobe = int(getattr(settings, "TRACK_INDEX_NPROBE", 32)) if index.centroids is not None else None
+    query, weights = index.query_for(params)
+    rows = index.search(query, weights, k, exclude, nprobe) if weights.any() else []
+    seed_query = index.seed_query(seed_ids)
+    if seed_query is not None:
+        # Stay near the seeds on every dimension, pulled toward the mood's targets.
+        blended = np.where(weights > 0, (seed_query + query) / 2, seed_query)
+        rows += index.search(blended, np.maximum(weights, 1.0), k, exclude, nprobe)
+    rows = list(dict.fromkeys(rows))
+    return [index.track(r) for r in rows], {index.ids[r]: index.features(r) for r in rows}
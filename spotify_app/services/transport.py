@@ -0,0 +1,74 @@
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Per-endpoint read timeouts (seconds), matched on the longest path prefix.
+# Playback controls should fail fast; catalog/recommendation calls can take longer.
+DEFAULT_TIMEOUTS = {
+    "/v1/me/player": 5,
+    "/v1/me/top": 10,
+    "/v1/recommendations": 10,
+    "/v1/audio-features": 10,
+    "/v1/artists": 10,
+    "/v1/search": 10,
+    "/v1/playlists": 10,
+    "/api/token": 10,
+}
+CONNECT_TIMEOUT = 3.05
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_session_pid: int | None = None
+
+
+def _build_session() -> requests.Session:
+    pool_size = int(getattr(settings, "SPOTIFY_HTTP_POOL_SIZE", 20))
+    retries = Retry(
+        total=int(getattr(settings, "SPOTIFY_HTTP_RETRIES", 2)),
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retries)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    # One keep-alive pool per worker process; rebuilt after fork so workers never share sockets.
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def timeout_for(url: str) -> tuple[float, float]:
+    timeouts = {**DEFAULT_TIMEOUTS, **getattr(settings, "SPOTIFY_HTTP_TIMEOUTS", {})}
+    default = float(getattr(settings, "SPOTIFY_HTTP_TIMEOUT", 15))
+    path = requests.utils.urlparse(url).path
+    best = None
+    for prefix in timeouts:
+        if path.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    read = float(timeouts[best]) if best else default
+    return (CONNECT_TIMEOUT, read)
+
+
+def request(method: str, url: str, access_token: str | None = None, **kwargs) -> requests.Response:
+    headers = dict(kwargs.pop("headers", None) or {})
+    if access_token:
+        headers["Authorization"] = f"Bearer {access_token}"
+    kwargs.setdefault("timeout", timeout_for(url))
+    return get_session().request(method, url, headers=headers, **kwargs)
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .models import Mood, MoodArtistRollup, MoodCountRollup, MoodDayRollup, MoodEntry, PlaylistMirror, TrackHistory
+from .services import analytics, autopilot, history, tokens
+
+
+def spotify_response(status=200, data=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps(data if data is not None else {}).encode()
+    return r
+
+
+class SharedCacheMixin:
+    # Each test gets its own "shared" cache (tokens, sessions, cross-worker claims live there).
+    settings_overrides: dict = {}
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        overrides = override_settings(
+            SPOTIFY_TOKEN_RENEWER=False,
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "shared": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": cache_dir.name},
+            },
+            **self.settings_overrides,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def login(self, user_id="u1"):
+        session = self.client.session
+        session.update({
+            "spotify_access_token": "tok",
+            "spotify_refresh_token": "ref",
+            "spotify_expires_at": int(time.time()) + 3600,
+            "spotify_user_id": user_id,
+        })
+        session.save()
+
+    def post_json(self, name, body):
+        return self.client.post(reverse(name), body, content_type="application/json")
+
+
+class HistoryDedupeTests(SharedCacheMixin, TestCase):
+    # Background flushes are pushed out of the way; each test flushes explicitly.
+    settings_overrides = {"HISTORY_FLUSH_INTERVAL_S": 3600, "HISTORY_FLUSH_SIZE": 100_000}
+
+    def setUp(self):
+        super().setUp()
+        with history._lock:
+            history._buffer.clear()
+
+    def track(self, track_id="t1"):
+        return {"id": track_id, "name": "Song", "artists": ["A", "B"], "album": "Alb"}
+
+    def test_concurrent_polls_log_one_play(self):
+        polls = 16
+        barrier = threading.Barrier(polls)
+
+        def poll():
+            barrier.wait()
+            history.record_if_new("u1", self.track())
+
+        threads = [threading.Thread(target=poll) for _ in range(polls)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        history.flush()
+        self.assertEqual(TrackHistory.objects.filter(spotify_user_id="u1", track_id="t1").count(), 1)
+
+    def test_flush_drops_play_logged_by_another_worker(self):
+        history.record_if_new("u1", self.track())
+        history.flush()
+        # Another worker missed the cache claim and queued the same play.
+        history._enqueue(history._row("u1", self.track()))
+        history._enqueue(history._row("u1", self.track()))
+        self.assertEqual(history.flush(), 0)
+        self.assertEqual(TrackHistory.objects.count(), 1)
+
+    def test_replay_after_window_is_logged(self):
+        history.record_if_new("u1", self.track())
+        history.flush()
+        TrackHistory.objects.update(played_at=TrackHistory.objects.get().played_at - timedelta(seconds=history.PLAY_WINDOW_S + 1))
+        history.record_if_new("u1", self.track("t2"))
+        caches["shared"].clear()
+        history.record_if_new("u1", self.track())
+        self.assertEqual(history.flush(), 2)
+        self.assertEqual(list(TrackHistory.objects.order_by("played_at").values_list("track_id", flat=True)), ["t1", "t2", "t1"])
+
+
+class RollupUpkeepTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def tracks(self, *ids):
+        return [{"id": i, "name": f"Song {i}", "artists": ["A", f"B{i}"], "album": "Alb"} for i in ids]
+
+    def rollups(self):
+        return (
+            set(MoodCountRollup.objects.values_list("spotify_user_id", "mood_id", "count")),
+            set(MoodArtistRollup.objects.values_list("spotify_user_id", "mood_id", "artist", "count")),
+            set(MoodDayRollup.objects.values_list("spotify_user_id", "mood_id", "day", "count")),
+        )
+
+    def assertRollupsMatchEntries(self):
+        kept = self.rollups()
+        analytics.rebuild()
+        self.assertEqual(kept, self.rollups())
+
+    def test_batch_endpoints_keep_rollups(self):
+        r = self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "app", "tracks": self.tracks("t1", "t2", "t1", "t3")})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(MoodCountRollup.objects.get().count, 3)
+        self.assertEqual(MoodArtistRollup.objects.get(artist="A").count, 3)
+        self.assertRollupsMatchEntries()
+
+        r = self.post_json("spotify_api_remove_batch", {"mood": "chill", "target": "app", "track_ids": ["t1", "t3", "missing"]})
+        self.assertEqual(r.json()["app"], {"deleted": 2})
+        self.assertEqual(MoodCountRollup.objects.get().count, 1)
+        self.assertFalse(MoodArtistRollup.objects.filter(artist="B1").exists())
+        self.assertRollupsMatchEntries()
+
+    def test_single_row_writes_keep_rollups(self):
+        mood = Mood.objects.create(name="chill", spotify_user_id="u1")
+        entry = MoodEntry.objects.create(
+            mood=mood, spotify_user_id="u1", track_id="t1", track_name="Song", artists="A, B", artist_names=["A", "B"]
+        )
+        self.assertEqual(MoodCountRollup.objects.get().count, 1)
+        entry.artist_names = ["C"]
+        entry.save()
+        self.assertEqual(set(MoodArtistRollup.objects.values_list("artist", flat=True)), {"C"})
+        self.assertRollupsMatchEntries()
+        entry.delete()
+        self.assertEqual(self.rollups(), (set(), set(), set()))
+
+    def test_mood_delete_cascades_out_of_rollups(self):
+        self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "app", "tracks": self.tracks("t1", "t2")})
+        self.post_json("spotify_api_add_batch", {"mood": "hype", "target": "app", "tracks": self.tracks("t3")})
+        Mood.objects.get(name="chill").delete()
+        self.assertEqual(list(MoodCountRollup.objects.values_list("mood__name", "count")), [("hype", 1)])
+        self.assertRollupsMatchEntries()
+
+
+class MoodBoardTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # The read-only alias is a second connection to the test database, which can't see (or
+        # read past) this test's open transaction; serve board reads from default instead.
+        patcher = mock.patch("spotify_app.views.READ_DB", "default")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.login()
+        mood = Mood.objects.create(name="chill", spotify_user_id="u1")
+        entries = MoodEntry.objects.bulk_create([
+            MoodEntry(mood=mood, spotify_user_id="u1", track_id=f"t{i}", track_name=f"Song {i}", artists="A",
+                      image=f"https://img/{i}")
+            for i in range(7)
+        ])
+        # Pairs share a timestamp so the id tie-break is exercised.
+        base = entries[0].added_at
+        for i, e in enumerate(entries):
+            MoodEntry.objects.filter(pk=e.pk).update(added_at=base - timedelta(minutes=i // 2))
+        self.expected = list(MoodEntry.objects.order_by("-added_at", "-id").values_list("track_id", flat=True))
+
+    def board(self, **params):
+        return self.client.get(reverse("spotify_api_mood_board"), params)
+
+    def test_cursor_pages_through_a_mood_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"mood": "chill", "limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = self.board(**params).json()
+            seen += [e["track_id"] for e in page["entries"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_whole_board_and_summary(self):
+        mood = self.board(limit=3).json()["moods"][0]
+        self.assertEqual((mood["count"], [e["track_id"] for e in mood["entries"]]), (7, self.expected[:3]))
+        self.assertIsNotNone(mood["next_cursor"])
+        covers = self.board(summary=1, covers=2).json()["moods"][0]["covers"]
+        self.assertEqual(covers, [f"https://img/{t[1:]}" for t in self.expected[:2]])
+
+    def test_malformed_params_are_rejected(self):
+        for params in ({"limit": "ten"}, {"summary": 1, "covers": "x"}, {"mood": "chill", "cursor": "not-a-cursor"},
+                       {"mood": "chill", "cursor": "%%%"}):
+            r = self.board(**params)
+            self.assertEqual(r.status_code, 400, params)
+            self.assertIn("error", r.json())
+
+
+class MoodBatchTests(SharedCacheMixin, TransactionTestCase):
+    # Transaction test: the Spotify half runs (and writes the playlist mirror) on a pool thread.
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.calls = []
+        self.create_playlist = lambda: spotify_response(201, {"id": "pl1", "snapshot_id": "s0"})
+        patcher = mock.patch("spotify_app.services.transport.request", side_effect=self.spotify)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def spotify(self, method, url, access_token=None, **kwargs):
+        path = url.split("/v1", 1)[-1]
+        self.calls.append((method, path, kwargs.get("json")))
+        if path == "/users/u1/playlists":
+            return self.create_playlist()
+        if path == "/playlists/pl1/tracks":
+            return spotify_response(201 if method == "POST" else 200, {"snapshot_id": f"s{len(self.calls)}"})
+        return spotify_response(404, {"error": path})
+
+    def tracks(self, ids):
+        return [{"id": i, "uri": f"spotify:track:{i}", "name": i, "artists": ["A"]} for i in ids]
+
+    def writes(self, method):
+        return [body for m, path, body in self.calls if m == method and path == "/playlists/pl1/tracks"]
+
+    def test_add_chunks_and_skips_tracks_already_there(self):
+        ids = [f"t{i}" for i in range(250)]
+        r = self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "spotify", "tracks": self.tracks(ids)})
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([len(b["uris"]) for b in self.writes("POST")], [100, 100, 50])
+        self.assertEqual(PlaylistMirror.objects.get(playlist_id="pl1").track_ids, ids)
+
+        self.calls.clear()
+        again = ids[:5] + ["n1", "n2", "n1"]
+        r = self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "spotify", "tracks": self.tracks(again)})
+        self.assertEqual(self.writes("POST"), [{"uris": ["spotify:track:n1", "spotify:track:n2"]}])
+        self.assertEqual((r.json()["spotify"]["added"], r.json()["spotify"]["duplicates"]), (2, 5))
+
+    def test_app_add_skips_duplicates(self):
+        batch = {"mood": "chill", "target": "app", "tracks": self.tracks(["t1", "t2", "t1"])}
+        self.assertEqual(self.post_json("spotify_api_add_batch", batch).json()["app"]["added"], 2)
+        batch["tracks"] = self.tracks(["t2", "t3"])
+        app = self.post_json("spotify_api_add_batch", batch).json()["app"]
+        self.assertEqual((app["added"], app["duplicates"]), (1, 1))
+        self.assertEqual(sorted(MoodEntry.objects.values_list("track_id", flat=True)), ["t1", "t2", "t3"])
+        self.assertEqual(self.calls, [])
+
+    def test_remove_chunks(self):
+        ids = [f"t{i}" for i in range(250)]
+        Mood.objects.create(name="chill", spotify_user_id="u1", spotify_playlist_id="pl1")
+        PlaylistMirror.objects.create(playlist_id="pl1", track_ids=ids + ["keep"])
+        r = self.post_json("spotify_api_remove_batch", {"mood": "chill", "target": "spotify", "track_ids": ids})
+        self.assertEqual(r.json()["spotify"]["removed"], 250)
+        self.assertEqual([len(b["tracks"]) for b in self.writes("DELETE")], [100, 100, 50])
+        self.assertEqual(PlaylistMirror.objects.get(playlist_id="pl1").track_ids, ["keep"])
+
+    def test_spotify_failure_keeps_the_app_write(self):
+        self.create_playlist = lambda: spotify_response(500)
+        r = self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "both", "tracks": self.tracks(["t1", "t2"])})
+        body = r.json()
+        self.assertEqual(r.status_code, 502)
+        self.assertEqual((body["ok"], body["app"]["added"]), (False, 2))
+        self.assertIn("spotify", body["errors"])
+        self.assertEqual(MoodEntry.objects.count(), 2)
+
+    def test_slow_spotify_write_is_reported_pending(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow_create():
+            release.wait(5)
+            return spotify_response(500)
+
+        self.create_playlist = slow_create
+        with override_settings(SPOTIFY_WRITE_TIMEOUT=0.2):
+            r = self.post_json("spotify_api_add_batch", {"mood": "chill", "target": "both", "tracks": self.tracks(["t1"])})
+        body = r.json()
+        self.assertEqual(r.status_code, 202)
+        self.assertEqual((body["ok"], body["app"]["added"]), (True, 1))
+        self.assertIn("spotify", body["pending"])
+
+
+class AutopilotTests(SharedCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        tokens.remember("u1", "tok", "ref", int(time.time()) + 3600)
+        self.queued = []
+        for patcher in (
+            mock.patch("spotify_app.services.transport.request", side_effect=self.spotify),
+            mock.patch.object(autopilot, "SPACING_S", 0.01),
+            mock.patch.object(autopilot, "NOTE_POLL_S", 0.05),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.stop_pilot)
+
+    def stop_pilot(self):
+        pilot = autopilot._pilots.get("u1")
+        autopilot.stop("u1")
+        if pilot and pilot.thread:
+            pilot.thread.join(2)
+
+    def spotify(self, method, url, access_token=None, **kwargs):
+        if "/me/player/queue" in url:
+            self.queued.append(url.split("uri=spotify:track:", 1)[1].split("&", 1)[0])
+            return spotify_response(204)
+        return spotify_response(404)
+
+    def wait_for(self, check):
+        deadline = time.monotonic() + 3
+        while not check():
+            self.assertLess(time.monotonic(), deadline, autopilot.status("u1"))
+            time.sleep(0.01)
+
+    def uris(self, *ids):
+        return [f"spotify:track:{i}" for i in ids]
+
+    def test_submit_dedupes_and_keeps_ahead_queued(self):
+        state = autopilot.submit("u1", self.uris("a", "b", "a", "c", "d"), device_id="dev1", ahead=2)
+        self.assertEqual(state["pending"], 4)
+        self.wait_for(lambda: self.queued == ["a", "b"])
+        state = autopilot.submit("u1", self.uris("b", "c", "e"), append=True)
+        self.assertEqual((state["queued"], state["pending"]), (self.uris("a", "b"), 3))
+
+    def test_note_track_advances_and_drops_played_pending(self):
+        autopilot.submit("u1", self.uris("a", "b", "c", "d"), device_id="dev1", ahead=2)
+        self.wait_for(lambda: self.queued == ["a", "b"])
+        autopilot.note_track("u1", "a")
+        self.wait_for(lambda: self.queued == ["a", "b", "c"])
+        # Picked straight from Up Next: never queued again.
+        state = autopilot.note_track("u1", "d")
+        self.assertEqual((state["current"], state["pending"]), ("d", 0))
+        # Nor is the playing track, if the client submits it again.
+        self.assertEqual(autopilot.submit("u1", self.uris("d"), append=True)["pending"], 0)
+
+    def test_note_from_another_worker_reaches_the_pilot(self):
+        autopilot.submit("u1", self.uris("a", "b", "c"), device_id="dev1", ahead=2)
+        self.wait_for(lambda: self.queued == ["a", "b"])
+        pilot = autopilot._pilots.pop("u1")
+        try:
+            self.assertIsNone(autopilot.note_track("u1", "a"))
+        finally:
+            autopilot._pilots["u1"] = pilot
+        self.wait_for(lambda: self.queued == ["a", "b", "c"])
+        self.assertEqual(autopilot.status("u1")["queued"], self.uris("b", "c"))
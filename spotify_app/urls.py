@@ -13,12 +13,15 @@ urlpatterns = [
 
     path("api/now-playing/", views.api_now_playing, name="spotify_api_now_playing"),
     path("api/vibe/", views.api_vibe, name="spotify_api_vibe"),
+    path("api/vibe/stream/", views.api_vibe_stream, name="spotify_api_vibe_stream"),
 
     path("api/play/", views.api_play, name="spotify_api_play"),
     path("api/pause/", views.api_pause, name="spotify_api_pause"),
     path("api/next/", views.api_next, name="spotify_api_next"),
     path("api/previous/", views.api_previous, name="spotify_api_previous"),
     path("api/queue/", views.api_queue, name="spotify_api_queue"),
+    path("api/queue/autopilot/", views.api_autopilot, name="spotify_api_autopilot"),
+    path("api/queue/autopilot/status/", views.api_autopilot_status, name="spotify_api_autopilot_status"),
     path("api/play-uri/", views.api_play_uri, name="spotify_api_play_uri"),
     path("api/play-uris/", views.api_play_uris, name="spotify_api_play_uris"),
     path("api/volume/", views.api_volume, name="spotify_api_volume"),
@@ -31,6 +34,8 @@ urlpatterns = [
     path("api/mood/add-both/", views.api_add_to_both, name="spotify_api_add_both"),
     path("api/mood/remove-app/", views.api_remove_from_app_mood, name="spotify_api_remove_app"),
     path("api/mood/remove-spotify/", views.api_remove_from_spotify_playlist, name="spotify_api_remove_spotify"),
+    path("api/mood/add-batch/", views.api_add_batch, name="spotify_api_add_batch"),
+    path("api/mood/remove-batch/", views.api_remove_batch, name="spotify_api_remove_batch"),
     path("api/mood/board/", views.api_mood_board, name="spotify_api_mood_board"),
 
     path("api/history/", views.api_history, name="spotify_api_history"),
@@ -38,4 +43,6 @@ urlpatterns = [
     path("api/goal/", views.api_goal_mood, name="spotify_api_goal"),
     path("api/recommend/", views.api_recommend, name="spotify_api_recommend"),
     path("api/recommend/feedback/", views.api_recommend_feedback, name="spotify_api_recommend_feedback"),
+
+    path("api/debug/stats/", views.api_debug_stats, name="spotify_api_debug_stats"),
 ]
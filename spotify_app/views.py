@@ -1,11 +1,31 @@
+import asyncio
+import base64
+import json
+import math
 import secrets
 import time
 import random
+from datetime import datetime, timedelta
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.urls import reverse
-from django.db import models
-from .models import Mood, MoodEntry, TrackHistory, RecommendationSeen, RecommendationFeedback
+from django.db import connections, models, transaction
+from django.utils import timezone
+from .models import (
+    Mood, MoodArtistRollup, MoodCountRollup, MoodDayRollup, MoodEntry, TrackHistory, RecommendationFeedback,
+)
+from .services import (
+    analytics, artist_store, autopilot, catalog, devices, feature_store, history, listening, moods, now_playing,
+    playlists, ratelimit, rec_state, seen, tokens, track_index,
+)
+from .services.fanout import gather, produce_until, start_gather
+from .services.scoring import CandidatePool
 from .services.spotify_client import spotify_search_tracks
 from .services.spotify_client import (
     get_login_url,
@@ -13,7 +33,6 @@ from .services.spotify_client import (
     refresh_access_token,
     spotify_get,
     get_now_playing,
-    get_audio_features,
     get_player_state,
     spotify_play,
     spotify_pause,
@@ -22,9 +41,9 @@ from .services.spotify_client import (
     spotify_transfer_playback,
     spotify_get_me,
     spotify_create_playlist,
-    spotify_add_tracks,
+    spotify_add_tracks_bulk,
     spotify_remove_track,
-    spotify_playlist_has_track,
+    spotify_remove_tracks_bulk,
     spotify_play_uri,
     spotify_play_uris,
     spotify_next,
@@ -32,15 +51,14 @@ from .services.spotify_client import (
     spotify_queue_track,
     spotify_set_repeat,
     spotify_get_recommendations,
-    spotify_get_available_genre_seeds,
-    spotify_get_audio_features_bulk,
-    spotify_get_recently_played,
-    spotify_get_top_tracks,
-    spotify_get_top_artists,
     spotify_put,
     API_BASE,
+    PLAYLIST_WRITE_CHUNK,
 )
 
+# Read-only connection (settings.DATABASES) for the heavy per-user reads.
+READ_DB = "reader"
+
 
 def home(request):
     authed = bool(request.session.get("spotify_access_token"))
@@ -58,7 +76,6 @@ def spotify_login(request):
         state = secrets.token_urlsafe(16)
         request.session["spotify_oauth_state"] = state
     request.session.modified = True
-    request.session.save()
     return redirect(get_login_url(state))
 
 
@@ -82,18 +99,20 @@ def spotify_callback(request):
     me = spotify_get_me(token_data["access_token"])
     if me and me.get("id"):
         request.session["spotify_user_id"] = me["id"]
+        request.session["spotify_country"] = _valid_market(token_data["access_token"], me.get("country"))
+        tokens.remember(me["id"], token_data["access_token"], token_data.get("refresh_token"), token_data["expires_at"])
 
     request.session.pop("spotify_oauth_state", None)
     request.session.modified = True
-    request.session.save()
     return redirect(reverse("spotify_home"))
 
 
 def spotify_logout(request):
-    for k in ["spotify_access_token", "spotify_refresh_token", "spotify_expires_at", "spotify_oauth_state", "spotify_user_id"]:
+    if request.session.get("spotify_user_id"):
+        tokens.forget(request.session["spotify_user_id"])
+    for k in ["spotify_access_token", "spotify_refresh_token", "spotify_expires_at", "spotify_oauth_state", "spotify_user_id", "spotify_country"]:
         request.session.pop(k, None)
     request.session.modified = True
-    request.session.save()
     return redirect(reverse("spotify_home"))
 
 
@@ -105,6 +124,23 @@ def _get_access_token(request):
     if not token:
         return None
 
+    user_id = request.session.get("spotify_user_id")
+    if user_id:
+        # Shared per-user token store: refreshed once (single-flight) and ahead of expiry by the
+        # background renewer, so requests rarely wait on the token endpoint or rewrite the session.
+        entry = tokens.current(user_id)
+        if entry is None:
+            tokens.remember(user_id, token, refresh, expires_at)
+        else:
+            tokens.touch(user_id)
+            if int(entry.get("expires_at") or 0) > expires_at:
+                token, expires_at = entry["access_token"], int(entry["expires_at"])
+        if int(time.time()) <= (expires_at - 60):
+            ratelimit.bind(token, user_id)
+            return token
+        entry = tokens.refresh(user_id, refresh)
+        return entry["access_token"] if entry else None
+
     if int(time.time()) > (expires_at - 60):
         if not refresh:
             return None
@@ -113,7 +149,6 @@ def _get_access_token(request):
         request.session["spotify_expires_at"] = new_data["expires_at"]
         token = new_data["access_token"]
         request.session.modified = True
-        request.session.save()
 
     return token
 
@@ -130,35 +165,30 @@ def _get_spotify_user_id(request, token: str | None = None) -> str | None:
     user_id = me.get("id") if me else None
     if user_id:
         request.session["spotify_user_id"] = user_id
+        request.session["spotify_country"] = _valid_market(token, me.get("country"))
         request.session.modified = True
     return user_id
 
 
-def _log_history_if_new(request, track):
-    last_id = request.session.get("last_track_id")
-    user_id = _get_spotify_user_id(request)
-    if not user_id:
-        return
-    if track.get("id") and track["id"] != last_id:
-        TrackHistory.objects.create(
-            spotify_user_id=user_id,
-            track_id=track["id"],
-            track_name=track.get("name") or "",
-            artists=", ".join(track.get("artists") or []),
-            album=track.get("album") or "",
-            image=track.get("image") or "",
-            spotify_url=track.get("spotify_url") or "",
-        )
-        request.session["last_track_id"] = track["id"]
-        request.session.modified = True
+def _valid_market(token: str, country: str | None) -> str:
+    try:
+        markets = catalog.markets(token)
+    except Exception:
+        markets = []
+    if country and (not markets or country in markets):
+        return country
+    return "US"
 
 
-def _get_device_id(token: str) -> str | None:
-    devices = spotify_get_devices(token).get("devices", [])
-    active = next((d for d in devices if d.get("is_active")), None)
-    if active:
-        return active.get("id")
-    return devices[0].get("id") if devices else None
+def _log_history_if_new(user_id: str | None, track: dict) -> None:
+    # Queued for the history writer (services.history); never waits on the DB.
+    if user_id and history.record_if_new(user_id, track):
+        autopilot.note_track(user_id, track["id"])
+
+
+def _on_device(request, token: str, call) -> str | None:
+    # Run call(device_id) on the requested device, else the user's cached active device.
+    return devices.run(request.session.get("spotify_user_id"), token, call, request.GET.get("device_id"))
 
 
 def api_token(request):
@@ -178,6 +208,8 @@ def api_transfer(request):
         return JsonResponse({"error": "Missing device_id"}, status=400)
 
     spotify_transfer_playback(token, device_id, play=True)
+    devices.remember(request.session.get("spotify_user_id"), device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True, "device_id": device_id})
 
 
@@ -195,10 +227,19 @@ def api_now_playing(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    payload = get_now_playing(token)
-    if payload is None:
-        player = get_player_state(token)
-        return JsonResponse({"playing": False, "message": "Nothing is playing right now.", "player_state": player})
+    user_id = request.session.get("spotify_user_id")
+    if request.GET.get("fresh") != "1":
+        cached = now_playing.cached_payload("track", user_id)
+        if cached is not None:
+            return JsonResponse(cached)
+
+    # /me/player carries the same item as currently-playing plus the device, so every poll keeps
+    # the device cache current (the user may switch devices mid-playback).
+    payload = get_player_state(token)
+    devices.note_player_state(user_id, payload)
+    if not (payload or {}).get("item"):
+        data = {"playing": False, "message": "Nothing is playing right now.", "player_state": payload}
+        return JsonResponse(now_playing.store_payload("track", user_id, data))
 
     item = payload.get("item") or {}
     track = {
@@ -213,170 +254,10 @@ def api_now_playing(request):
         "duration_ms": item.get("duration_ms"),
         "uri": item.get("uri"),
     }
-    return JsonResponse({"playing": True, "track": track})
-
-
-def _mood_from_features(f: dict) -> str:
-    if not f:
-        return "unknown"
-    valence = float(f.get("valence") or 0.0)
-    energy = float(f.get("energy") or 0.0)
-    dance = float(f.get("danceability") or 0.0)
-    tempo = float(f.get("tempo") or 0.0)
-    if energy >= 0.75 and dance >= 0.65 and valence >= 0.55:
-        return "hype"
-    if energy >= 0.70 and valence <= 0.35:
-        return "menacing"
-    if valence <= 0.30 and energy <= 0.50:
-        return "sad"
-    if energy <= 0.45 and (tempo and tempo <= 110):
-        return "chill"
-    if valence >= 0.55 and energy <= 0.65:
-        return "romantic"
-    return "neutral"
-
-
-def _recommend_params_for_mood(mood: str, intensity: int = 50) -> dict:
-    t = max(0, min(100, intensity)) / 100.0
-    m = (mood or "neutral").lower()
-    def lerp(a: float, b: float, x: float) -> float:
-        return a + (b - a) * x
-    if m == "hype":
-        return {
-            "limit": 25,
-            # Low intensity = bouncy/upbeat, high intensity = aggressive/fast
-            "target_energy": lerp(0.70, 0.95, t),
-            "min_energy": lerp(0.55, 0.85, t),
-            "target_danceability": lerp(0.70, 0.85, t),
-            "min_danceability": lerp(0.55, 0.70, t),
-            "target_valence": lerp(0.70, 0.55, t),
-            "min_valence": lerp(0.50, 0.35, t),
-            "target_tempo": lerp(115, 165, t),
-            "min_tempo": lerp(100, 130, t),
-            "target_loudness": lerp(-9, -5, t),
-            "max_acousticness": lerp(0.45, 0.15, t),
-            "min_popularity": int(35 + 35 * t),
-        }
-    if m == "perreo":
-        return {
-            "limit": 25,
-            # Perreo = high groove, bass, mid tempo
-            "target_energy": lerp(0.65, 0.90, t),
-            "min_energy": lerp(0.50, 0.75, t),
-            "target_danceability": lerp(0.75, 0.90, t),
-            "min_danceability": lerp(0.60, 0.75, t),
-            "target_valence": lerp(0.65, 0.55, t),
-            "min_valence": lerp(0.45, 0.35, t),
-            "target_tempo": lerp(90, 110, t),
-            "min_tempo": lerp(80, 95, t),
-            "target_loudness": lerp(-10, -6, t),
-            "max_acousticness": lerp(0.35, 0.15, t),
-            "min_popularity": int(30 + 35 * t),
-        }
-    if m == "menacing":
-        return {
-            "limit": 25,
-            # Hard-hitting trap: aggressive, low valence, loud
-            "target_energy": lerp(0.70, 0.97, t),
-            "min_energy": lerp(0.55, 0.85, t),
-            "target_valence": lerp(0.22, 0.08, t),
-            "max_valence": lerp(0.32, 0.18, t),
-            "target_loudness": lerp(-9, -4, t),
-            "target_tempo": lerp(100, 160, t),
-            "min_tempo": lerp(90, 125, t),
-            "max_acousticness": lerp(0.35, 0.10, t),
-            "target_speechiness": lerp(0.08, 0.25, t),
-            "min_popularity": int(20 + 30 * t),
-        }
-    if m == "sad":
-        return {
-            "limit": 25,
-            # Deep heartbreak: low valence, slow, softer
-            "target_energy": lerp(0.28, 0.15, t),
-            "max_energy": lerp(0.40, 0.25, t),
-            "target_valence": lerp(0.18, 0.06, t),
-            "max_valence": lerp(0.25, 0.15, t),
-            "target_acousticness": lerp(0.60, 0.90, t),
-            "min_acousticness": lerp(0.45, 0.70, t),
-            "target_tempo": lerp(85, 60, t),
-            "max_tempo": lerp(100, 80, t),
-            "target_instrumentalness": lerp(0.10, 0.35, t),
-            "max_popularity": int(85 - 25 * t),
-        }
-    if m == "chill":
-        return {
-            "limit": 25,
-            # Smooth, smoky, slow vibe
-            "target_energy": lerp(0.45, 0.25, t),
-            "max_energy": lerp(0.55, 0.35, t),
-            "target_valence": lerp(0.55, 0.45, t),
-            "target_tempo": lerp(100, 70, t),
-            "max_tempo": lerp(115, 90, t),
-            "target_acousticness": lerp(0.30, 0.60, t),
-            "min_acousticness": lerp(0.15, 0.35, t),
-            "target_instrumentalness": lerp(0.03, 0.25, t),
-            "max_popularity": int(90 - 20 * t),
-        }
-    if m == "romantic":
-        return {
-            "limit": 25,
-            # Feel-good Latin/R&B with slow-grind moments
-            "target_energy": lerp(0.60, 0.35, t),
-            "max_energy": lerp(0.70, 0.50, t),
-            "target_valence": lerp(0.78, 0.90, t),
-            "min_valence": lerp(0.60, 0.75, t),
-            "target_acousticness": lerp(0.20, 0.55, t),
-            "min_acousticness": lerp(0.10, 0.35, t),
-            "target_tempo": lerp(108, 80, t),
-            "max_tempo": lerp(120, 95, t),
-            "min_popularity": int(25 + 30 * t),
-        }
-    return {
-        "limit": 25,
-        "target_energy": 0.55,
-        "target_valence": 0.5,
-        "target_danceability": 0.5,
-        "min_popularity": 20,
-        "max_popularity": 95,
-    }
+    return JsonResponse(now_playing.store_payload("track", user_id, {"playing": True, "track": track}))
 
 
-def _weighted_genres_for_mood(mood: str, intensity: int) -> list[str]:
-    t = max(0, min(100, intensity)) / 100.0
-    m = (mood or "neutral").lower()
-    low = {
-        "hype": ["reggaeton", "latin", "urbano latino", "dancehall", "hip-hop"],
-        "perreo": ["reggaeton", "urbano latino", "latin hip hop", "trap latino", "dembow"],
-        "menacing": ["trap", "hip-hop", "drill", "industrial", "dark trap"],
-        "sad": ["sad", "heartbreak", "singer-songwriter", "piano", "acoustic"],
-        "chill": ["chill", "r-n-b", "lofi", "ambient", "downtempo"],
-        "romantic": ["latin", "r-n-b", "soul", "romantic", "alt r&b"],
-        "neutral": ["indie", "alternative", "r-n-b", "pop", "electronic"],
-    }
-    high = {
-        "hype": ["reggaeton", "latin", "dancehall", "trap", "edm"],
-        "perreo": ["reggaeton", "urbano latino", "trap latino", "latin hip hop", "dembow"],
-        "menacing": ["trap", "drill", "hip-hop", "industrial", "dark trap"],
-        "sad": ["sad", "heartbreak", "piano", "acoustic", "singer-songwriter"],
-        "chill": ["r-n-b", "chill", "lofi", "ambient", "downtempo"],
-        "romantic": ["latin", "r-n-b", "soul", "romantic", "alt r&b"],
-        "neutral": ["indie", "alternative", "r-n-b", "pop", "electronic"],
-    }
-    base = low.get(m, low["neutral"])
-    boost = high.get(m, high["neutral"])
-    count_boost = max(1, min(4, round(t * 4)))
-    picked = boost[:count_boost] + base[: (5 - count_boost)]
-    seen = set()
-    out = []
-    for g in picked:
-        if g not in seen:
-            out.append(g)
-            seen.add(g)
-    return out[:5]
-
-
-def _top_artist_genres(token: str, available: list[str]) -> list[str]:
-    top_artists = spotify_get_top_artists(token, time_range="medium_term", limit=20).get("items", [])
+def _top_artist_genres(top_artists: list[dict], available: list[str]) -> list[str]:
     counts: dict[str, int] = {}
     for a in top_artists:
         for g in a.get("genres", []):
@@ -392,32 +273,6 @@ def _top_artist_genres(token: str, available: list[str]) -> list[str]:
     return [g for g, _ in ranked][:5]
 
 
-def _score_track(features: dict, params: dict, mood: str | None = None) -> float:
-    if not features:
-        return 999.0
-    score = 0.0
-    weights = {
-        "energy": 2.0,
-        "valence": 2.0,
-        "tempo": 1.6,
-        "danceability": 1.6,
-        "acousticness": 1.2,
-        "loudness": 1.0,
-        "instrumentalness": 1.0,
-        "speechiness": 1.0,
-    }
-    for key, target in params.items():
-        if not key.startswith("target_"):
-            continue
-        feat_key = key.replace("target_", "")
-        val = features.get(feat_key)
-        if val is None:
-            continue
-        weight = weights.get(feat_key, 1.0)
-        score += abs(float(val) - float(target)) * weight
-    return score
-
-
 def _dedupe_by_artist(tracks: list[dict], max_items: int, max_per_artist: int = 1) -> list[dict]:
     artist_counts: dict[str, int] = {}
     seen_track_ids = set()
@@ -427,7 +282,9 @@ def _dedupe_by_artist(tracks: list[dict], max_items: int, max_per_artist: int =
         if tid and tid in seen_track_ids:
             continue
         artists = t.get("artists") or []
-        artist_id = (artists[0].get("id") if artists and isinstance(artists[0], dict) else None)
+        first = artists[0] if artists and isinstance(artists[0], dict) else {}
+        # Local-index tracks can carry a name without an id.
+        artist_id = first.get("id") or (first.get("name") or "").strip().lower() or None
         if artist_id and artist_counts.get(artist_id, 0) >= max_per_artist:
             continue
         if tid:
@@ -461,156 +318,12 @@ def _dedupe_by_title_artist(tracks: list[dict]) -> list[dict]:
     return out
 
 
-def _get_artist_genres_bulk(token: str, artist_ids: list[str]) -> dict:
-    if not artist_ids:
-        return {}
-    # Spotify API limit: 50 ids per request
-    chunks = [artist_ids[i:i + 50] for i in range(0, len(artist_ids), 50)]
-    out: dict[str, list[str]] = {}
-    for chunk in chunks:
-        url = f"{API_BASE}/artists?ids={','.join(chunk)}"
-        r = spotify_get(url, token)
-        if r.status_code != 200:
-            continue
-        data = r.json()
-        for a in data.get("artists", []) or []:
-            if a and a.get("id"):
-                out[a["id"]] = a.get("genres", []) or []
-    return out
-
-
 def _filter_by_hard_limits(tracks: list[dict], features_map: dict, mood: str, intensity: int) -> list[dict]:
-    m = (mood or "neutral").lower()
-    t = max(0, min(100, intensity)) / 100.0
-    if m not in ("perreo", "hype", "sad", "romantic", "menacing", "neutral", "chill"):
+    profile = moods.profile(mood, intensity)
+    if profile.gate is None:
         return tracks
-
-    filtered: list[dict] = []
-    for tr in tracks:
-        tid = tr.get("id")
-        f = features_map.get(tid) if features_map else None
-        if not f:
-            continue
-        energy = float(f.get("energy") or 0.0)
-        dance = float(f.get("danceability") or 0.0)
-        tempo = float(f.get("tempo") or 0.0)
-        valence = float(f.get("valence") or 0.0)
-        acoustic = float(f.get("acousticness") or 0.0)
-
-        if m == "perreo":
-            min_energy = 0.50 + 0.15 * t
-            min_dance = 0.68 + 0.08 * t
-            min_tempo = 80 + 10 * t
-            max_tempo = 118 + 6 * t
-            max_acoustic = 0.35
-            min_valence = 0.35
-        elif m == "hype":
-            min_energy = 0.60 + 0.20 * t
-            min_dance = 0.60 + 0.10 * t
-            min_tempo = 100 + 10 * t
-            max_tempo = 175
-            max_acoustic = 0.35
-            min_valence = 0.30
-        elif m == "sad":
-            min_energy = 0.0
-            min_dance = 0.0
-            min_tempo = 0.0
-            max_tempo = 95 - 10 * t
-            max_acoustic = 1.0
-            min_valence = 0.0
-            max_valence = 0.25 + 0.05 * (1 - t)
-        elif m == "chill":
-            min_energy = 0.20
-            max_energy = 0.58 - 0.12 * t
-            min_dance = 0.35
-            max_dance = 0.82
-            min_tempo = 65
-            max_tempo = 112 - 12 * t
-            min_valence = 0.20
-            max_valence = 0.78
-        elif m == "romantic":
-            min_energy = 0.0
-            min_dance = 0.0
-            min_tempo = 0.0
-            max_tempo = 105 - 10 * t
-            max_acoustic = 1.0
-            min_valence = 0.55
-            max_valence = 1.0
-        elif m == "menacing":
-            min_energy = 0.70 + 0.15 * t
-            min_dance = 0.50
-            min_tempo = 100 + 15 * t
-            max_tempo = 170
-            max_acoustic = 0.30
-            min_valence = 0.0
-            max_valence = 0.25
-        else:  # neutral
-            # Neutral should avoid perreo/hype extremes
-            min_energy = 0.25
-            max_energy = 0.65
-            min_dance = 0.35
-            max_dance = 0.70
-            min_tempo = 70
-            max_tempo = 115
-            exclude_dance = 0.78
-            exclude_tempo = 95
-            exclude_energy = 0.65
-
-        if m == "sad":
-            if valence <= max_valence and tempo <= max_tempo and energy <= (0.35 - 0.10 * t):
-                filtered.append(tr)
-            continue
-        if m == "chill":
-            if (
-                energy >= min_energy
-                and energy <= max_energy
-                and dance >= min_dance
-                and dance <= max_dance
-                and tempo >= min_tempo
-                and tempo <= max_tempo
-                and valence >= min_valence
-                and valence <= max_valence
-            ):
-                filtered.append(tr)
-            continue
-        if m == "romantic":
-            if valence >= min_valence and tempo <= max_tempo and energy <= (0.60 - 0.10 * t):
-                filtered.append(tr)
-            continue
-        if m == "menacing":
-            if (
-                valence <= max_valence
-                and tempo >= min_tempo
-                and tempo <= max_tempo
-                and energy >= min_energy
-                and acoustic <= max_acoustic
-            ):
-                filtered.append(tr)
-            continue
-        if m == "neutral":
-            if (
-                energy >= min_energy
-                and energy <= max_energy
-                and dance >= min_dance
-                and dance <= max_dance
-                and tempo >= min_tempo
-                and tempo <= max_tempo
-                and not (dance >= exclude_dance and tempo >= exclude_tempo and energy >= exclude_energy)
-            ):
-                filtered.append(tr)
-            continue
-
-        if (
-            energy >= min_energy
-            and dance >= min_dance
-            and tempo >= min_tempo
-            and tempo <= max_tempo
-            and acoustic <= max_acoustic
-            and valence >= min_valence
-        ):
-            filtered.append(tr)
-
-    return filtered
+    pool = CandidatePool(tracks, features_map)
+    return pool.take(profile.gate_mask(pool)).tracks
 
 
 def _post_gate_tracks_for_mood(token: str, tracks: list[dict], mood: str, intensity: int, features_map: dict | None = None) -> list[dict]:
@@ -620,67 +333,61 @@ def _post_gate_tracks_for_mood(token: str, tracks: list[dict], mood: str, intens
     track_ids = [t.get("id") for t in tracks if t.get("id")]
     missing_ids = [tid for tid in track_ids if tid and tid not in fm]
     if missing_ids:
-        extra = spotify_get_audio_features_bulk(token, list(dict.fromkeys(missing_ids)))
-        for f in extra.get("audio_features", []) or []:
-            if f and f.get("id"):
-                fm[f["id"]] = f
-
-    gated = _filter_by_hard_limits(tracks, fm, mood, intensity)
-    if gated:
-        tracks = gated
-
-    # Chill-specific second pass to block upbeat/perreo leakage after expansions.
-    if (mood or "").lower() == "chill":
-        chill = []
-        for t in tracks:
-            f = fm.get(t.get("id"))
-            if not f:
-                continue
-            energy = float(f.get("energy") or 0.0)
-            dance = float(f.get("danceability") or 0.0)
-            tempo = float(f.get("tempo") or 0.0)
-            speech = float(f.get("speechiness") or 0.0)
-            if energy > 0.56 or tempo > 112 or speech > 0.18:
-                continue
-            if dance > 0.78 and energy > 0.48:
-                continue
-            chill.append(t)
-        if chill:
-            tracks = chill
-    return tracks
+        fm.update(feature_store.get_features_bulk(token, missing_ids))
+
+    # One matrix for both passes.
+    profile = moods.profile(mood, intensity)
+    pool = CandidatePool(tracks, fm)
+    if profile.gate is not None:
+        gated = profile.gate_mask(pool)
+        if gated.any():
+            pool = pool.take(gated)
+
+    # Mood-specific final pass (e.g. chill) against leakage from late expansions.
+    post = profile.post_mask(pool)
+    if post is not None and post.any():
+        pool = pool.take(post)
+    return pool.tracks
+
+
+def _search_tracks_concurrently(token: str, terms: list[str], limit: int, market: str | None) -> list[dict]:
+    results, _errors, _timings = gather({
+        term: (lambda term=term: spotify_search_tracks(token, term, limit=limit, market=market))
+        for term in dict.fromkeys(terms)
+    })
+    # Keep the caller's term order so result ordering stays deterministic.
+    out: list[dict] = []
+    for term in dict.fromkeys(terms):
+        if term in results:
+            out.extend(results[term].get("tracks", {}).get("items", []))
+    return out
+
+
+def _with_server_timing(response, timings: dict[str, float]):
+    if timings:
+        response["Server-Timing"] = ", ".join(f"{k};dur={v:.1f}" for k, v in timings.items())
+    return response
 
 
 def api_recommend(request):
+    request_start = time.perf_counter()
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
 
     user_id = _get_spotify_user_id(request, token)
     mood = request.GET.get("mood", "neutral")
-    mood_key = (mood or "neutral").lower()
     mode = request.GET.get("mode", "blend").lower()
     intensity = int(request.GET.get("intensity", 50))
     limit = max(10, min(150, int(request.GET.get("limit", 25))))
-    params = _recommend_params_for_mood(mood, intensity)
-    weighted_genres = _weighted_genres_for_mood(mood, intensity)
+    profile = moods.profile(mood, intensity)
+    params = profile.params
+    weighted_genres = list(profile.genres)
 
     current_track = (request.GET.get("current_track") or "").strip()
 
-    # Session-level repeat guard
-    seen_ids = request.session.get("rec_seen_ids", [])
-    if not isinstance(seen_ids, list):
-        seen_ids = []
-    last_mood = request.session.get("rec_last_mood")
-    last_intensity = request.session.get("rec_last_intensity")
-    last_mode = request.session.get("rec_last_mode")
-    if last_mood != mood or last_intensity != intensity or last_mode != mode:
-        seen_ids = []
-        request.session["rec_seen_ids"] = []
-        request.session["rec_last_mood"] = mood
-        request.session["rec_last_intensity"] = intensity
-        request.session["rec_last_mode"] = mode
-        request.session.modified = True
-    seen_set = set(seen_ids)
+    # Short-term repeat guard (ids served since the mood/intensity/mode last changed)
+    seen_set = set(rec_state.seen_ids(user_id, mood, intensity, mode))
     if current_track:
         seen_set.add(current_track)
     history_ids = []
@@ -691,30 +398,20 @@ def api_recommend(request):
             seen_rec_limit = 80
             global_seen_limit = 120
         else:
-            history_limit = 40 if mood.lower() == "perreo" else 80
-            seen_rec_limit = 120 if mood.lower() == "perreo" else 200
-            global_seen_limit = 180 if mood.lower() == "perreo" else 300
+            history_limit = profile.reach["history_limit"]
+            seen_rec_limit = profile.reach["seen_rec_limit"]
+            global_seen_limit = profile.reach["global_seen_limit"]
         history_ids = list(
             TrackHistory.objects.filter(spotify_user_id=user_id)
             .order_by("-played_at")
             .values_list("track_id", flat=True)[:history_limit]
         )
         seen_set.update([i for i in history_ids if i])
-        # Persistent seen recs (per mood+intensity) to prevent repeats across sessions/devices
-        seen_rec_ids = list(
-            RecommendationSeen.objects.filter(
-                spotify_user_id=user_id, mood=mood, intensity=intensity, mode=mode
-            )
-            .order_by("-seen_at")
-            .values_list("track_id", flat=True)[:seen_rec_limit]
-        )
+        # Persistent seen recs (per mood+mode) to prevent repeats across sessions/devices
+        seen_rec_ids = seen.recent(user_id, seen_rec_limit, mood=mood, mode=mode)
         seen_set.update([i for i in seen_rec_ids if i])
         # Global seen recs for this user, regardless of mood/intensity/mode
-        global_seen_ids = list(
-            RecommendationSeen.objects.filter(spotify_user_id=user_id)
-            .order_by("-seen_at")
-            .values_list("track_id", flat=True)[:global_seen_limit]
-        )
+        global_seen_ids = seen.recent(user_id, global_seen_limit)
         seen_set.update([i for i in global_seen_ids if i])
         # Feedback signals
         feedback_rows = list(
@@ -729,18 +426,49 @@ def api_recommend(request):
         liked_ids = set()
         disliked_ids = set()
 
+    if profile.lean_personal:
+        top_range, top_limit = "medium_term", 40
+    else:
+        top_range, top_limit = "short_term", 30
+
+    timings: dict[str, float] = {}
     try:
-        me = spotify_get_me(token)
-        market = me.get("country", "US")
+        # None of these depend on each other: issue them together and join on one deadline.
+        gather_start = time.perf_counter()
+        # Market is cached in the session at login and genre seeds in the shared catalog cache,
+        # so usually neither costs an upstream call.
+        market = request.session.get("spotify_country")
+        jobs = {
+            "genre_seeds": lambda: catalog.genre_seeds(token),
+            "recent": lambda: listening.recently_played(user_id, token, limit=20),
+            "top_tracks": lambda: listening.top_tracks(user_id, token, time_range=top_range, limit=top_limit),
+            "top_artists": lambda: listening.top_artists(user_id, token, time_range=top_range, limit=top_limit),
+        }
+        if not market:
+            jobs["me"] = lambda: spotify_get_me(token)
+        gathered, gather_errors, gather_timings = gather(jobs)
+        timings["gather"] = (time.perf_counter() - gather_start) * 1000
+        timings.update({f"gather.{k}": v for k, v in gather_timings.items()})
+        for err in gather_errors.values():
+            raise err
+
+        if not market:
+            market = _valid_market(token, gathered["me"].get("country"))
+            request.session["spotify_country"] = market
+            request.session.modified = True
         params["market"] = market
         if user_id:
             params["market"] = market
         if user_id:
             params["seed_catalog"] = "personal"
 
-        available = spotify_get_available_genre_seeds(token).get("genres", [])
+        available = gathered["genre_seeds"]
         mood_genres = [g for g in weighted_genres if g in available] if available else weighted_genres[:]
-        personal_genres = _top_artist_genres(token, available) if available else []
+        # Top artists arrive with their genres: count those instead of refetching, and keep
+        # them in the artist store so later genre gating is served locally.
+        top_artists = gathered["top_artists"].get("items", [])
+        artist_store.put(top_artists)
+        personal_genres = _top_artist_genres(top_artists, available) if available else []
         if not mood_genres:
             mood_genres = weighted_genres[:]
 
@@ -755,7 +483,7 @@ def api_recommend(request):
             mood_slots = 0
             personal_slots = 5
         else:
-            if mood_key in ("chill", "sad", "romantic", "menacing", "neutral"):
+            if profile.lean_personal:
                 # Lean harder on personal taste for these moods
                 mood_slots = 0
                 personal_slots = 5
@@ -763,12 +491,12 @@ def api_recommend(request):
                 mood_slots = max(2, min(4, round(2 + 2 * t)))
                 personal_slots = max(1, 5 - mood_slots)
         seed_genres = (mood_genres[:mood_slots] + personal_genres[:personal_slots])[:5]
-        if mood_key in ("chill", "sad", "romantic", "menacing", "neutral") and not seed_genres:
+        if profile.lean_personal and not seed_genres:
             # Fallback to mood genres only if personal genres are missing
             seed_genres = mood_genres[:5]
         display_seed_genres = seed_genres[:]
 
-        recent = spotify_get_recently_played(token, limit=20)
+        recent = gathered["recent"]
         recent_items = recent.get("items", [])
         recent_tracks = [i.get("track") for i in recent_items if i.get("track")]
         recent_track_ids = [t.get("id") for t in recent_tracks if t and t.get("id")]
@@ -776,12 +504,7 @@ def api_recommend(request):
         for t in recent_tracks:
             recent_artist_ids.extend([a.get("id") for a in (t.get("artists") or []) if a.get("id")])
 
-        if mood_key in ("chill", "sad", "romantic", "menacing", "neutral"):
-            top_tracks = spotify_get_top_tracks(token, time_range="medium_term", limit=40).get("items", [])
-            top_artists = spotify_get_top_artists(token, time_range="medium_term", limit=40).get("items", [])
-        else:
-            top_tracks = spotify_get_top_tracks(token, time_range="short_term", limit=30).get("items", [])
-            top_artists = spotify_get_top_artists(token, time_range="short_term", limit=30).get("items", [])
+        top_tracks = gathered["top_tracks"].get("items", [])
 
         seed_source = "mixed"
 
@@ -811,9 +534,15 @@ def api_recommend(request):
                 seed_pool.append(g)
 
         rec_tracks_all: list[dict] = []
-        last_rec_error = None
-        attempts = 7 if mood_key == "perreo" else 5
-        rec_limit = 120 if mood_key == "perreo" else 100
+        features_map: dict[str, dict] = {}
+        attempts = profile.reach["attempts"]
+        rec_limit = profile.reach["rec_limit"]
+        # Stop producing once this many unseen candidates pass the mood gate.
+        enough_candidates = max(limit * 3, 120)
+        passing_ids: set[str] = set()
+
+        # Randomize every seed set up front, then dispatch all attempts in parallel.
+        attempt_jobs = []
         for _ in range(attempts):
             if seed_track_pool:
                 seed_tracks = random.sample(seed_track_pool, k=min(3, len(seed_track_pool)))
@@ -832,7 +561,7 @@ def api_recommend(request):
                 jitter = random.randint(-12, 12)
                 local_params["target_popularity"] = max(1, min(100, base_pop + 15 + jitter))
 
-            try:
+            def attempt(seed_tracks=seed_tracks, seed_artists=seed_artists, seed_genres=seed_genres, local_params=local_params):
                 rec = spotify_get_recommendations(
                     token,
                     seed_tracks=seed_tracks,
@@ -840,30 +569,43 @@ def api_recommend(request):
                     seed_genres=seed_genres,
                     params={**local_params, "limit": rec_limit},
                 )
-                rec_tracks_all.extend(rec.get("tracks", []))
-            except Exception as e:
-                last_rec_error = str(e)
-                continue
+                batch = rec.get("tracks", [])
+                batch_ids = list(dict.fromkeys(t.get("id") for t in batch if t.get("id")))
+                try:
+                    feats = feature_store.get_features_bulk(token, batch_ids)
+                    feature_store.describe(batch)
+                except Exception:
+                    feats = {}
+                return batch, feats
+            attempt_jobs.append(attempt)
+
+        def accept_attempt(result) -> bool:
+            batch, feats = result
+            rec_tracks_all.extend(batch)
+            features_map.update(feats)
+            fresh = [t for t in batch if t.get("id") and t["id"] not in seen_set and t["id"] not in passing_ids]
+            for t in _filter_by_hard_limits(fresh, features_map, mood, intensity):
+                passing_ids.add(t["id"])
+            return len(passing_ids) >= enough_candidates
+
+        # Local feature-vector index first; Spotify attempts only top up what it could not fill.
+        stage_start = time.perf_counter()
+        local_tracks, local_feats = track_index.candidates(
+            params, seed_track_pool, enough_candidates, seen_set | set(recent_track_ids)
+        )
+        timings["local"] = (time.perf_counter() - stage_start) * 1000
+        local_enough = accept_attempt((local_tracks, local_feats))
+
+        stage_start = time.perf_counter()
+        candidate_stats = produce_until([] if local_enough else attempt_jobs, accept_attempt)
+        timings["candidates"] = (time.perf_counter() - stage_start) * 1000
+        last_rec_error = candidate_stats["last_error"]
 
         rec_tracks = rec_tracks_all
 
-        # Expand pool with mood-search terms for reach (perreo only)
-        mood_terms = {
-            "hype": ["hype", "turn up", "party", "club", "banger", "dance"],
-            "perreo": ["reggaeton", "perreo", "dembow", "neo perreo", "latin club"],
-            "menacing": ["dark", "aggressive", "industrial", "hard", "ominous"],
-            "sad": ["sad", "heartbreak", "melancholy", "slow", "tearful"],
-            "chill": ["chill", "lofi", "ambient", "relax", "downtempo"],
-            "romantic": ["romantic", "love", "slow dance", "intimate", "r&b"],
-            "neutral": ["indie", "alt", "groove", "vibes", "mix"],
-        }
-        if mood_key == "perreo" and len(rec_tracks) < max(80, limit * 3):
-            for term in mood_terms.get(mood_key, mood_terms["neutral"]):
-                try:
-                    res = spotify_search_tracks(token, term, limit=25, market=market)
-                    rec_tracks.extend(res.get("tracks", {}).get("items", []))
-                except Exception:
-                    continue
+        # Expand pool with mood-search terms for reach (perreo)
+        if profile.reach["expand_with_terms"] and len(rec_tracks) < max(80, limit * 3):
+            rec_tracks.extend(_search_tracks_concurrently(token, profile.search_terms, 25, market))
 
         # Only expand with search if the recommendations API failed or returned nothing
         if last_rec_error or not rec_tracks:
@@ -882,15 +624,10 @@ def api_recommend(request):
                 except Exception:
                     pass
             # Last resort search: only for perreo/hype
-            if not rec_tracks and mood_key in ("perreo", "hype"):
+            if not rec_tracks and profile.search_rescue:
                 top_artist_names = [a.get("name") for a in top_artists if a.get("name")]
-                search_terms = top_artist_names[:6] or mood_terms.get(mood_key, mood_terms["neutral"])
-                for term in search_terms:
-                    try:
-                        res = spotify_search_tracks(token, term, limit=20, market=market)
-                        rec_tracks.extend(res.get("tracks", {}).get("items", []))
-                    except Exception:
-                        continue
+                search_terms = top_artist_names[:6] or profile.search_terms
+                rec_tracks.extend(_search_tracks_concurrently(token, search_terms, 20, market))
 
         # Dedupe by track id before filtering
         deduped = []
@@ -928,79 +665,37 @@ def api_recommend(request):
             if len(candidate_no_recent_artists) >= max(20, limit):
                 rec_tracks = candidate_no_recent_artists
 
-        rec_track_ids = list({t.get("id") for t in rec_tracks if t.get("id")})
-        features_bulk = spotify_get_audio_features_bulk(token, rec_track_ids) if rec_track_ids else {}
-        features_map = {f.get("id"): f for f in features_bulk.get("audio_features", []) if f}
-        if features_map:
-            cache = request.session.get("feature_cache", {})
-            if not isinstance(cache, dict):
-                cache = {}
-            for tid, f in features_map.items():
-                if not tid or not f:
-                    continue
-                cache[tid] = {
-                    "danceability": f.get("danceability"),
-                    "energy": f.get("energy"),
-                    "valence": f.get("valence"),
-                    "tempo": f.get("tempo"),
-                    "acousticness": f.get("acousticness"),
-                    "instrumentalness": f.get("instrumentalness"),
-                    "liveness": f.get("liveness"),
-                    "speechiness": f.get("speechiness"),
-                }
-            # Trim cache size
-            if len(cache) > 300:
-                for k in list(cache.keys())[: len(cache) - 300]:
-                    cache.pop(k, None)
-            request.session["feature_cache"] = cache
-            request.session.modified = True
+        # Candidates from the producer stage already carry features; only fetch the rest.
+        rec_track_ids = list({t.get("id") for t in rec_tracks if t.get("id") and t.get("id") not in features_map})
+        if rec_track_ids:
+            features_map.update(feature_store.get_features_bulk(token, rec_track_ids))
 
+        ranked_tracks = rec_tracks
         if features_map:
-            ranked = []
-            for t in rec_tracks:
-                tid = t.get("id")
-                if not tid:
-                    continue
-                f = features_map.get(tid)
-                score = _score_track(f, params, mood)
-                if tid in liked_ids:
-                    score -= 0.4
-                jitter = random.uniform(0.0, 0.10 + 0.25 * (intensity / 100.0))
-                ranked.append((score + jitter, t))
-            ranked.sort(key=lambda x: x[0])
-            ranked_tracks = [t for _, t in ranked]
-        else:
-            ranked_tracks = rec_tracks
+            pool = CandidatePool([t for t in rec_tracks if t.get("id")], features_map)
+            score = pool.scores(params)
+            score -= 0.4 * np.fromiter((t["id"] in liked_ids for t in pool.tracks), dtype=float, count=len(pool))
+            # Jitter is drawn per track in pool order, as before.
+            jitter_max = 0.10 + 0.25 * (intensity / 100.0)
+            score += np.array([random.uniform(0.0, jitter_max) for _ in pool.tracks])
+            ranked_tracks = pool.ranked(score)
 
         # Hard mood gating for perreo/hype/menacing/romantic/sad/neutral
         gated = _filter_by_hard_limits(ranked_tracks, features_map, mood, intensity)
         if gated:
             ranked_tracks = gated
 
-        # Perreo: require artist genres to include reggaeton/urbano/latin
-        if mood_key == "perreo":
+        # Moods with artist-genre requirements (perreo: reggaeton/urbano/latin)
+        if profile.artist_genres:
             artist_ids = []
             for t in ranked_tracks:
                 for a in t.get("artists", []) or []:
                     if a.get("id"):
                         artist_ids.append(a["id"])
             artist_ids = list(dict.fromkeys(artist_ids))
-            artist_genres = _get_artist_genres_bulk(token, artist_ids)
+            artist_genres = artist_store.get_genres_bulk(token, artist_ids)
             def is_perreo_artist(artists: list[dict]) -> bool:
-                for a in artists or []:
-                    genres = artist_genres.get(a.get("id"), [])
-                    g = " ".join(genres).lower()
-                    if (
-                        "reggaeton" in g
-                        or "urbano" in g
-                        or "latin hip hop" in g
-                        or "trap latino" in g
-                        or "latin" in g
-                        or "dembow" in g
-                        or "dancehall" in g
-                    ):
-                        return True
-                return False
+                return any(profile.matches_artist_genres(artist_genres.get(a.get("id"), [])) for a in artists or [])
             perreo_only = [t for t in ranked_tracks if is_perreo_artist(t.get("artists", []))]
             # If too few results, fallback to strong feature gate to keep perreo feel
             if len(perreo_only) >= max(6, limit // 2):
@@ -1017,10 +712,10 @@ def api_recommend(request):
             diverse = _dedupe_by_artist(rec_tracks, limit)
 
         # If still too small, use search-based expansion as last resort
-        if mood_key in ("perreo", "hype") and len(diverse) < max(6, limit // 2):
+        if profile.search_rescue and len(diverse) < max(6, limit // 2):
             extra_tracks: list[dict] = []
             search_terms = []
-            if mood_key == "perreo":
+            if profile.reach["seed_genre_search"]:
                 for g in (display_seed_genres or []):
                     if g:
                         search_terms.append(f"{mood} {g}")
@@ -1042,17 +737,10 @@ def api_recommend(request):
             ]
             extra_ids = list({t.get("id") for t in extra_tracks if t.get("id")})
             if extra_ids:
-                extra_features = spotify_get_audio_features_bulk(token, extra_ids)
-                extra_map = {f.get("id"): f for f in extra_features.get("audio_features", []) if f}
-                ranked_extra = []
-                for t in extra_tracks:
-                    f = extra_map.get(t.get("id"))
-                    if not f:
-                        continue
-                    score = _score_track(f, params, mood)
-                    ranked_extra.append((score, t))
-                ranked_extra.sort(key=lambda x: x[0])
-                extra_sorted = [t for _, t in ranked_extra]
+                extra_map = feature_store.get_features_bulk(token, extra_ids)
+                extra_pool = CandidatePool(extra_tracks, extra_map)
+                extra_pool = extra_pool.take(extra_pool.present)
+                extra_sorted = extra_pool.ranked(extra_pool.scores(params))
                 # Append extras to fill remaining slots
                 for t in extra_sorted:
                     if len(diverse) >= limit:
@@ -1102,31 +790,11 @@ def api_recommend(request):
         if diverse and user_id:
             new_ids = [t.get("id") for t in diverse if t.get("id")]
             if new_ids:
-                # Persist seen recs
-                RecommendationSeen.objects.bulk_create(
-                    [
-                        RecommendationSeen(
-                            spotify_user_id=user_id,
-                            track_id=tid,
-                            mood=mood,
-                            intensity=intensity,
-                            mode=mode,
-                        )
-                        for tid in new_ids
-                    ],
-                    ignore_conflicts=True,
-                )
-                seen_ids.extend(new_ids)
-                # Dedupe while preserving order, cap size
-                deduped = []
-                seen_local = set()
-                for tid in seen_ids:
-                    if tid in seen_local:
-                        continue
-                    seen_local.add(tid)
-                    deduped.append(tid)
-                request.session["rec_seen_ids"] = deduped[-200:]
-                request.session.modified = True
+                # Persist seen recs; the ranked candidates not served become the autopilot's pool.
+                seen.record(user_id, new_ids, mood, intensity, mode)
+                served = set(new_ids) | seen_set
+                leftover = [t.get("uri") for t in ranked_tracks if t.get("uri") and t.get("id") not in served]
+                rec_state.extend(user_id, mood, intensity, mode, new_ids, pool=leftover)
         tracks = [
             {
                 "id": t.get("id"),
@@ -1140,11 +808,15 @@ def api_recommend(request):
             for t in diverse
             if t.get("id")
         ]
-        return JsonResponse({"ok": True, "mood": mood, "tracks": tracks, "source": "recommendations"})
+        timings["total"] = (time.perf_counter() - request_start) * 1000
+        return _with_server_timing(
+            JsonResponse({"ok": True, "mood": mood, "tracks": tracks, "source": "recommendations", "timings": timings}),
+            timings,
+        )
     except Exception:
         # Personalized fallback only (avoid generic mood keyword spam)
-        top_tracks = spotify_get_top_tracks(token, time_range="medium_term", limit=40).get("items", [])
-        recent = spotify_get_recently_played(token, limit=30)
+        top_tracks = listening.top_tracks(user_id, token, time_range="medium_term", limit=40).get("items", [])
+        recent = listening.recently_played(user_id, token, limit=30)
         recent_items = recent.get("items", [])
         recent_tracks = [i.get("track") for i in recent_items if i.get("track")]
         pool = top_tracks + recent_tracks
@@ -1163,17 +835,11 @@ def api_recommend(request):
         pool = deduped
 
         track_ids = [t.get("id") for t in pool if t.get("id")]
-        features_bulk = spotify_get_audio_features_bulk(token, track_ids) if track_ids else {}
-        features_map = {f.get("id"): f for f in features_bulk.get("audio_features", []) if f}
+        features_map = feature_store.get_features_bulk(token, track_ids) if track_ids else {}
 
         if features_map:
-            ranked = []
-            for t in pool:
-                f = features_map.get(t.get("id"))
-                score = _score_track(f, params, mood)
-                ranked.append((score, t))
-            ranked.sort(key=lambda x: x[0])
-            ranked_tracks = [t for _, t in ranked]
+            candidates = CandidatePool(pool, features_map)
+            ranked_tracks = candidates.ranked(candidates.scores(params))
         else:
             ranked_tracks = pool
 
@@ -1186,29 +852,8 @@ def api_recommend(request):
         if diverse and user_id:
             new_ids = [t.get("id") for t in diverse if t.get("id")]
             if new_ids:
-                RecommendationSeen.objects.bulk_create(
-                    [
-                        RecommendationSeen(
-                            spotify_user_id=user_id,
-                            track_id=tid,
-                            mood=mood,
-                            intensity=intensity,
-                            mode=mode,
-                        )
-                        for tid in new_ids
-                    ],
-                    ignore_conflicts=True,
-                )
-                seen_ids.extend(new_ids)
-                deduped = []
-                seen_local = set()
-                for tid in seen_ids:
-                    if tid in seen_local:
-                        continue
-                    seen_local.add(tid)
-                    deduped.append(tid)
-                request.session["rec_seen_ids"] = deduped[-200:]
-                request.session.modified = True
+                seen.record(user_id, new_ids, mood, intensity, mode)
+                rec_state.extend(user_id, mood, intensity, mode, new_ids)
         tracks = [
             {
                 "id": t.get("id"),
@@ -1222,7 +867,11 @@ def api_recommend(request):
             for t in diverse
             if t.get("id")
         ]
-        return JsonResponse({"ok": True, "mood": mood, "tracks": tracks, "source": "personal_fallback"})
+        timings["total"] = (time.perf_counter() - request_start) * 1000
+        return _with_server_timing(
+            JsonResponse({"ok": True, "mood": mood, "tracks": tracks, "source": "personal_fallback", "timings": timings}),
+            timings,
+        )
 
 
 # --- PLAYBACK + QUEUE ---
@@ -1230,40 +879,36 @@ def api_play(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_play(token, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_play(token, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_pause(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_pause(token, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_pause(token, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_next(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_next(token, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_next(token, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_previous(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_previous(token, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_previous(token, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_queue(request):
@@ -1273,12 +918,51 @@ def api_queue(request):
     uri = request.GET.get("uri")
     if not uri:
         return JsonResponse({"error": "Missing uri"}, status=400)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_queue_track(token, uri, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_queue_track(token, uri, device_id=device_id)
     return JsonResponse({"ok": True})
 
+def _json_body(request) -> dict | None:
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def api_autopilot(request):
+    # POST {"uris": [...], "append": bool, "ahead": n, "device_id": ...}: hand the ordered list to
+    # the server-side queue; an empty list (without append) stops topping up.
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    token = _get_access_token(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+    user_id = _get_spotify_user_id(request, token)
+    if not user_id:
+        return JsonResponse({"error": "Missing user id"}, status=400)
+    body = _json_body(request)
+    if body is None:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    uris = [u for u in body.get("uris") or [] if isinstance(u, str) and u.startswith("spotify:")]
+    append = bool(body.get("append"))
+    if not uris and not append:
+        return JsonResponse({"ok": True, "autopilot": autopilot.stop(user_id)})
+    try:
+        ahead = int(body["ahead"]) if body.get("ahead") is not None else None
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "Invalid ahead"}, status=400)
+    state = autopilot.submit(user_id, uris, device_id=body.get("device_id") or None, ahead=ahead, append=append)
+    return JsonResponse({"ok": True, "autopilot": state})
+
+
+def api_autopilot_status(request):
+    user_id = _get_spotify_user_id(request)
+    if not user_id:
+        return JsonResponse({"authenticated": False}, status=401)
+    return JsonResponse({"autopilot": autopilot.status(user_id)})
+
+
 def api_play_uri(request):
     token = _get_access_token(request)
     if not token:
@@ -1286,10 +970,9 @@ def api_play_uri(request):
     uri = request.GET.get("uri")
     if not uri:
         return JsonResponse({"error": "Missing uri"}, status=400)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_play_uri(token, uri, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_play_uri(token, uri, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_play_uris(request):
@@ -1302,10 +985,9 @@ def api_play_uris(request):
     uri_list = [u for u in uris.split(",") if u]
     if not uri_list:
         return JsonResponse({"error": "No valid uris"}, status=400)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_play_uris(token, uri_list, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_play_uris(token, uri_list, device_id=device_id)
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True})
 
 def api_volume(request):
@@ -1314,10 +996,8 @@ def api_volume(request):
         return JsonResponse({"authenticated": False}, status=401)
     v = int(request.GET.get("v", 50))
     v = max(0, min(100, v))
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_set_volume(token, v, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_set_volume(token, v, device_id=device_id)
     return JsonResponse({"ok": True, "volume": v})
 
 
@@ -1328,10 +1008,8 @@ def api_repeat(request):
     state = (request.GET.get("state") or "").lower()
     if state not in ("off", "track", "context"):
         return JsonResponse({"error": "Invalid repeat state. Use off, track, or context."}, status=400)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+    if not _on_device(request, token, lambda d: spotify_set_repeat(token, state, device_id=d)):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    spotify_set_repeat(token, state, device_id=device_id)
     return JsonResponse({"ok": True, "repeat": state})
 
 def api_seek(request):
@@ -1340,11 +1018,13 @@ def api_seek(request):
         return JsonResponse({"authenticated": False}, status=401)
     pos = int(request.GET.get("pos", 0))
     pos = max(0, pos)
-    device_id = request.GET.get("device_id") or _get_device_id(token)
-    if not device_id:
+
+    def seek(d):
+        spotify_put(f"{API_BASE}/me/player/seek?position_ms={pos}&device_id={d}", token).raise_for_status()
+
+    if not _on_device(request, token, seek):
         return JsonResponse({"ok": False, "error": "No active Spotify device found."}, status=400)
-    url = f"{API_BASE}/me/player/seek?position_ms={pos}&device_id={device_id}"
-    spotify_put(url, token).raise_for_status()
+    now_playing.invalidate(request.session.get("spotify_user_id"))
     return JsonResponse({"ok": True, "position_ms": pos})
 
 
@@ -1352,7 +1032,9 @@ def api_devices(request):
     token = _get_access_token(request)
     if not token:
         return JsonResponse({"authenticated": False}, status=401)
-    return JsonResponse({"ok": True, "devices": spotify_get_devices(token)})
+    payload = spotify_get_devices(token)
+    devices.note_devices(request.session.get("spotify_user_id"), payload)
+    return JsonResponse({"ok": True, "devices": payload})
 
 
 def api_recommend_feedback(request):
@@ -1383,6 +1065,105 @@ def api_recommend_feedback(request):
 
 
 # --- MOOD BOARDS / PLAYLISTS ---
+MOOD_BATCH_MAX = 500
+
+
+def _mood_entry(mood: Mood, user_id: str, t: dict) -> MoodEntry:
+    # Accepts a Spotify track object or a track from the recommend payload (artist names, flat image/url).
+    album = t.get("album")
+    artists = t.get("artists") or []
+    if isinstance(artists, str):
+        names = analytics.split_artists(artists, None)
+    else:
+        names = [n for n in (a.get("name") or "" if isinstance(a, dict) else str(a) for a in artists) if n]
+    return MoodEntry(
+        mood=mood,
+        spotify_user_id=user_id,
+        track_id=t["id"],
+        track_name=(t.get("name") or "")[:200],
+        artists=", ".join(names)[:200],
+        artist_names=names,
+        album=((album.get("name") if isinstance(album, dict) else album) or "")[:200],
+        image=t.get("image") or (((album if isinstance(album, dict) else {}).get("images") or [{}])[0].get("url")) or "",
+        spotify_url=t.get("spotify_url") or (t.get("external_urls") or {}).get("spotify") or "",
+    )
+
+
+def _add_to_app_mood(mood: Mood, user_id: str, tracks: list[dict]) -> dict:
+    ids = list(dict.fromkeys(t["id"] for t in tracks if t.get("id")))
+    existing = set(
+        MoodEntry.objects.filter(mood=mood, spotify_user_id=user_id, track_id__in=ids).values_list("track_id", flat=True)
+    )
+    rows = []
+    for t in tracks:
+        if t.get("id") and t["id"] not in existing:
+            existing.add(t["id"])
+            rows.append(_mood_entry(mood, user_id, t))
+    with transaction.atomic():
+        created = MoodEntry.objects.bulk_create(rows, batch_size=500)
+        analytics.added(created)
+    return {"added": len(created), "duplicates": len(ids) - len(created), "entry_ids": [e.id for e in created]}
+
+
+def _ensure_playlist(token: str, user_id: str, mood: Mood) -> str:
+    if not mood.spotify_playlist_id:
+        playlist = spotify_create_playlist(token, user_id, f"VibeSync • {mood.name}")
+        mood.spotify_playlist_id = playlist["id"]
+        mood.save(update_fields=["spotify_playlist_id"])
+        playlists.created(playlist)
+    return mood.spotify_playlist_id
+
+
+def _add_to_playlist(token: str, user_id: str, mood: Mood, track_uris: list[str]) -> dict:
+    playlist_id = _ensure_playlist(token, user_id, mood)
+    fresh = playlists.missing(token, playlist_id, track_uris)
+    if fresh:
+        result = spotify_add_tracks_bulk(token, playlist_id, fresh)
+        playlists.note_added(playlist_id, fresh, result)
+    return {"playlist_id": playlist_id, "added": len(fresh), "duplicates": len(set(track_uris)) - len(fresh)}
+
+
+def _write_timeout(tracks: int) -> float:
+    # The usual deadline plus a little per extra 100-track chunk, capped so a slow playlist
+    # write can't hold the request; past it the write is reported as pending.
+    chunks = math.ceil(max(1, tracks) / PLAYLIST_WRITE_CHUNK)
+    return min(
+        float(getattr(settings, "SPOTIFY_WRITE_TIMEOUT", 20)),
+        float(getattr(settings, "SPOTIFY_GATHER_TIMEOUT", 8)) + 2.0 * (chunks - 1),
+    )
+
+
+def _mood_writes(calls: dict, tracks: int = 1) -> tuple[dict, int]:
+    # App (DB) and Spotify writes are independent: the Spotify write starts first and the DB
+    # write runs here while it is in flight. A Spotify write that timed out may still land:
+    # report it as pending, not failed, so clients don't retry into duplicates.
+    join = start_gather({name: fn for name, fn in calls.items() if name != "app"})
+    results, errors, pending = {}, {}, {}
+    if "app" in calls:
+        try:
+            results["app"] = calls["app"]()
+        except Exception as e:
+            errors["app"] = e
+    remote_results, remote_errors, _timings = join(_write_timeout(tracks))
+    results.update(remote_results)
+    for name, e in remote_errors.items():
+        (pending if isinstance(e, (TimeoutError, requests.Timeout)) else errors)[name] = e
+    if errors and not results and not pending:
+        raise next(iter(errors.values()))
+    body = {"ok": not errors, **results}
+    if errors:
+        body["errors"] = {name: str(e) for name, e in errors.items()}
+    if pending:
+        body["pending"] = {name: "still running; result unknown" for name in pending}
+    return body, (502 if errors else 202 if pending else 200)
+
+
+def _now_playing_item(token: str) -> dict | None:
+    payload = get_now_playing(token)
+    item = (payload or {}).get("item") or {}
+    return item if item.get("id") else None
+
+
 def api_add_to_app_mood(request):
     token = _get_access_token(request)
     if not token:
@@ -1395,28 +1176,15 @@ def api_add_to_app_mood(request):
     if not mood_name:
         return JsonResponse({"error": "Missing mood"}, status=400)
 
-    payload = get_now_playing(token)
-    if not payload:
+    item = _now_playing_item(token)
+    if not item:
         return JsonResponse({"error": "Nothing playing"}, status=400)
 
-    item = payload.get("item") or {}
-    track_id = item.get("id")
     mood = _get_or_create_mood(mood_name, user_id)
-
-    if MoodEntry.objects.filter(mood=mood, track_id=track_id, spotify_user_id=user_id).exists():
+    res = _add_to_app_mood(mood, user_id, [item])
+    if not res["added"]:
         return JsonResponse({"ok": True, "mood": mood.name, "duplicate": True})
-
-    entry = MoodEntry.objects.create(
-        mood=mood,
-        spotify_user_id=user_id,
-        track_id=track_id,
-        track_name=item.get("name") or "",
-        artists=", ".join(a.get("name") for a in item.get("artists", [])),
-        album=(item.get("album") or {}).get("name") or "",
-        image=((item.get("album") or {}).get("images") or [{}])[0].get("url") or "",
-        spotify_url=(item.get("external_urls") or {}).get("spotify") or "",
-    )
-    return JsonResponse({"ok": True, "mood": mood.name, "entry_id": entry.id})
+    return JsonResponse({"ok": True, "mood": mood.name, "entry_id": res["entry_ids"][0]})
 
 
 def api_add_to_spotify_playlist(request):
@@ -1431,39 +1199,126 @@ def api_add_to_spotify_playlist(request):
     if not mood_name:
         return JsonResponse({"error": "Missing mood"}, status=400)
 
-    payload = get_now_playing(token)
-    if not payload:
+    item = _now_playing_item(token)
+    if not item:
         return JsonResponse({"error": "Nothing playing"}, status=400)
 
-    item = payload.get("item") or {}
-    track_id = item.get("id")
-    track_uri = item.get("uri")
-
     mood = _get_or_create_mood(mood_name, user_id)
-
-    if not mood.spotify_playlist_id:
-        me = spotify_get_me(token)
-        playlist = spotify_create_playlist(token, me["id"], f"VibeSync • {mood.name}")
-        mood.spotify_playlist_id = playlist["id"]
-        mood.save()
-
-    if spotify_playlist_has_track(token, mood.spotify_playlist_id, track_id):
+    res = _add_to_playlist(token, user_id, mood, [item.get("uri")])
+    if not res["added"]:
         return JsonResponse({"ok": True, "mood": mood.name, "duplicate": True})
-
-    spotify_add_tracks(token, mood.spotify_playlist_id, track_uri)
-    return JsonResponse({"ok": True, "playlist_id": mood.spotify_playlist_id, "mood": mood.name})
+    return JsonResponse({"ok": True, "playlist_id": res["playlist_id"], "mood": mood.name})
 
 
 def api_add_to_both(request):
+    token = _get_access_token(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+    user_id = _get_spotify_user_id(request, token)
+    if not user_id:
+        return JsonResponse({"error": "Missing user id"}, status=400)
+
     mood_name = request.GET.get("mood")
     if not mood_name:
         return JsonResponse({"error": "Missing mood"}, status=400)
 
-    app_res = api_add_to_app_mood(request)
-    if app_res.status_code != 200:
-        return app_res
+    # One now-playing read shared by both writes.
+    item = _now_playing_item(token)
+    if not item:
+        return JsonResponse({"error": "Nothing playing"}, status=400)
+
+    mood = _get_or_create_mood(mood_name, user_id)
+    body, status = _mood_writes({
+        "app": lambda: _add_to_app_mood(mood, user_id, [item]),
+        "spotify": lambda: _add_to_playlist(token, user_id, mood, [item.get("uri")]),
+    })
+    return JsonResponse({**body, "mood": mood.name, "playlist_id": mood.spotify_playlist_id}, status=status)
+
+
+def api_add_batch(request):
+    # POST {"mood", "target": "app" | "spotify" | "both", "tracks": [{id, uri, name, artists, ...}]}
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    token = _get_access_token(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+    user_id = _get_spotify_user_id(request, token)
+    if not user_id:
+        return JsonResponse({"error": "Missing user id"}, status=400)
+
+    body = _json_body(request)
+    if body is None:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    mood_name = body.get("mood")
+    target = body.get("target") or "both"
+    tracks = [t for t in body.get("tracks") or [] if isinstance(t, dict) and t.get("id")]
+    if not mood_name or not tracks:
+        return JsonResponse({"error": "Missing mood or tracks"}, status=400)
+    if target not in ("app", "spotify", "both"):
+        return JsonResponse({"error": "Invalid target"}, status=400)
+    if len(tracks) > MOOD_BATCH_MAX:
+        return JsonResponse({"error": f"At most {MOOD_BATCH_MAX} tracks per call"}, status=400)
+
+    mood = _get_or_create_mood(mood_name, user_id)
+    uris = [t.get("uri") or f"spotify:track:{t['id']}" for t in tracks]
+    calls = {}
+    if target in ("app", "both"):
+        calls["app"] = lambda: _add_to_app_mood(mood, user_id, tracks)
+    if target in ("spotify", "both"):
+        calls["spotify"] = lambda: _add_to_playlist(token, user_id, mood, uris)
+    body, status = _mood_writes(calls, len(tracks))
+    return JsonResponse({**body, "mood": mood.name}, status=status)
+
+
+def api_remove_batch(request):
+    # POST {"mood", "target": "app" | "spotify" | "both", "track_ids": [...]}
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+    token = _get_access_token(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+    user_id = _get_spotify_user_id(request, token)
+    if not user_id:
+        return JsonResponse({"error": "Missing user id"}, status=400)
+
+    body = _json_body(request)
+    if body is None:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    mood_name = body.get("mood")
+    target = body.get("target") or "both"
+    track_ids = list(dict.fromkeys(t for t in body.get("track_ids") or [] if isinstance(t, str) and t))
+    if not mood_name or not track_ids:
+        return JsonResponse({"error": "Missing mood or track_ids"}, status=400)
+    if target not in ("app", "spotify", "both"):
+        return JsonResponse({"error": "Invalid target"}, status=400)
+    if len(track_ids) > MOOD_BATCH_MAX:
+        return JsonResponse({"error": f"At most {MOOD_BATCH_MAX} tracks per call"}, status=400)
+
+    mood = Mood.objects.filter(name=mood_name, spotify_user_id=user_id).first()
+    if not mood:
+        return JsonResponse({"ok": False, "error": "Mood not found"}, status=404)
 
-    return api_add_to_spotify_playlist(request)
+    def remove_app():
+        deleted = analytics.remove_entries(
+            MoodEntry.objects.filter(mood=mood, spotify_user_id=user_id, track_id__in=track_ids)
+        )
+        return {"deleted": deleted}
+
+    def remove_spotify():
+        uris = [f"spotify:track:{t}" for t in track_ids]
+        result = spotify_remove_tracks_bulk(token, mood.spotify_playlist_id, uris)
+        playlists.note_removed(mood.spotify_playlist_id, uris, result)
+        return {"playlist_id": mood.spotify_playlist_id, "removed": len(uris)}
+
+    calls = {}
+    if target in ("app", "both"):
+        calls["app"] = remove_app
+    if target in ("spotify", "both") and mood.spotify_playlist_id:
+        calls["spotify"] = remove_spotify
+    if not calls:
+        return JsonResponse({"ok": False, "error": "Playlist not found"}, status=404)
+    body, status = _mood_writes(calls, len(track_ids))
+    return JsonResponse({**body, "mood": mood.name}, status=status)
 
 
 def api_remove_from_app_mood(request):
@@ -1477,7 +1332,7 @@ def api_remove_from_app_mood(request):
     if not mood:
         return JsonResponse({"ok": False, "error": "Mood not found"}, status=404)
 
-    deleted, _ = MoodEntry.objects.filter(mood=mood, track_id=track_id, spotify_user_id=user_id).delete()
+    deleted = analytics.remove_entries(MoodEntry.objects.filter(mood=mood, track_id=track_id, spotify_user_id=user_id))
     return JsonResponse({"ok": True, "deleted": deleted})
 
 
@@ -1498,31 +1353,97 @@ def api_remove_from_spotify_playlist(request):
     if not mood or not mood.spotify_playlist_id:
         return JsonResponse({"ok": False, "error": "Playlist not found"}, status=404)
 
-    spotify_remove_track(token, mood.spotify_playlist_id, track_uri)
+    result = spotify_remove_track(token, mood.spotify_playlist_id, track_uri)
+    playlists.note_removed(mood.spotify_playlist_id, [track_uri], result)
     return JsonResponse({"ok": True, "playlist_id": mood.spotify_playlist_id})
 
 
+# Mood board paging: entries per mood per page, and cover images in summary mode.
+BOARD_PAGE = 50
+BOARD_PAGE_MAX = 200
+BOARD_COVERS = 4
+
+
+def _board_entry(e: MoodEntry) -> dict:
+    return {
+        "track_name": e.track_name,
+        "artists": e.artists,
+        "album": e.album,
+        "image": e.image,
+        "spotify_url": e.spotify_url,
+        "added_at": e.added_at.isoformat(),
+        "track_id": e.track_id,
+    }
+
+
+def _board_cursor(e: MoodEntry) -> str:
+    # Keyset position (added_at, id) of the last entry on a page.
+    return base64.urlsafe_b64encode(f"{e.added_at.isoformat()}|{e.id}".encode()).decode()
+
+
+def _parse_board_cursor(cursor: str) -> tuple:
+    # Raises ValueError (bad base64 included) or UnicodeError for anything _board_cursor didn't produce.
+    added_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    added_at = datetime.fromisoformat(added_at)
+    if added_at.tzinfo is None:
+        raise ValueError("cursor timestamp without a timezone")
+    return added_at, int(entry_id)
+
+
+def _board_page(entries: list[MoodEntry], limit: int) -> dict:
+    # entries holds up to limit + 1 rows; the extra one only signals another page.
+    page = entries[:limit]
+    return {
+        "entries": [_board_entry(e) for e in page],
+        "next_cursor": _board_cursor(page[-1]) if len(entries) > limit else None,
+    }
+
+
 def api_mood_board(request):
+    # Whole board in two queries (moods with counts, then each mood's first page via a sliced
+    # Prefetch). ?mood=&cursor= pages one mood; ?summary=1 returns counts and covers only.
     user_id = _get_spotify_user_id(request)
-    moods = Mood.objects.filter(spotify_user_id=user_id).prefetch_related("entries").order_by("name")
+    try:
+        limit = max(1, min(BOARD_PAGE_MAX, int(request.GET.get("limit", BOARD_PAGE))))
+        covers = max(0, min(BOARD_PAGE_MAX, int(request.GET.get("covers", BOARD_COVERS))))
+    except ValueError:
+        return JsonResponse({"error": "Invalid limit or covers"}, status=400)
+    entries = MoodEntry.objects.using(READ_DB).filter(spotify_user_id=user_id).order_by("-added_at", "-id")
+
+    mood_name = request.GET.get("mood")
+    cursor = request.GET.get("cursor")
+    if mood_name:
+        entries = entries.filter(mood__name=mood_name, mood__spotify_user_id=user_id)
+        if cursor:
+            try:
+                added_at, entry_id = _parse_board_cursor(cursor)
+            except (ValueError, UnicodeError):
+                return JsonResponse({"error": "Invalid cursor"}, status=400)
+            entries = entries.filter(
+                models.Q(added_at__lt=added_at) | models.Q(added_at=added_at, id__lt=entry_id)
+            )
+        return JsonResponse({"name": mood_name, **_board_page(list(entries[:limit + 1]), limit)})
+
+    summary = request.GET.get("summary") == "1"
+    per_mood = covers if summary else limit + 1
+    if summary:
+        entries = entries.only("id", "mood_id", "image", "added_at")
+    moods = (
+        Mood.objects.using(READ_DB)
+        .filter(spotify_user_id=user_id)
+        .annotate(entry_count=models.Count("entries", filter=models.Q(entries__spotify_user_id=user_id)))
+        .prefetch_related(models.Prefetch("entries", queryset=entries[:per_mood], to_attr="board_entries"))
+        .order_by("name")
+    )
     data = []
     for m in moods:
-        data.append({
-            "name": m.name,
-            "entries": [
-                {
-                    "track_name": e.track_name,
-                    "artists": e.artists,
-                    "album": e.album,
-                    "image": e.image,
-                    "spotify_url": e.spotify_url,
-                    "added_at": e.added_at.isoformat(),
-                    "track_id": e.track_id,
-                }
-                for e in m.entries.filter(spotify_user_id=user_id).order_by("-added_at")
-            ],
-        })
-    return JsonResponse({"moods": data})
+        item = {"name": m.name, "count": m.entry_count}
+        if summary:
+            item["covers"] = [e.image for e in m.board_entries if e.image]
+        else:
+            item.update(_board_page(m.board_entries, limit))
+        data.append(item)
+    return JsonResponse({"moods": data, "summary": summary, "limit": limit})
 
 
 def api_history(request):
@@ -1543,21 +1464,42 @@ def api_history(request):
     })
 
 
+ANALYTICS_TOP_ARTISTS = 50
+ANALYTICS_DAYS = 30
+
+
 def api_analytics(request):
-    user_id = _get_spotify_user_id(request)
+    # Served from the rollups (services.analytics); artists are counted individually.
+    user_id = _get_spotify_user_id(request) or ""
     mood_counts = (
-        MoodEntry.objects.filter(spotify_user_id=user_id).values("mood__name")
-        .order_by()
-        .annotate(count=models.Count("id"))
+        MoodCountRollup.objects.using(READ_DB).filter(spotify_user_id=user_id)
         .order_by("-count")
+        .values("mood__name", "count")
     )
     artist_counts = (
-        MoodEntry.objects.filter(spotify_user_id=user_id).values("mood__name", "artists")
-        .order_by()
-        .annotate(count=models.Count("id"))
-        .order_by("-count")[:50]
+        MoodArtistRollup.objects.using(READ_DB).filter(spotify_user_id=user_id)
+        .order_by("-count")
+        .values("mood__name", "count", artists=models.F("artist"))[:ANALYTICS_TOP_ARTISTS]
     )
-    return JsonResponse({"moods": list(mood_counts), "artists": list(artist_counts)})
+    day_counts = (
+        MoodDayRollup.objects.using(READ_DB)
+        .filter(spotify_user_id=user_id, day__gte=(timezone.now() - timedelta(days=ANALYTICS_DAYS)).date())
+        .order_by("day")
+        .values("mood__name", "day", "count")
+    )
+    return JsonResponse({"moods": list(mood_counts), "artists": list(artist_counts), "days": list(day_counts)})
+
+
+def api_debug_stats(request):
+    # Process-wide cache and rate-limit counters for this worker; only served with DEBUG on.
+    if not settings.DEBUG:
+        return JsonResponse({"ok": False, "error": "Not found"}, status=404)
+    return JsonResponse({
+        "ok": True,
+        "profile_cache": listening.stats(),
+        "catalog_cache": catalog.stats(),
+        "rate_limit": ratelimit.stats(),
+    })
 
 
 def api_goal_mood(request):
@@ -1582,15 +1524,13 @@ def api_goal_mood(request):
     })
 
 
-def api_vibe(request):
-    token = _get_access_token(request)
-    if not token:
-        return JsonResponse({"authenticated": False}, status=401)
-
-    payload = get_now_playing(token)
-    if payload is None:
-        player = get_player_state(token)
-        return JsonResponse({"playing": False, "message": "Nothing is playing right now.", "player_state": player})
+def _vibe_payload(token: str, get_user_id) -> dict:
+    # /me/player rather than currently-playing: same item, plus the device for the device cache.
+    payload = get_player_state(token)
+    if ((payload or {}).get("device") or {}).get("is_active"):
+        devices.note_player_state(get_user_id(), payload)
+    if not (payload or {}).get("item"):
+        return {"playing": False, "message": "Nothing is playing right now.", "player_state": payload}
 
     item = payload.get("item") or {}
     track_id = item.get("id")
@@ -1607,48 +1547,34 @@ def api_vibe(request):
         "duration_ms": item.get("duration_ms"),
     }
 
-    _log_history_if_new(request, track)
-
     if not track_id:
-        return JsonResponse({"playing": True, "track": track, "mood": "unknown", "audio_features": None})
+        return {"playing": True, "track": track, "mood": "unknown", "audio_features": None}
 
-    features = get_audio_features(track_id, token)
+    features = feature_store.get_features(token, track_id)
     if not features:
-        # Try cached features from recent recommendations
-        cache = request.session.get("feature_cache", {})
-        if isinstance(cache, dict) and track_id in cache:
-            cached = cache.get(track_id)
-            mood = _mood_from_features(cached)
-            return JsonResponse({
-                "playing": True,
-                "track": track,
-                "mood": mood,
-                "audio_features": cached,
-                "warning": "Using cached audio features for this track."
-            })
         # Try any saved mood entry for this user
-        user_id = _get_spotify_user_id(request, token)
+        user_id = get_user_id()
         if user_id:
             entry = MoodEntry.objects.filter(spotify_user_id=user_id, track_id=track_id).select_related("mood").first()
             if entry and entry.mood:
-                return JsonResponse({
+                return {
                     "playing": True,
                     "track": track,
                     "mood": (entry.mood.name or "unknown").lower(),
                     "audio_features": None,
                     "warning": "Audio features unavailable; using saved mood."
-                })
-        return JsonResponse({
+                }
+        return {
             "playing": True,
             "track": track,
             "mood": "unknown",
             "audio_features": None,
             "warning": "Audio features unavailable for this track."
-        })
+        }
 
-    mood = _mood_from_features(features)
+    mood = moods.classify(features)
 
-    return JsonResponse({
+    return {
         "playing": True,
         "track": track,
         "mood": mood,
@@ -1662,4 +1588,72 @@ def api_vibe(request):
             "liveness": features.get("liveness"),
             "speechiness": features.get("speechiness"),
         }
-    })
+    }
+
+
+def api_vibe(request):
+    token = _get_access_token(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+
+    # Repeat polls inside the hint window are answered without calling Spotify.
+    user_id = request.session.get("spotify_user_id")
+    if request.GET.get("fresh") != "1":
+        cached = now_playing.cached_payload("vibe", user_id)
+        if cached is not None:
+            return JsonResponse(cached)
+
+    data = _vibe_payload(token, lambda: _get_spotify_user_id(request, token))
+    if data.get("playing"):
+        user_id = user_id or _get_spotify_user_id(request, token)
+        _log_history_if_new(user_id, data["track"])
+    user_id = user_id or request.session.get("spotify_user_id")
+    data = now_playing.store_payload("vibe", user_id, data)
+    pilot = autopilot.status(user_id)
+    return JsonResponse({**data, "autopilot": pilot} if pilot["active"] else data)
+
+
+async def api_vibe_stream(request):
+    # Server-Sent Events feed of now-playing changes. One upstream poller per user per worker,
+    # shared by every open tab, on an adaptive schedule; only changes are pushed.
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Streaming needs the ASGI server; poll /spotify/api/vibe/ instead."}, status=501)
+    token = await sync_to_async(_get_access_token)(request)
+    if not token:
+        return JsonResponse({"authenticated": False}, status=401)
+    user_id = await sync_to_async(_get_spotify_user_id)(request, token)
+    if not user_id:
+        return JsonResponse({"error": "Missing user id"}, status=400)
+
+    def poll() -> dict:
+        try:
+            current = _get_access_token(request)
+            if not current:
+                return {"authenticated": False}
+            return _vibe_payload(current, lambda: user_id)
+        finally:
+            connections.close_all()
+
+    def on_track_change(data: dict) -> None:
+        _log_history_if_new(user_id, data["track"])
+
+    async def events():
+        q = now_playing.subscribe(user_id, poll, on_track_change)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(q.get(), timeout=now_playing.HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield now_playing.format_sse(event, json.dumps(data, cls=DjangoJSONEncoder))
+                if event == "auth":
+                    break
+        finally:
+            now_playing.unsubscribe(user_id, q)
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
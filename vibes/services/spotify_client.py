@@ -2,6 +2,8 @@ import time
 import requests
 from django.conf import settings
 
+from spotify_app.services import transport
+
 AUTH_URL = "https://accounts.spotify.com/authorize"
 TOKEN_URL = "https://accounts.spotify.com/api/token"
 API_BASE = "https://api.spotify.com/v1"
@@ -36,7 +38,7 @@ def exchange_code_for_token(code: str) -> dict:
         "client_id": settings.SPOTIFY_CLIENT_ID,
         "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
-    r = requests.post(TOKEN_URL, data=data, timeout=15)
+    r = transport.request("POST", TOKEN_URL, data=data)
     r.raise_for_status()
 
     payload = r.json()
@@ -54,7 +56,7 @@ def refresh_access_token(refresh_token: str) -> dict:
         "client_id": settings.SPOTIFY_CLIENT_ID,
         "client_secret": settings.SPOTIFY_CLIENT_SECRET,
     }
-    r = requests.post(TOKEN_URL, data=data, timeout=15)
+    r = transport.request("POST", TOKEN_URL, data=data)
     r.raise_for_status()
 
     payload = r.json()
@@ -63,8 +65,7 @@ def refresh_access_token(refresh_token: str) -> dict:
 
 
 def spotify_get(url: str, access_token: str) -> requests.Response:
-    headers = {"Authorization": f"Bearer {access_token}"}
-    return requests.get(url, headers=headers, timeout=15)
+    return transport.request("GET", url, access_token)
 
 
 def get_now_playing(access_token: str) -> dict | None: